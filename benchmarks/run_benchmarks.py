@@ -0,0 +1,258 @@
+"""
+效能量測 (不需顯示器)：
+    python benchmarks/run_benchmarks.py --out results.json
+    python benchmarks/run_benchmarks.py --out new.json --baseline results.json
+先以 synthetic.py 產生固定種子的 CSV，再量測各情境；每個情境重複多次取中位數，
+結果存成 JSON (含環境與 git 版本)，指定 --baseline 時列出與基準的比值
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import matplotlib
+matplotlib.use('Agg')
+# 缺少中文字型時的警告會大量輸出並影響計時
+warnings.filterwarnings('ignore', message='Glyph .* missing from font')
+
+# 從 benchmarks/ 執行時，讓上一層的程式模組可以匯入
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from synthetic import generate_csv
+from column_store import ColumnStore
+from data_cache import FrameCache
+from data_loader import load_sensor_data
+from derived import DerivedChannels
+from exporter import export_frame
+from plot_view import PlotView, _state_codes
+from pyramid import load_or_build_pyramid
+from range_stats import RangeStats
+from renderer import RenderSource, render_chart
+from search_index import SearchIndex
+from time_index import TimeIndex
+from transitions import TransitionIndex
+from utils import get_switchable_cols, get_sensor_cols, state_segments
+
+
+def timeit(fn, repeat):
+    """執行 fn repeat 次，回傳各次秒數"""
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return times
+
+
+def random_windows(time_index, n, span_s, seed=0):
+    rng = np.random.default_rng(seed)
+    t0 = time_index.epoch_ns[0]
+    t1 = time_index.epoch_ns[-1] - span_s * 10**9
+    starts = rng.integers(t0, max(t0 + 1, t1), size=n)
+    return [(pd.Timestamp(s, tz='Asia/Taipei'), pd.Timestamp(s + span_s * 10**9, tz='Asia/Taipei')) for s in starts]
+
+
+def run(csv_path, work_dir, repeat):
+    results = {}
+
+    def record(name, fn, n=repeat):
+        times = timeit(fn, n)
+        results[name] = {'median_s': float(np.median(times)), 'min_s': float(min(times)), 'repeat': n}
+        print(f"{name:<28} {results[name]['median_s'] * 1000:10.2f} ms")
+
+    # --- 載入 (load_data_from_file 的背景工作) ---
+    record('load_csv_cold', lambda: load_sensor_data(csv_path), n=max(1, repeat // 3))
+    cache = FrameCache(os.path.join(work_dir, 'cache'))
+    load_sensor_data(csv_path, cache=cache) # 寫入快取
+    record('load_csv_cached', lambda: load_sensor_data(csv_path, cache=cache))
+    df, time_col = load_sensor_data(csv_path, cache=cache)
+    sensor_cols = get_sensor_cols(df)
+    switch_cols = get_switchable_cols(df)
+    # 延遲載入：只讀時間欄開檔，勾選時再從快取讀取欄位
+    record('lazy_open_cached', lambda: ColumnStore(csv_path, cache=cache).open())
+    lazy = ColumnStore(csv_path, cache=cache)
+    lazy.open()
+    record('lazy_read_12_cols_cached', lambda: lazy.read(switch_cols[:4] + sensor_cols[:8]))
+    record('build_pyramid', lambda: load_or_build_pyramid(df, time_col, sensor_cols), n=max(1, repeat // 3))
+    load_or_build_pyramid(df, time_col, sensor_cols, cache=cache, file_path=csv_path) # 寫入快取，供 RenderSource 使用
+    time_index = TimeIndex(df[time_col])
+
+    # --- 時間範圍切片 ---
+    windows = random_windows(time_index, 200, 3600)
+    record('window_slice_x200', lambda: [time_index.slice(df, s, e) for s, e in windows])
+
+    # --- 開關狀態分段 ---
+    times = time_index.times(0, len(time_index))
+
+    def segment_all():
+        for col in switch_cols:
+            codes, _labels = _state_codes(df[col])
+            state_segments(times, codes)
+    record('switch_segments', segment_all)
+    record('transition_index_build', lambda: TransitionIndex(df).build(switch_cols))
+    transitions = TransitionIndex(df).build(switch_cols)
+    record('switch_segments_indexed', lambda: [transitions.segments(col, 0, len(time_index)) for col in switch_cols])
+
+    # --- 感測欄位分組 / 正規化 (update_plot 內的統計) ---
+    fig = Figure(figsize=(11, 8))
+    FigureCanvasAgg(fig)
+    view = PlotView(fig, fig.add_subplot())
+    record('sensor_grouping', lambda: view._group_sensors(df, sensor_cols[:20]))
+    range_stats = RangeStats(df)
+    rows = [time_index.positions(s, e) for s, e in windows]
+    range_stats.table(sensor_cols, 0, 1) # 建立各欄位的區塊統計
+    record('range_stats_x200', lambda: [range_stats.table(sensor_cols[:20], i0, i1) for i0, i1 in rows])
+    record('switch_summary_x200', lambda: [[transitions.summary(col, i0, i1, time_index.epoch_ns)
+                                            for col in switch_cols[:10]] for i0, i1 in rows])
+
+    # --- 衍生通道 (未快取的完整計算) ---
+    a, b, c = sensor_cols[:3]
+    derived = DerivedChannels({'dp': f'{{{a}}} - {{{b}}}', 'mean': f'rolling_mean({{{c}}}, 60)',
+                               'vol': f'integrate({{{c}}})', 'state': f'{{{switch_cols[0]}}} > 1'})
+    record('derived_4_channels', lambda: [derived.evaluate(name, df, time_col) for name in derived.names])
+
+    # --- 完整重繪 (PlotView.update + draw)，各時間範圍 ---
+    source = RenderSource(csv_path, cache_dir=os.path.join(work_dir, 'cache'))
+    tags = switch_cols[:4] + sensor_cols[:8]
+    start = pd.Timestamp(time_index.epoch_ns[0], tz='Asia/Taipei')
+    end = pd.Timestamp(time_index.epoch_ns[-1], tz='Asia/Taipei')
+    record('download_png_full_range', lambda: render_chart(source, tags, start, end, os.path.join(work_dir, 'full.png')))
+    s, e = windows[0]
+    record('download_png_1h', lambda: render_chart(source, tags, s, e, os.path.join(work_dir, 'hour.png')))
+
+    # --- 下載 CSV (download_csv 的輸出) ---
+    export_cols = [time_col] + tags
+    i0, i1 = time_index.positions(start, end)
+    record('download_csv_full_range',
+           lambda: export_frame(df, export_cols, os.path.join(work_dir, 'out.csv'), i0, i1),
+           n=max(1, repeat // 3))
+    record('download_csv_gz_full_range',
+           lambda: export_frame(df, export_cols, os.path.join(work_dir, 'out.csv.gz'), i0, i1),
+           n=max(1, repeat // 3))
+
+    # --- 側邊清單 (搜尋索引 + 列元件) ---
+    all_cols = switch_cols + sensor_cols
+    record('panel_search_index_build', lambda: SearchIndex(all_cols))
+    index = SearchIndex(all_cols)
+    queries = ['pit', 'av-', '20xx', '1', 'fit-3', 'zzz', 'lt 2']
+    record('panel_search_x7', lambda: [index.search(q) for q in queries])
+    panel = _panel_benchmark(all_cols, repeat)
+    if panel is not None:
+        results.update(panel)
+    else:
+        results['panel_render'] = {'skipped': '沒有顯示器'}
+        print(f"{'panel_render':<28} {'(沒有顯示器，略過)':>10}")
+    return results
+
+
+def _panel_benchmark(all_cols, repeat):
+    """量測虛擬清單重新綁定可視列的時間；沒有顯示器時回傳 None"""
+    try:
+        import customtkinter as ctk
+        from sensor_list import VirtualSensorList
+        root = ctk.CTk()
+    except Exception:
+        return None
+    try:
+        font = ctk.CTkFont(size=12)
+        frame = ctk.CTkFrame(root)
+        frame.pack(fill='both', expand=True)
+        checked = set(all_cols[:5])
+        panel = VirtualSensorList(frame, font, font, is_checked=lambda c: c in checked, is_visible=lambda c: True,
+                                  on_check=lambda c: None, on_eye=lambda c: None, display_name=str)
+        root.update()
+
+        def render():
+            panel.set_items(sorted(checked), all_cols)
+            root.update_idletasks()
+
+        def scroll():
+            panel.canvas.yview_scroll(5, 'units')
+            root.update_idletasks()
+        out = {}
+        for name, fn in (('panel_render', render), ('panel_scroll', scroll)):
+            times = timeit(fn, repeat)
+            out[name] = {'median_s': float(np.median(times)), 'min_s': float(min(times)), 'repeat': repeat}
+            print(f"{name:<28} {out[name]['median_s'] * 1000:10.2f} ms")
+        return out
+    finally:
+        root.destroy()
+
+
+def environment(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'hours': args.hours,
+        'analog_columns': args.analog,
+        'state_columns': args.states,
+        'time_format': args.time_format,
+        'repeat': args.repeat,
+    }
+
+
+def compare(results, baseline):
+    """列出與基準的比值 (>1 表示變慢)"""
+    print(f"\n{'scenario':<28} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, cur in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base or 'median_s' not in base or 'median_s' not in cur:
+            continue
+        ratio = cur['median_s'] / base['median_s'] if base['median_s'] else float('inf')
+        print(f"{name:<28} {base['median_s'] * 1000:9.2f}ms {cur['median_s'] * 1000:9.2f}ms {ratio:7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="感測器工具效能量測")
+    parser.add_argument('--out', default='benchmark_results.json', help="結果 JSON 檔")
+    parser.add_argument('--baseline', help="用來比較的先前結果 JSON")
+    parser.add_argument('--csv', help="使用現有的 CSV (不產生合成資料)")
+    parser.add_argument('--hours', type=float, default=24.0)
+    parser.add_argument('--analog', type=int, default=200)
+    parser.add_argument('--states', type=int, default=32)
+    parser.add_argument('--time-format', choices=('timestamp', 'datetime'), default='timestamp')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = args.csv
+        if not csv_path:
+            csv_path = os.path.join(work_dir, 'synthetic.csv')
+            t = time.perf_counter()
+            rows, cols = generate_csv(csv_path, hours=args.hours, n_analog=args.analog, n_states=args.states,
+                                      time_format=args.time_format, seed=0)
+            print(f"合成資料：{rows:,} 列 x {cols} 欄 ({time.perf_counter() - t:.1f} s)")
+        results = run(csv_path, work_dir, args.repeat)
+
+    output = {'environment': environment(args), 'results': results}
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=4, ensure_ascii=False)
+    print(f"結果已寫入 {args.out}")
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+產生與現場匯出格式相同的合成 CSV (1 秒取樣)，供效能量測使用：
+    python benchmarks/synthetic.py out.csv --hours 12 --analog 300 --states 40
+類比欄位為帶雜訊的隨機漫步 (pit- / fit- / lt- 等)，偶有缺值；
+開關欄位 (p- / b- / mx- / av-) 以幾何分布的停留時間切換狀態，切換頻率依類型不同
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+ANALOG_PREFIXES = ('pit', 'fit', 'lt', 'tt', 'ait')
+# 開關類型 -> (狀態值, 平均停留秒數)
+STATE_KINDS = {
+    'p': (["'01'", "'10'"], 1800),
+    'b': (["'01'", "'10'"], 3600),
+    'mx': (["'01'", "'10'", "'11'"], 900),
+    'av': (["'00'", "'01'", "'10'", "'11'"], 300),
+}
+ROWS_PER_WRITE = 3600 # 每次寫入一小時的資料，避免一次佔用大量記憶體
+
+
+def column_names(n_analog, n_states):
+    """產生 tag 名稱，區域代號 1xx~4xx 與匯出檔的命名方式相同"""
+    analog = []
+    for i in range(n_analog):
+        prefix = ANALOG_PREFIXES[i % len(ANALOG_PREFIXES)]
+        area = 1 + (i // len(ANALOG_PREFIXES)) % 4
+        analog.append(f"{prefix}-{area}{i // 20:02d}{chr(ord('a') + i % 4)}")
+    states = []
+    kinds = list(STATE_KINDS)
+    for i in range(n_states):
+        kind = kinds[i % len(kinds)]
+        area = 1 + (i // len(kinds)) % 4
+        digits = f"{area}{i:03d}" if kind == 'av' else f"{area}{i:02d}"
+        states.append(f"{kind}-{digits}{chr(ord('a') + i % 4)}")
+    return analog, states
+
+
+def _state_series(rng, n, values, mean_dwell):
+    """以幾何分布的停留時間產生狀態序列"""
+    out = np.empty(n, dtype=object)
+    pos = 0
+    state = rng.integers(len(values))
+    while pos < n:
+        dwell = int(rng.geometric(1.0 / mean_dwell))
+        out[pos:pos + dwell] = values[state]
+        pos += dwell
+        state = (state + rng.integers(1, len(values))) % len(values) # 換到另一個狀態
+    return out
+
+
+def generate_csv(path, hours=6.0, n_analog=200, n_states=32, time_format='timestamp',
+                 start='2025-06-11 06:00', seed=0, nan_rate=0.001):
+    """
+    產生合成 CSV 並回傳 (列數, 欄數)。
+    time_format: 'timestamp' (epoch 秒) 或 'datetime' (Date / Time 兩欄)
+    """
+    rng = np.random.default_rng(seed)
+    n = int(hours * 3600)
+    analog_cols, state_cols = column_names(n_analog, n_states)
+    t0 = int(pd.Timestamp(start, tz='Asia/Taipei').timestamp())
+
+    # 每欄的基準值與尺度不同，讓分組 / 正規化的邏輯有代表性
+    scales = rng.choice([0.05, 1.0, 20.0, 500.0], size=len(analog_cols))
+    levels = rng.uniform(0, 10, size=len(analog_cols)) * scales
+    last = levels.copy()
+    states = {}
+    for col in state_cols:
+        values, dwell = STATE_KINDS[col.split('-')[0]]
+        states[col] = _state_series(rng, n, values, dwell)
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        for i0 in range(0, n, ROWS_PER_WRITE):
+            i1 = min(n, i0 + ROWS_PER_WRITE)
+            m = i1 - i0
+            ts = t0 + np.arange(i0, i1)
+            if time_format == 'timestamp':
+                data = {'Timestamp': ts}
+            else:
+                local = pd.to_datetime(ts, unit='s', utc=True).tz_convert('Asia/Taipei')
+                data = {'Date': local.strftime('%Y-%m-%d'), 'Time': local.strftime('%H:%M:%S')}
+            steps = rng.normal(scale=0.01, size=(m, len(analog_cols))) * scales
+            walk = last + np.cumsum(steps, axis=0)
+            last = walk[-1]
+            noise = rng.normal(scale=0.002, size=walk.shape) * scales
+            analog = np.round(walk + noise, 3)
+            analog[rng.random(analog.shape) < nan_rate] = np.nan
+            for j, col in enumerate(analog_cols):
+                data[col] = analog[:, j]
+            for col in state_cols:
+                data[col] = states[col][i0:i1]
+            pd.DataFrame(data).to_csv(f, index=False, header=(i0 == 0))
+    return n, len(analog_cols) + len(state_cols)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="產生合成的感測器 CSV")
+    parser.add_argument('path')
+    parser.add_argument('--hours', type=float, default=6.0)
+    parser.add_argument('--analog', type=int, default=200, help="類比欄位數")
+    parser.add_argument('--states', type=int, default=32, help="開關欄位數")
+    parser.add_argument('--time-format', choices=('timestamp', 'datetime'), default='timestamp')
+    parser.add_argument('--start', default='2025-06-11 06:00')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    rows, cols = generate_csv(args.path, hours=args.hours, n_analog=args.analog, n_states=args.states,
+                              time_format=args.time_format, start=args.start, seed=args.seed)
+    print(f"{args.path}: {rows:,} 列 x {cols} 欄")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from data_loader import compact_frame, parse_sensor_csv
+from pyramid import MinMaxPyramid, PYRAMID_FILE
+from utils import get_switchable_cols, get_sensor_cols
+
+DEFAULT_BUDGET_MB = 1024 # 已載入欄位的記憶體預算 (config.json 的 column_budget_mb)
+DEFAULT_LAZY_LOAD_MB = 500 # GUI 開啟此大小以上的單一檔案時延遲載入 (config.json 的 lazy_load_mb)
+
+
+class ColumnStore:
+    """
+    延遲載入單一 CSV：開檔時只讀標頭與時間欄，其餘欄位第一次勾選時才讀取 (優先使用欄式快取，
+    沒有快取時只解析需要的欄位並補進快取)。已載入的欄位以 LRU 保留，
+    總大小超過預算時從最久未使用、且未勾選的欄位開始移除 (之後再勾選時重新讀取)
+    """
+
+    def __init__(self, file_path, cache=None, budget_mb=DEFAULT_BUDGET_MB, float32=False):
+        self.file_path = file_path
+        self.cache = cache
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.float32 = float32
+        self.header = list(pd.read_csv(file_path, nrows=0).columns)
+        if 'Timestamp' in self.header:
+            self.time_cols = ['Timestamp']
+        elif 'Date' in self.header and 'Time' in self.header:
+            self.time_cols = ['Date', 'Time']
+        else:
+            raise ValueError("CSV 沒有 Timestamp 或 Date/Time 欄")
+        frame = pd.DataFrame(columns=self.header) # 只有欄名，供 get_switchable_cols / get_sensor_cols 使用
+        self.switch_cols = get_switchable_cols(frame)
+        self.sensor_cols = get_sensor_cols(frame)
+        self.rows = None
+        self._sizes = OrderedDict() # 已載入欄位 -> 位元組數，最近使用的在最後
+
+    def open(self, progress=None, cancel_event=None):
+        """讀取時間欄 (優先使用快取)，回傳只有時間欄的 (df, time_col)"""
+        manifest = self.cache.manifest(self.file_path) if self.cache is not None else None
+        if manifest is not None:
+            time_col = manifest["time_col"]
+            data = self.cache.load_columns(self.file_path, [time_col])
+            if time_col in data:
+                df = pd.DataFrame(data)
+                df.attrs['coercions'] = {k: v for k, v in manifest.get("coercions", {}).items() if k == time_col}
+                self.rows = len(df)
+                return df, time_col
+        df, time_col = parse_sensor_csv(self.file_path, progress=progress, cancel_event=cancel_event,
+                                        usecols=self.time_cols)
+        coercions = df.attrs.get('coercions', {})
+        df = df[[time_col]] # Date / Time 文字欄不需保留
+        df.attrs['coercions'] = coercions
+        if self.cache is not None:
+            self.cache.store(self.file_path, df, time_col, header=self.header)
+        self.rows = len(df)
+        return df, time_col
+
+    def cached_pyramid(self):
+        """快取中已有的金字塔 (之前完整載入時建立)；沒有時回傳 None，繪圖改由原始資料抽樣"""
+        path = self.cache.sidecar_path(self.file_path, PYRAMID_FILE) if self.cache is not None else None
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            return MinMaxPyramid.load(path)
+        except Exception as e:
+            print(f"金字塔快取讀取失敗: {e}")
+            return None
+
+    def missing(self, cols):
+        """cols 中尚未載入的 CSV 欄位 (不在標頭中的欄位，例如衍生通道，不列入)"""
+        return [c for c in cols if c in self.header and c not in self.time_cols and c not in self._sizes]
+
+    def touch(self, cols):
+        """標記欄位剛被使用 (LRU 順序)"""
+        for col in cols:
+            if col in self._sizes:
+                self._sizes.move_to_end(col)
+
+    def read(self, cols, progress=None, cancel_event=None):
+        """
+        讀取欄位資料，回傳列順序與時間欄相同的 DataFrame (可在工作執行緒呼叫，不修改目前的資料)。
+        從 CSV 解析時，無法轉換的個數記錄在結果的 attrs['coercions']
+        """
+        data = self.cache.load_columns(self.file_path, cols) if self.cache is not None else {}
+        coercions = {}
+        missing = [c for c in cols if c not in data]
+        if missing:
+            df, _time_col = parse_sensor_csv(self.file_path, progress=progress, cancel_event=cancel_event,
+                                             usecols=self.time_cols + missing)
+            if len(df) != self.rows:
+                raise ValueError("檔案內容已變更，請重新開啟檔案")
+            compact_frame(df)
+            coercions = {k: v for k, v in df.attrs.get('coercions', {}).items() if k in missing}
+            new = df[missing]
+            if self.cache is not None:
+                self.cache.add_columns(self.file_path, new)
+            data.update({c: new[c] for c in missing})
+        out = pd.DataFrame({c: data[c] for c in cols})
+        if self.float32:
+            for col in get_sensor_cols(out):
+                if out[col].dtype == np.float64:
+                    out[col] = out[col].astype(np.float32)
+        out.attrs['coercions'] = coercions
+        return out
+
+    def attach(self, df, new, pinned=()):
+        """
+        (主執行緒) 將 read() 的結果依 CSV 欄位順序插入 df，再移除超出記憶體預算的欄位。
+        pinned: 不可移除的欄位 (目前勾選中)；回傳被移除的欄位
+        """
+        order = {col: i for i, col in enumerate(self.header)}
+        for col in new.columns:
+            if col in df.columns:
+                continue
+            loc = sum(1 for c in df.columns if order.get(c, -1) < order[col])
+            df.insert(loc, col, new[col].values)
+            self._sizes[col] = int(df[col].memory_usage(deep=True, index=False))
+        self.touch(new.columns)
+        evicted = []
+        total = self.loaded_bytes
+        for col in list(self._sizes):
+            if total <= self.budget_bytes:
+                break
+            if col in pinned:
+                continue
+            total -= self._sizes.pop(col)
+            del df[col]
+            evicted.append(col)
+        return evicted
+
+    @property
+    def loaded_bytes(self):
+        return sum(self._sizes.values())
+
+    @property
+    def loaded_count(self):
+        return len(self._sizes)
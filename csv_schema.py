@@ -0,0 +1,72 @@
+import json
+import os
+
+from utils import SWITCH_PREFIXES, NON_SENSOR_COLS
+
+SCHEMA_FILE = 'csv_schema.json' # 與 equipments.json 放在同一目錄
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S' # Date + ' ' + Time 的格式
+TIMESTAMP_UNIT = 's'
+# 欄位讀取型別：
+#   float: 直接以 float64 讀取 (一般感測欄位與 Timestamp)
+#   mixed: 已知混有文字的數值欄位，以文字讀取後轉為數值並計算無法轉換的個數
+#   state: 開關狀態碼，以文字讀取 (之後由 compact_frame 轉為 categorical)
+#   text:  文字欄位 (Date、Time)，不轉換
+#   auto:  由讀取引擎自行判斷 (ID 等其他非感測欄位)
+COLUMN_TYPES = ('float', 'mixed', 'state', 'text', 'auto')
+# 視為缺值的字串，與 pandas read_csv 的預設相同
+NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+             '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+
+class CsvSchema:
+    """
+    CSV 各欄位的讀取型別與時間格式。預設依 utils 的開關前綴 / 非感測欄位決定，
+    columns 可逐欄覆寫 ({欄位: 型別})
+    """
+
+    def __init__(self, columns=None, datetime_format=DATETIME_FORMAT, timestamp_unit=TIMESTAMP_UNIT):
+        columns = dict(columns or {})
+        for col, kind in columns.items():
+            if kind not in COLUMN_TYPES:
+                raise ValueError(f"{SCHEMA_FILE}: 欄位 {col} 的型別 {kind!r} 不正確，應為 {', '.join(COLUMN_TYPES)}")
+        self.columns = columns
+        self.datetime_format = datetime_format or None # 空字串表示自動判斷
+        self.timestamp_unit = timestamp_unit
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(columns=data.get('columns'),
+                   datetime_format=data.get('datetime_format', DATETIME_FORMAT),
+                   timestamp_unit=data.get('timestamp_unit', TIMESTAMP_UNIT))
+
+    def column_type(self, col):
+        kind = self.columns.get(col)
+        if kind is not None:
+            return kind
+        if col.startswith(SWITCH_PREFIXES):
+            return 'state'
+        if col == 'Timestamp':
+            return 'float' # epoch 秒，讀取後再轉為時間
+        if col in ('Date', 'Time'):
+            return 'text'
+        if col in NON_SENSOR_COLS:
+            return 'auto'
+        return 'float'
+
+    def plan(self, columns):
+        """回傳 {欄位: 型別}，順序與 columns 相同"""
+        return {col: self.column_type(col) for col in columns}
+
+
+def load_schema(path=None):
+    """讀取 csv_schema.json (預設在程式目錄)；檔案不存在或格式錯誤時使用預設的解析結構"""
+    if path is None:
+        path = os.path.join(os.path.dirname(__file__), SCHEMA_FILE)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return CsvSchema.from_dict(json.load(f))
+    except FileNotFoundError:
+        return CsvSchema()
+    except json.JSONDecodeError:
+        print(f"錯誤: {SCHEMA_FILE} 檔案格式不正確於 {path}，改用預設解析結構")
+        return CsvSchema()
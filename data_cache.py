@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# 快取格式版本，解析邏輯或儲存格式變更時遞增，舊快取會自動失效
+CACHE_VERSION = 3
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".sensor_plot_cache")
+DEFAULT_CACHE_MAX_MB = 4096
+MANIFEST_NAME = "manifest.json"
+
+
+class FrameCache:
+    """
+    已解析 CSV 的欄式快取 (每個欄位一個 .npy 檔)。
+    以檔案路徑、大小、修改時間作為 key，快取目錄總大小超過上限時依最後使用時間淘汰。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+    def key_for(self, file_path):
+        """根據檔案路徑、大小與 mtime 計算快取 key"""
+        st = os.stat(file_path)
+        raw = f"{os.path.abspath(file_path)}|{st.st_size}|{st.st_mtime_ns}|v{CACHE_VERSION}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def entry_dir(self, file_path):
+        return os.path.join(self.cache_dir, self.key_for(file_path))
+
+    def manifest(self, file_path):
+        """讀取有效快取項目的 manifest；快取不存在、版本不符或無法讀取時回傳 None"""
+        try:
+            manifest_path = os.path.join(self.entry_dir(file_path), MANIFEST_NAME)
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != CACHE_VERSION:
+            return None
+        return manifest
+
+    def load(self, file_path):
+        """讀取快取，回傳 (df, time_col)；快取不存在、失效或只有部分欄位時回傳 None"""
+        manifest = self.manifest(file_path)
+        if manifest is None or manifest.get("partial"):
+            return None
+        entry = self.entry_dir(file_path)
+        try:
+            data = {}
+            for meta in manifest["columns"]:
+                data[meta["name"]] = _decode_column(entry, meta)
+            df = pd.DataFrame(data, columns=[m["name"] for m in manifest["columns"]])
+            df.attrs["coercions"] = manifest.get("coercions", {})
+            os.utime(os.path.join(entry, MANIFEST_NAME))  # 更新最後使用時間，供淘汰策略使用
+            return df, manifest["time_col"]
+        except Exception as e:
+            print(f"快取讀取失敗，改為重新解析: {e}")
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+
+    def load_columns(self, file_path, names):
+        """只讀取快取中的部分欄位 (延遲載入用)，回傳 {欄位: 陣列}；快取中沒有的欄位不在結果中"""
+        manifest = self.manifest(file_path)
+        if manifest is None:
+            return {}
+        entry = self.entry_dir(file_path)
+        wanted = set(names)
+        try:
+            data = {meta["name"]: _decode_column(entry, meta) for meta in manifest["columns"] if meta["name"] in wanted}
+            os.utime(os.path.join(entry, MANIFEST_NAME))
+        except Exception as e:
+            print(f"快取讀取失敗，改為重新解析: {e}")
+            return {}
+        return data
+
+    def store(self, file_path, df, time_col, header=None):
+        """
+        將已解析、排序過的 DataFrame 寫入快取，成功回傳 True。
+        header: 只寫入部分欄位 (延遲載入的時間欄) 時傳入 CSV 的全部欄名，其餘欄位之後以 add_columns 補上
+        """
+        try:
+            entry = self.entry_dir(file_path)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_dir = os.path.join(self.cache_dir, f".tmp-{uuid.uuid4().hex}")
+            os.makedirs(tmp_dir)
+            try:
+                columns = []
+                for i, col in enumerate(df.columns):
+                    meta = _encode_column(tmp_dir, i, df[col])
+                    meta["name"] = col
+                    columns.append(meta)
+                manifest = {
+                    "version": CACHE_VERSION,
+                    "source": os.path.abspath(file_path),
+                    "time_col": time_col,
+                    "rows": int(len(df)),
+                    "coercions": df.attrs.get("coercions", {}), # 解析時無法轉換的個數，讀取快取時仍可回報
+                    "columns": columns,
+                }
+                if header is not None:
+                    manifest["partial"] = True
+                    manifest["header"] = list(header)
+                with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+                    json.dump(manifest, f, ensure_ascii=False)
+                shutil.rmtree(entry, ignore_errors=True)
+                os.replace(tmp_dir, entry)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception as e:
+            print(f"快取寫入失敗: {e}")
+            return False
+        self.evict(keep=os.path.basename(entry))
+        return True
+
+    def add_columns(self, file_path, df):
+        """將 df 的欄位加入只有部分欄位的快取項目 (列數需相同)，成功回傳 True"""
+        manifest = self.manifest(file_path)
+        if manifest is None or not manifest.get("partial") or manifest["rows"] != len(df):
+            return False
+        try:
+            entry = self.entry_dir(file_path)
+            existing = {meta["name"] for meta in manifest["columns"]}
+            for col in df.columns:
+                if col in existing:
+                    continue
+                meta = _encode_column(entry, len(manifest["columns"]), df[col])
+                meta["name"] = col
+                manifest["columns"].append(meta)
+            # 先寫暫存檔再取代，讀取端不會看到寫到一半的 manifest
+            tmp_path = os.path.join(entry, f".{MANIFEST_NAME}.{uuid.uuid4().hex}")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(entry, MANIFEST_NAME))
+        except Exception as e:
+            print(f"快取寫入失敗: {e}")
+            return False
+        self.evict(keep=os.path.basename(entry))
+        return True
+
+    def sidecar_path(self, file_path, name):
+        """快取項目內附加檔案 (例如金字塔) 的路徑；該檔案尚無有效快取時回傳 None"""
+        try:
+            entry = self.entry_dir(file_path)
+        except OSError:
+            return None
+        if not os.path.exists(os.path.join(entry, MANIFEST_NAME)):
+            return None
+        return os.path.join(entry, name)
+
+    def evict(self, keep=None):
+        """快取目錄超過大小上限時，從最久未使用的項目開始刪除"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(path):
+                continue
+            manifest_path = os.path.join(path, MANIFEST_NAME)
+            if name.startswith(".tmp-") or not os.path.exists(manifest_path):
+                continue
+            size = _dir_size(path)
+            total += size
+            entries.append((os.path.getmtime(manifest_path), name, size))
+        entries.sort()
+        for _, name, size in entries:
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+            total -= size
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for fn in files:
+            try:
+                total += os.path.getsize(os.path.join(root, fn))
+            except OSError:
+                pass
+    return total
+
+
+def _encode_column(entry, idx, series):
+    """將單一欄位寫成 .npy，回傳描述該欄位的 metadata"""
+    fname = f"{idx}.npy"
+    path = os.path.join(entry, fname)
+    dtype = series.dtype
+    if isinstance(dtype, pd.DatetimeTZDtype) or pd.api.types.is_datetime64_dtype(dtype):
+        tz = str(dtype.tz) if isinstance(dtype, pd.DatetimeTZDtype) else None
+        np.save(path, series.values.astype("datetime64[ns]").view("i8"))
+        return {"kind": "datetime", "file": fname, "tz": tz}
+    if isinstance(dtype, pd.CategoricalDtype):
+        np.save(path, series.cat.codes.values)
+        return {"kind": "category", "file": fname,
+                "categories": [str(c) for c in series.cat.categories]}
+    if dtype.kind in "biuf":
+        np.save(path, series.values)
+        return {"kind": "numeric", "file": fname}
+    # 其餘 (object / string) 以固定長度 unicode 陣列儲存，缺值另存 mask
+    na = series.isna().values
+    values = series.astype(str).values.astype("U")
+    np.save(path, values)
+    meta = {"kind": "object", "file": fname}
+    if na.any():
+        na_name = f"{idx}.na.npy"
+        np.save(os.path.join(entry, na_name), na)
+        meta["na_file"] = na_name
+    return meta
+
+
+def _decode_column(entry, meta):
+    values = np.load(os.path.join(entry, meta["file"]))
+    kind = meta["kind"]
+    if kind == "datetime":
+        dt = pd.to_datetime(values, unit="ns", utc=True)
+        return dt.tz_convert(meta["tz"]) if meta["tz"] else dt.tz_localize(None)
+    if kind == "category":
+        return pd.Categorical.from_codes(values, categories=meta["categories"])
+    if kind == "numeric":
+        return values
+    out = values.astype(object)
+    if meta.get("na_file"):
+        out[np.load(os.path.join(entry, meta["na_file"]))] = np.nan
+    return out
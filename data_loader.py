@@ -0,0 +1,331 @@
+import io
+import os
+import re
+from importlib.util import find_spec
+
+import numpy as np
+import pandas as pd
+
+from csv_schema import NA_VALUES, SCHEMA_FILE, load_schema
+from utils import get_switchable_cols, get_sensor_cols
+
+TIMEZONE = 'Asia/Taipei'
+CHUNK_ROWS = 50000 # 分塊讀取時每塊的列數
+ARROW_BLOCK_BYTES = 1 << 22 # pyarrow 串流讀取每塊的位元組數
+MAX_RETYPES = 3 # 依錯誤訊息逐欄改以文字重讀的上限，超過時所有數值欄位一次改以文字讀取
+TAIL_SCAN_BYTES = 65536 # 由檔尾往前尋找換行字元時每次讀取的大小
+
+
+class IngestCancelled(Exception):
+    """使用者取消載入時拋出"""
+
+
+def parse_sensor_csv(file_path, progress=None, cancel_event=None, on_preview=None, chunksize=CHUNK_ROWS, schema=None,
+                     usecols=None):
+    """
+    依解析結構 (csv_schema) 的欄位型別一次讀取 CSV 並解析時間欄位，回傳 (df, time_col)
+    有安裝 pyarrow 時使用其串流讀取器，否則以 pandas 的 C 引擎分塊讀取。
+    數值欄位出現無法轉換的值時改以文字重新讀取該欄再轉換，
+    各欄位因無法轉換而成為缺值的個數記錄在 df.attrs['coercions'] ({欄位: 個數})
+    progress(rows, bytes_read, total_bytes): 每讀完一塊呼叫一次
+    cancel_event: threading.Event，設定後於下一塊之前拋出 IngestCancelled
+    on_preview(df, time_col): 第一塊解析完成後呼叫，可用於繪製預覽
+    usecols: 只讀取這些欄位 (需包含時間欄；延遲載入時使用)，None 表示全部
+    """
+    schema = schema or load_schema()
+    columns = list(pd.read_csv(file_path, nrows=0).columns)
+    types = schema.plan(columns if usecols is None else [c for c in columns if c in usecols])
+    read = _read_arrow if find_spec('pyarrow') is not None else _read_pandas
+    previewed = [on_preview is None]
+
+    def preview(chunk):
+        if previewed[0]:
+            return
+        previewed[0] = True
+        try:
+            on_preview(*prepare_frame(chunk, schema))
+        except ValueError:
+            pass # 時間欄缺失的錯誤留給完整解析時回報
+
+    retypes = 0
+    while True:
+        try:
+            df = read(file_path, columns, types, chunksize, progress, cancel_event, preview, usecols)
+            break
+        except ValueError as e:
+            failed = _failed_column(e, columns)
+            if failed is not None and types.get(failed) == 'float' and retypes < MAX_RETYPES:
+                types[failed] = 'mixed'
+                retypes += 1
+                print(f"欄位 {failed} 含非數值內容，改以文字讀取後轉換 (可在 {SCHEMA_FILE} 將此欄設為 mixed)")
+            elif 'float' in types.values():
+                # 無法得知是哪一欄 (pandas 引擎) 或問題欄位太多：所有數值欄位改以文字讀取
+                types = {col: 'mixed' if kind == 'float' else kind for col, kind in types.items()}
+                print(f"CSV 含非數值內容，所有數值欄位改以文字讀取後轉換: {e}")
+            else:
+                raise
+    if cancel_event is not None and cancel_event.is_set():
+        raise IngestCancelled()
+    if df is None:
+        raise ValueError("CSV 檔案沒有資料")
+    coercions = {}
+    df, time_col = prepare_frame(df, schema, coercions)
+    df.attrs['coercions'] = coercions
+    return df, time_col
+
+
+def _read_arrow(file_path, columns, types, chunksize, progress, cancel_event, preview, usecols):
+    """以 pyarrow 串流讀取器依型別讀取整個檔案；沒有資料列時回傳 None"""
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    arrow_types = {col: pa.float64() if kind == 'float' else pa.string()
+                   for col, kind in types.items() if kind != 'auto'}
+    total_bytes = os.path.getsize(file_path)
+    batches = []
+    rows = 0
+    with open(file_path, 'rb') as f:
+        # 欄名沿用 pandas 讀出的標頭 (重複欄名已加上 .1 等後綴)；跳過格式錯誤的行
+        reader = pacsv.open_csv(
+            f,
+            read_options=pacsv.ReadOptions(column_names=columns, skip_rows=1, block_size=ARROW_BLOCK_BYTES),
+            parse_options=pacsv.ParseOptions(invalid_row_handler=lambda row: 'skip'),
+            convert_options=pacsv.ConvertOptions(column_types=arrow_types, null_values=NA_VALUES,
+                                                 strings_can_be_null=True, include_columns=list(types)))
+        for batch in reader:
+            if cancel_event is not None and cancel_event.is_set():
+                raise IngestCancelled()
+            batches.append(batch)
+            rows += batch.num_rows
+            if progress is not None:
+                progress(rows, min(f.tell(), total_bytes), total_bytes)
+            if len(batches) == 1:
+                preview(batch.to_pandas())
+    if not rows:
+        return None
+    return pa.Table.from_batches(batches).to_pandas()
+
+
+def _pandas_dtypes(types):
+    """csv_schema 的欄位型別 -> read_csv 的 dtype (auto 由 pandas 判斷)"""
+    return {col: np.float64 if kind == 'float' else str for col, kind in types.items() if kind != 'auto'}
+
+
+def _read_pandas(file_path, columns, types, chunksize, progress, cancel_event, preview, usecols):
+    """以 pandas C 引擎依型別分塊讀取整個檔案；沒有資料列時回傳 None"""
+    dtype = _pandas_dtypes(types)
+    total_bytes = os.path.getsize(file_path)
+    chunks = []
+    rows = 0
+    with open(file_path, 'rb') as f:
+        # 使用 on_bad_lines='skip' 跳過格式錯誤的行 (適用於 pandas 1.3.0+)
+        reader = pd.read_csv(f, dtype=dtype, usecols=usecols, on_bad_lines='skip', chunksize=chunksize)
+        for chunk in reader:
+            if cancel_event is not None and cancel_event.is_set():
+                raise IngestCancelled()
+            chunks.append(chunk)
+            rows += len(chunk)
+            if progress is not None:
+                progress(rows, min(f.tell(), total_bytes), total_bytes)
+            if len(chunks) == 1:
+                preview(chunk.copy())
+    if not rows:
+        return None
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def _failed_column(error, columns):
+    """從 pyarrow 的轉換錯誤訊息取出出錯的欄位名稱；無法判斷時回傳 None"""
+    m = re.search(r"column #(\d+)", str(error))
+    if m and int(m.group(1)) < len(columns):
+        return columns[int(m.group(1))]
+    return None
+
+
+def _count_coerced(coercions, col, mask):
+    if coercions is not None:
+        n = int(mask.sum())
+        if n:
+            coercions[col] = coercions.get(col, 0) + n
+
+
+def _parse_datetime(text, fmt):
+    """以指定格式解析 Date + ' ' + Time；整欄都不符合格式時 (其他工具匯出的檔案) 改為自動判斷"""
+    if fmt:
+        dt = pd.to_datetime(text, format=fmt, errors='coerce')
+        if dt.notna().any() or text.isna().all():
+            return dt
+    return pd.to_datetime(text, errors='coerce')
+
+
+def prepare_frame(df, schema=None, coercions=None):
+    """
+    將仍為文字的數值欄位轉為數值、依解析結構解析時間並排序 (穩定排序：只讀部分欄位時列順序相同)，回傳 (df, time_col)
+    coercions: 傳入 dict 時累計各欄位因無法轉換而成為缺值的個數 (時間欄記為 Timestamp / Datetime)
+    """
+    schema = schema or load_schema()
+    for col in get_sensor_cols(df):
+        values = df[col]
+        if schema.column_type(col) in ('float', 'mixed') and not pd.api.types.is_numeric_dtype(values):
+            df[col] = pd.to_numeric(values, errors='coerce').astype(np.float64)
+            _count_coerced(coercions, col, values.notna() & df[col].isna())
+    if 'Timestamp' in df.columns:
+        raw = df['Timestamp']
+        seconds = raw if pd.api.types.is_numeric_dtype(raw) else pd.to_numeric(raw, errors='coerce')
+        timestamps = pd.to_datetime(seconds, unit=schema.timestamp_unit, errors='coerce', utc=True)
+        _count_coerced(coercions, 'Timestamp', raw.notna() & timestamps.isna())
+        df['Timestamp'] = timestamps.dt.tz_convert(TIMEZONE)
+        df = df.sort_values('Timestamp', ignore_index=True, kind='stable')
+        time_col = 'Timestamp'
+    elif 'Date' in df.columns and 'Time' in df.columns:
+        text = df['Date'] + ' ' + df['Time']
+        datetimes = _parse_datetime(text, schema.datetime_format)
+        _count_coerced(coercions, 'Datetime', text.notna() & datetimes.isna())
+        df['Datetime'] = datetimes.dt.tz_localize(TIMEZONE)
+        df = df.sort_values('Datetime', ignore_index=True, kind='stable')
+        time_col = 'Datetime'
+    else:
+        raise ValueError("CSV 沒有 Timestamp 或 Date/Time 欄")
+    return df, time_col
+
+
+def compact_frame(df, float32=False):
+    """
+    就地壓縮欄位型別：開關欄位轉為共用狀態詞彙的 categorical (每格只存 int8 代碼)，
+    float32=True 時再將 float64 感測欄位降為 float32。已壓縮過的欄位會略過。回傳 df
+    """
+    switch_cols = [c for c in get_switchable_cols(df) if not isinstance(df[c].dtype, pd.CategoricalDtype)]
+    if switch_cols:
+        # 以原本 astype(str) 的字串作為狀態，缺值仍為缺值 (代碼 -1)
+        as_str = {c: df[c].astype(str).where(df[c].notna()) for c in switch_cols}
+        vocabulary = sorted(set().union(*(s.dropna().unique() for s in as_str.values())))
+        state_dtype = pd.CategoricalDtype(vocabulary)
+        for col, s in as_str.items():
+            df[col] = s.astype(state_dtype)
+    if float32:
+        for col in get_sensor_cols(df):
+            if df[col].dtype == np.float64:
+                df[col] = df[col].astype(np.float32)
+    return df
+
+
+def memory_report(df, time_col=None):
+    """回傳各欄位群組 (時間 / 開關 / 感測 / 其他) 實際佔用的位元組數"""
+    usage = df.memory_usage(deep=True, index=True)
+    switch_cols = set(get_switchable_cols(df))
+    sensor_cols = set(get_sensor_cols(df))
+    report = {'time': 0, 'switch': 0, 'sensor': 0, 'other': 0}
+    for col, nbytes in usage.items():
+        if col == time_col:
+            report['time'] += nbytes
+        elif col in switch_cols:
+            report['switch'] += nbytes
+        elif col in sensor_cols:
+            report['sensor'] += nbytes
+        else:
+            report['other'] += nbytes # 索引與其餘欄位
+    report['total'] = int(usage.sum())
+    return report
+
+
+def load_sensor_data(file_path, cache=None, progress=None, cancel_event=None, on_preview=None, float32=False):
+    """
+    載入感測器資料。若提供 cache (data_cache.FrameCache) 且快取仍有效，
+    直接讀取快取；否則解析 CSV 並寫入快取。回傳 (df, time_col)
+    開關欄位一律壓縮為 categorical；float32=True 時感測欄位降為 float32 (快取內仍保留 float64)
+    其餘參數傳給 parse_sensor_csv
+    """
+    if cache is not None:
+        cached = cache.load(file_path)
+        if cached is not None:
+            if progress is not None:
+                size = os.path.getsize(file_path)
+                progress(len(cached[0]), size, size)
+            df, time_col = cached
+            return compact_frame(df, float32=float32), time_col
+    df, time_col = parse_sensor_csv(file_path, progress=progress, cancel_event=cancel_event, on_preview=on_preview)
+    compact_frame(df)
+    if cache is not None:
+        cache.store(file_path, df, time_col)
+    return compact_frame(df, float32=float32), time_col
+
+
+def complete_size(file_path):
+    """回傳檔案中最後一個完整行 (以換行結尾) 之後的位元組位置，尚在寫入的最後一行不計入"""
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        pos = size
+        while pos > 0:
+            start = max(0, pos - TAIL_SCAN_BYTES)
+            f.seek(start)
+            block = f.read(pos - start)
+            idx = block.rfind(b'\n')
+            if idx >= 0:
+                return start + idx + 1
+            pos = start
+    return 0
+
+
+class CsvTail:
+    """
+    追蹤仍在寫入中的 CSV：記住已解析到的位元組位置，
+    read() 只解析之後新增的完整行，未寫完的最後一行留到下次
+    """
+
+    def __init__(self, file_path, offset=None):
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            header = f.readline()
+        self.columns = list(pd.read_csv(io.BytesIO(header), nrows=0).columns)
+        self.schema = load_schema()
+        self.types = self.schema.plan(self.columns) # 與開檔時相同的欄位型別 (狀態碼以文字讀取，保留前導 0)
+        # offset 不可落在標頭之前，否則會把標頭當成資料
+        self.offset = max(len(header), complete_size(file_path) if offset is None else offset)
+
+    def read(self):
+        """回傳新增資料的 (df, time_col)；沒有新的完整行時回傳 None"""
+        size = os.path.getsize(self.file_path)
+        if size < self.offset:
+            raise ValueError("檔案大小變小，可能已被重新建立，請重新開啟")
+        if size == self.offset:
+            return None
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        end = data.rfind(b'\n')
+        if end < 0:
+            return None # 只有寫到一半的行
+        self.offset += end + 1
+        try:
+            df = self._parse(data[:end + 1], self.types)
+        except ValueError:
+            # 數值欄位混有文字：這一批改以文字讀取，由 prepare_frame 轉為數值
+            df = self._parse(data[:end + 1], {col: 'mixed' if kind == 'float' else kind
+                                              for col, kind in self.types.items()})
+        if df.empty:
+            return None
+        return prepare_frame(df, self.schema)
+
+    def _parse(self, data, types):
+        return pd.read_csv(io.BytesIO(data), header=None, names=self.columns, dtype=_pandas_dtypes(types),
+                           on_bad_lines='skip')
+
+
+def append_frame(df, new_rows):
+    """
+    將新資料列接到 df 之後並回傳新的 DataFrame。
+    開關欄位沿用 df 的 categorical 詞彙 (出現新狀態時擴充)，數值欄位轉為 df 的型別
+    """
+    df = df.copy(deep=False) # 可能是切片，擴充詞彙時不修改原物件
+    new_rows = new_rows.reindex(columns=df.columns)
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            values = new_rows[col].astype(str).where(new_rows[col].notna())
+            missing = [v for v in values.dropna().unique() if v not in dtype.categories]
+            if missing:
+                df[col] = df[col].cat.add_categories(missing)
+                dtype = df[col].dtype
+            new_rows[col] = values.astype(dtype)
+        elif dtype.kind == 'f':
+            new_rows[col] = pd.to_numeric(new_rows[col], errors='coerce').astype(dtype)
+    return pd.concat([df, new_rows], ignore_index=True)
@@ -0,0 +1,171 @@
+import glob
+import os
+import re
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from data_loader import TIMEZONE, IngestCancelled, compact_frame, load_sensor_data, prepare_frame
+
+# 匯出程式的檔名：mongo_result_YYYYMMDD_HHMM_YYYYMMDD_HHMM_1s.csv
+FILENAME_PATTERN = re.compile(r'(\d{8}_\d{4})_(\d{8}_\d{4})')
+DEFAULT_MAX_FILES = 8 # 同時保留在記憶體中的檔案數
+
+
+class FilePart:
+    """資料集中的一個 CSV 檔案與其時間範圍 (tz-aware Timestamp)"""
+
+    def __init__(self, path, start, end):
+        self.path = path
+        self.start = start
+        self.end = end
+
+    def overlaps(self, start, end):
+        return self.start <= end and self.end >= start
+
+
+class MultiFileDataset:
+    """
+    由多個 CSV (例如每班一個檔案) 組成的邏輯資料集。
+    建立時只讀取標頭與各檔案的時間範圍，依時間排序成檔案邊界索引；
+    load_window() 只載入與時間範圍重疊的檔案並串接，超過 max_files 的檔案依 LRU 釋放
+    """
+
+    def __init__(self, paths, cache=None, float32=False, max_files=DEFAULT_MAX_FILES):
+        self.cache = cache
+        self.float32 = float32
+        self.max_files = max_files
+        self.parts = sorted((_probe_part(p, cache) for p in paths), key=lambda part: (part.start, part.path))
+        if not self.parts:
+            raise ValueError("資料集中沒有 CSV 檔案")
+        self.columns = _union_columns(p.path for p in self.parts)
+        self.time_min = self.parts[0].start
+        self.time_max = max(p.end for p in self.parts)
+        self._frames = OrderedDict() # path -> (df, time_col)，最近使用的在最後
+        self._combined_key = None
+        self._combined = None
+
+    @classmethod
+    def from_folder(cls, folder, **kwargs):
+        paths = sorted(glob.glob(os.path.join(folder, '*.csv')))
+        return cls(paths, **kwargs)
+
+    def parts_for(self, start, end):
+        return [p for p in self.parts if p.overlaps(start, end)]
+
+    def window_key(self, start, end):
+        """[start, end] 需要的檔案 (路徑 tuple)"""
+        return tuple(p.path for p in self.parts_for(start, end))
+
+    def is_loaded(self, start, end):
+        """[start, end] 所需的檔案是否都已在目前串接的資料中"""
+        return self._combined_key is not None and set(self.window_key(start, end)) <= set(self._combined_key)
+
+    def load_window(self, start, end, progress=None, cancel_event=None):
+        """
+        載入與 [start, end] 重疊的檔案並串接 (依時間排序，去除檔案重疊處的重複時間)，回傳 (df, time_col)
+        progress(rows, bytes_read, total_bytes) 以所有需要載入的檔案合計
+        """
+        parts = self.parts_for(start, end)
+        if not parts: # 範圍內沒有檔案時載入最接近的一個，維持欄位與時間欄
+            parts = [min(self.parts, key=lambda p: abs((p.start - start).total_seconds()))]
+        key = tuple(p.path for p in parts)
+        if key == self._combined_key:
+            return self._combined
+
+        total_bytes = sum(os.path.getsize(p.path) for p in parts)
+        done_bytes = 0
+        frames = []
+        for part in parts:
+            if cancel_event is not None and cancel_event.is_set():
+                raise IngestCancelled()
+            size = os.path.getsize(part.path)
+            if part.path in self._frames:
+                self._frames.move_to_end(part.path)
+            else:
+                def part_progress(rows, bytes_read, _total, offset=done_bytes):
+                    if progress is not None:
+                        progress(rows, offset + bytes_read, total_bytes)
+                self._frames[part.path] = load_sensor_data(part.path, cache=self.cache, progress=part_progress,
+                                                           cancel_event=cancel_event, float32=self.float32)
+            done_bytes += size
+            frames.append(self._frames[part.path])
+        self._evict(keep=key)
+
+        self._combined = _concat_frames(frames, self.columns, self.float32)
+        self._combined_key = key
+        return self._combined
+
+    def _evict(self, keep):
+        while len(self._frames) > max(self.max_files, len(keep)):
+            for path in self._frames:
+                if path not in keep:
+                    del self._frames[path]
+                    break
+            else:
+                break
+
+
+def _probe_part(path, cache):
+    """取得檔案的時間範圍：優先使用檔名，其次讀取快取，最後只解析時間欄"""
+    m = FILENAME_PATTERN.search(os.path.basename(path))
+    if m:
+        try:
+            start = pd.Timestamp(pd.to_datetime(m.group(1), format='%Y%m%d_%H%M')).tz_localize(TIMEZONE)
+            end = pd.Timestamp(pd.to_datetime(m.group(2), format='%Y%m%d_%H%M')).tz_localize(TIMEZONE)
+            if end >= start:
+                return FilePart(path, start, end)
+        except ValueError:
+            pass
+    cached = cache.load(path) if cache is not None else None
+    if cached is not None:
+        df, time_col = cached
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        time_cols = ['Timestamp'] if 'Timestamp' in header else [c for c in ('Date', 'Time') if c in header]
+        df, time_col = prepare_frame(pd.read_csv(path, usecols=time_cols, on_bad_lines='skip'))
+    times = df[time_col].dropna()
+    if times.empty:
+        raise ValueError(f"{os.path.basename(path)} 沒有有效的時間資料")
+    return FilePart(path, pd.Timestamp(times.iloc[0]), pd.Timestamp(times.iloc[-1]))
+
+
+def _union_columns(paths):
+    """依出現順序合併各檔案的欄位名稱 (只讀標頭)"""
+    columns = []
+    seen = set()
+    for path in paths:
+        for col in pd.read_csv(path, nrows=0).columns:
+            if col not in seen:
+                seen.add(col)
+                columns.append(col)
+    return columns
+
+
+def _concat_frames(frames, columns, float32):
+    """
+    依檔案開始時間串接各檔的 (df, time_col)。後面的檔案與前面檔案重疊時，
+    已出現過的時間點只保留較早檔案的資料列 (同一檔案內的資料列不受影響)
+    """
+    time_col = frames[0][1]
+    if any(tc != time_col for _, tc in frames):
+        raise ValueError("資料集中的檔案時間欄格式不一致 (Timestamp 與 Date/Time 混用)")
+    target = list(columns) if time_col in columns else list(columns) + [time_col]
+    if len(frames) == 1:
+        return compact_frame(frames[0][0].reindex(columns=target), float32=float32), time_col
+    pieces = []
+    seen_ns = np.empty(0, dtype='i8')
+    for df, _ in frames:
+        t_ns = df[time_col].values.astype('datetime64[ns]').view('i8')
+        if len(seen_ns):
+            # 只需檢查不晚於已載入資料最後時間的列
+            dup = (t_ns <= seen_ns[-1]) & np.isin(t_ns, seen_ns)
+            df = df[~dup]
+            t_ns = t_ns[~dup]
+        pieces.append(df)
+        seen_ns = np.union1d(seen_ns, t_ns)
+    out = pd.concat(pieces, ignore_index=True).reindex(columns=target)
+    out = out.sort_values(time_col, kind='stable', ignore_index=True)
+    # 各檔的狀態詞彙不同時 concat 會退回 object，重新壓縮成共用詞彙
+    return compact_frame(out, float32=float32), time_col
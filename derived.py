@@ -0,0 +1,291 @@
+import ast
+import operator
+import re
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils import SWITCH_PREFIXES, NON_SENSOR_COLS
+
+TAG_PATTERN = re.compile(r"\{([^{}]+)\}") # 運算式中以 {tag} 引用欄位 (tag 含 '-'，不能直接當變數名)
+CACHE_SIZE = 16 # 保留最近幾個 (運算式, 資料範圍) 的計算結果
+CONSTANTS = {'pi': np.pi, 'nan': np.nan}
+
+# 說明文字 (衍生通道對話框)
+HELP_TEXT = (
+    "以 {tag} 引用欄位，可用 + - * / ** % 與比較運算 (結果為 1 / 0)。\n"
+    "函式：abs sqrt log log10 exp min max clip where av\n"
+    "      diff(x, n) rate(x) cumsum(x) integrate(x, per=3600)\n"
+    "      rolling_mean / rolling_min / rolling_max / rolling_std(x, n)\n"
+    "開關欄位的值為狀態碼的二進位數值 ('01' -> 1, '10' -> 2, '11' -> 3)，av(x) 同 av_upscale。\n"
+    "n 為樣本數；cumsum / integrate 從目前資料的第一筆開始累計"
+)
+
+_BINARY_OPS = {
+    ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.true_divide,
+    ast.Pow: np.power, ast.Mod: np.mod,
+}
+_UNARY_OPS = {ast.USub: np.negative, ast.UAdd: np.positive}
+_COMPARE_OPS = {
+    ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+    ast.Eq: operator.eq, ast.NotEq: operator.ne,
+}
+
+
+def _shift(x, n):
+    out = np.full(len(x), np.nan)
+    if 0 <= n < len(x):
+        out[n:] = x[:len(x) - n]
+    return out
+
+
+def _diff(x, n=1):
+    return x - _shift(x, int(n))
+
+
+def _rolling(method):
+    def rolling(x, n):
+        return getattr(pd.Series(x).rolling(int(n), min_periods=1), method)().to_numpy()
+    return rolling
+
+
+def _where(cond, a, b):
+    return np.where(np.nan_to_num(cond) != 0, a, b)
+
+
+def _av(x):
+    """狀態碼數值的 av_upscale：'11' (3) -> 1、'10' (2) -> 0、其他 -> -1"""
+    return np.where(x == 3, 1.0, np.where(x == 2, 0.0, -1.0))
+
+
+def _rate(t, x):
+    """每秒變化率"""
+    return _diff(x) / _diff(t)
+
+
+def _integrate(t, x, per=3600):
+    """依時間 (梯形法) 累計，per: 速率的時間單位秒數 (例如 m3/h 為 3600)"""
+    if len(x) < 2:
+        return np.zeros(len(x))
+    steps = np.nan_to_num((x[1:] + x[:-1]) / 2 * np.diff(t))
+    return np.concatenate(([0.0], np.cumsum(steps))) / per
+
+
+FUNCTIONS = {
+    'abs': np.abs, 'sqrt': np.sqrt, 'log': np.log, 'log10': np.log10, 'exp': np.exp,
+    'min': np.fmin, 'max': np.fmax, 'clip': np.clip, 'where': _where, 'av': _av,
+    'diff': _diff, 'cumsum': np.nancumsum,
+    'rolling_mean': _rolling('mean'), 'rolling_min': _rolling('min'),
+    'rolling_max': _rolling('max'), 'rolling_std': _rolling('std'),
+}
+TIME_FUNCTIONS = {'rate': _rate, 'integrate': _integrate} # 第一個參數為時間 (epoch 秒)，呼叫時自動帶入
+
+
+def _state_number(label):
+    """狀態碼字串 -> 二進位數值；不是 0/1 組成的狀態為 NaN"""
+    s = str(label).strip().strip("'\"")
+    return float(int(s, 2)) if s and set(s) <= {'0', '1'} else np.nan
+
+
+def state_values(series):
+    """開關欄位 -> 每列狀態碼的數值 (float，缺值為 NaN)"""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(str).where(series.notna()).astype('category')
+    lut = np.array([_state_number(v) for v in series.cat.categories] + [np.nan])
+    return lut[series.cat.codes.to_numpy()] # 代碼 -1 (缺值) 對應到最後的 NaN
+
+
+class DerivedExpression:
+    """
+    衍生通道的運算式：以 ast 解析並只允許數值運算、比較與 FUNCTIONS 中的函式，
+    不經過 eval；evaluate() 以 NumPy 對整欄向量化計算
+    """
+
+    def __init__(self, text):
+        self.text = text.strip()
+        self.tags = [] # 引用的欄位，依第一次出現的順序
+
+        def placeholder(m):
+            tag = m.group(1).strip()
+            if tag not in self.tags:
+                self.tags.append(tag)
+            return f"_t{self.tags.index(tag)}"
+        source = TAG_PATTERN.sub(placeholder, self.text)
+        if not self.text:
+            raise ValueError("運算式不可為空白")
+        try:
+            tree = ast.parse(source, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"運算式語法錯誤：{e.msg}")
+        self._check(tree.body)
+        self._tree = tree.body
+
+    def _check(self, node):
+        if isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+                raise ValueError(f"不支援的常數：{node.value!r}")
+        elif isinstance(node, ast.Name):
+            if not (re.fullmatch(r"_t\d+", node.id) or node.id in CONSTANTS):
+                raise ValueError(f"未知的名稱 {node.id}，欄位請以 {{tag}} 引用")
+        elif isinstance(node, ast.BinOp):
+            if type(node.op) not in _BINARY_OPS:
+                raise ValueError("不支援的運算子")
+            self._check(node.left)
+            self._check(node.right)
+        elif isinstance(node, ast.UnaryOp):
+            if type(node.op) not in _UNARY_OPS:
+                raise ValueError("不支援的運算子")
+            self._check(node.operand)
+        elif isinstance(node, ast.Compare):
+            if len(node.ops) != 1 or type(node.ops[0]) not in _COMPARE_OPS:
+                raise ValueError("比較運算一次只能比較兩個值")
+            self._check(node.left)
+            self._check(node.comparators[0])
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or (node.func.id not in FUNCTIONS
+                                                       and node.func.id not in TIME_FUNCTIONS):
+                raise ValueError(f"未知的函式：{ast.unparse(node.func)}")
+            for arg in node.args:
+                self._check(arg)
+            for kw in node.keywords:
+                if kw.arg is None:
+                    raise ValueError("不支援 ** 參數")
+                self._check(kw.value)
+        else:
+            raise ValueError(f"不支援的語法：{ast.unparse(node)}")
+
+    def evaluate(self, inputs, t):
+        """inputs: 與 tags 對應的 float 陣列；t: epoch 秒 (float)。回傳 float 陣列，inf 視為 NaN"""
+        with np.errstate(all='ignore'):
+            out = np.array(self._eval(self._tree, inputs, t), dtype=float) # 複製，不改到輸入或 pandas 的唯讀陣列
+        if out.ndim == 0: # 只有常數
+            out = np.full(len(t), float(out))
+        out[~np.isfinite(out)] = np.nan
+        return out
+
+    def _eval(self, node, inputs, t):
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id in CONSTANTS:
+                return CONSTANTS[node.id]
+            return inputs[int(node.id[2:])]
+        if isinstance(node, ast.BinOp):
+            return _BINARY_OPS[type(node.op)](self._eval(node.left, inputs, t), self._eval(node.right, inputs, t))
+        if isinstance(node, ast.UnaryOp):
+            return _UNARY_OPS[type(node.op)](self._eval(node.operand, inputs, t))
+        if isinstance(node, ast.Compare):
+            left = self._eval(node.left, inputs, t)
+            right = self._eval(node.comparators[0], inputs, t)
+            return np.asarray(_COMPARE_OPS[type(node.ops[0])](left, right), dtype=float)
+        args = [self._eval(arg, inputs, t) for arg in node.args]
+        kwargs = {kw.arg: self._eval(kw.value, inputs, t) for kw in node.keywords}
+        name = node.func.id
+        try:
+            if name in TIME_FUNCTIONS:
+                return TIME_FUNCTIONS[name](t, *args, **kwargs)
+            return FUNCTIONS[name](*args, **kwargs)
+        except TypeError as e:
+            raise ValueError(f"{name}() 參數錯誤：{e}")
+
+
+class DerivedChannels:
+    """
+    使用者定義的衍生通道 (名稱 -> 運算式)，在欄位清單中與一般感測欄位相同。
+    結果依 (運算式, 資料範圍) 快取，同一份資料重繪或切換勾選時不重新計算；
+    last_eval 記錄各通道最近一次實際計算的秒數
+    """
+
+    def __init__(self, definitions=None):
+        self.expressions = OrderedDict()
+        self.last_eval = {}
+        self._cache = OrderedDict() # (運算式, 資料範圍) -> 結果陣列
+        self._resolving = set() # 計算中的通道，用於偵測互相引用
+        for name, text in (definitions or {}).items():
+            try:
+                self.define(name, text)
+            except ValueError as e:
+                print(f"衍生通道 {name} 定義錯誤，已略過: {e}")
+
+    @property
+    def names(self):
+        return list(self.expressions)
+
+    def definitions(self):
+        """{名稱: 運算式文字}，存入 config.json"""
+        return {name: expr.text for name, expr in self.expressions.items()}
+
+    def define(self, name, text):
+        """新增或更新衍生通道；名稱或運算式不正確時拋出 ValueError"""
+        name = name.strip()
+        if not name or '{' in name or '}' in name:
+            raise ValueError("請輸入通道名稱 (不可包含大括號)")
+        if name.startswith(SWITCH_PREFIXES) or name in NON_SENSOR_COLS:
+            raise ValueError(f"通道名稱不可使用開關前綴 {', '.join(SWITCH_PREFIXES)} 或時間欄名稱")
+        expr = DerivedExpression(text)
+        if name in expr.tags:
+            raise ValueError("運算式不可引用通道本身")
+        self.expressions[name] = expr
+        self._cache.clear() # 引用此通道的其他通道結果也會改變
+        return expr
+
+    def remove(self, name):
+        self.expressions.pop(name, None)
+        self.last_eval.pop(name, None)
+        self._cache.clear()
+
+    def inputs(self, names):
+        """通道引用的資料欄位 (展開引用的其他衍生通道)"""
+        out = []
+        pending = list(names)
+        seen = set()
+        while pending:
+            name = pending.pop(0)
+            if name in seen or name not in self.expressions:
+                continue
+            seen.add(name)
+            for tag in self.expressions[name].tags:
+                if tag in self.expressions:
+                    pending.append(tag)
+                elif tag not in out:
+                    out.append(tag)
+        return out
+
+    def evaluate(self, name, df, time_col, window_key=None):
+        """
+        計算通道在 df 所有列的值 (float 陣列，列順序與 df 相同)。
+        window_key: 代表目前資料範圍的 key (例如列數與首尾時間)，相同時使用快取；缺少欄位時拋出 ValueError
+        """
+        expr = self.expressions[name]
+        key = (expr.text, window_key)
+        if window_key is not None and key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        if name in self._resolving:
+            raise ValueError(f"衍生通道 {name} 互相引用")
+        self._resolving.add(name)
+        try:
+            t0 = time.perf_counter()
+            inputs = [self._input(tag, df, time_col, window_key) for tag in expr.tags]
+            t = df[time_col].values.astype('datetime64[ns]').view('i8') / 1e9
+            values = expr.evaluate(inputs, t)
+            self.last_eval[name] = time.perf_counter() - t0
+        finally:
+            self._resolving.discard(name)
+        if window_key is not None:
+            values.setflags(write=False)
+            self._cache[key] = values
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return values
+
+    def _input(self, tag, df, time_col, window_key):
+        if tag in self.expressions:
+            return self.evaluate(tag, df, time_col, window_key)
+        if tag not in df.columns:
+            raise ValueError(f"找不到欄位 {tag}")
+        if tag.startswith(SWITCH_PREFIXES):
+            return state_values(df[tag])
+        return pd.to_numeric(df[tag], errors='coerce').to_numpy(dtype=float)
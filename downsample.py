@@ -0,0 +1,40 @@
+import numpy as np
+
+# 每個水平像素保留的點數 (min/max 各一點)
+POINTS_PER_PIXEL = 2
+
+
+def minmax_indices(y, n_buckets):
+    """
+    min/max 包絡抽樣：將序列等分成 n_buckets 段，每段保留最小值與最大值的位置 (依原順序)，
+    因此尖峰不會被抽掉。資料量不足 2 * n_buckets 時回傳 None 表示不需抽樣
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    n_buckets = int(n_buckets)
+    if n_buckets <= 0 or n <= 2 * n_buckets:
+        return None
+    size = -(-n // n_buckets) # 每段筆數 (無條件進位)
+    rows = -(-n // size)
+    padded = np.full(rows * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(rows, size)
+    nan_mask = np.isnan(padded)
+    # 全為 NaN 的段 argmin/argmax 都回傳 0，會保留該段第一筆 NaN，使線條在缺值處斷開
+    lo = np.where(nan_mask, np.inf, padded).argmin(axis=1)
+    hi = np.where(nan_mask, -np.inf, padded).argmax(axis=1)
+    offsets = np.arange(rows) * size
+    idx = np.sort(np.column_stack((lo, hi)), axis=1) + offsets[:, None]
+    # 保留首尾兩筆，讓線條涵蓋完整的時間範圍
+    idx = np.concatenate(([0], idx.ravel(), [n - 1]))
+    keep = np.ones(len(idx), dtype=bool)
+    keep[1:] = idx[1:] != idx[:-1]
+    return idx[keep]
+
+
+def decimate(x, y, n_buckets):
+    """依 minmax_indices 抽樣 (x, y)；不需抽樣時原樣回傳"""
+    idx = minmax_indices(y, n_buckets)
+    if idx is None:
+        return x, y
+    return x[idx], np.asarray(y)[idx]
@@ -0,0 +1,117 @@
+import gzip
+import io
+import os
+from importlib.util import find_spec
+
+EXPORT_CHUNK_ROWS = 100000 # 每次寫入的列數，匯出時只多佔用一塊的記憶體
+DEFAULT_ENCODING = 'utf-8-sig' # 含 BOM，Excel 可直接開啟中文
+
+# 副檔名 -> 格式 (較長的副檔名先比對)
+FORMATS = (
+    ('.csv.gz', 'csv.gz'),
+    ('.csv.zst', 'csv.zst'),
+    ('.parquet', 'parquet'),
+    ('.csv', 'csv'),
+)
+# 需要額外套件的格式 (未安裝時無法選用)
+OPTIONAL_PACKAGES = {'csv.zst': 'zstandard', 'parquet': 'pyarrow'}
+# 存檔對話框的檔案類型
+FILETYPES = [
+    ("CSV Files", "*.csv"),
+    ("CSV (gzip 壓縮)", "*.csv.gz"),
+    ("CSV (zstd 壓縮)", "*.csv.zst"),
+    ("Parquet", "*.parquet"),
+    ("All Files", "*.*"),
+]
+
+
+class ExportCancelled(Exception):
+    """使用者取消匯出時拋出"""
+
+
+def export_format(path):
+    """依副檔名判斷匯出格式；無法辨識時視為 CSV"""
+    lower = path.lower()
+    for suffix, fmt in FORMATS:
+        if lower.endswith(suffix):
+            return fmt
+    return 'csv'
+
+
+def check_format(fmt):
+    """確認匯出格式需要的套件已安裝，缺少時拋出 ValueError"""
+    package = OPTIONAL_PACKAGES.get(fmt)
+    if package and find_spec(package) is None:
+        raise ValueError(f"匯出 {fmt} 需要安裝 {package} 套件 (pip install {package})")
+
+
+def export_frame(df, columns, path, i0=0, i1=None, encoding=DEFAULT_ENCODING, chunk_rows=EXPORT_CHUNK_ROWS,
+                 progress=None, cancel_event=None):
+    """
+    將 df 第 [i0, i1) 列的 columns 分塊寫入 path，格式由副檔名決定 (CSV / .csv.gz / .csv.zst / .parquet)。
+    先寫入暫存檔，完成後才改名為 path；取消 (ExportCancelled) 或失敗時刪除暫存檔，不留下不完整的檔案。
+    progress(rows_written, total_rows): 每寫完一塊呼叫一次；cancel_event: threading.Event
+    回傳寫入的列數
+    """
+    fmt = export_format(path)
+    check_format(fmt)
+    i1 = len(df) if i1 is None else i1
+    total = max(0, i1 - i0)
+    tmp_path = path + '.part'
+
+    def chunks():
+        for a in range(i0, i1, chunk_rows):
+            if cancel_event is not None and cancel_event.is_set():
+                raise ExportCancelled()
+            yield df.iloc[a:min(a + chunk_rows, i1)][columns]
+            if progress is not None:
+                progress(min(a + chunk_rows, i1) - i0, total)
+
+    try:
+        if fmt == 'parquet':
+            _write_parquet(chunks(), tmp_path)
+        else:
+            with _open_text(tmp_path, fmt, encoding) as f:
+                header = True
+                for chunk in chunks():
+                    chunk.to_csv(f, index=False, header=header)
+                    header = False
+                if header: # 範圍內沒有資料時仍寫出標題列
+                    df.iloc[:0][columns].to_csv(f, index=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return total
+
+
+def _open_text(path, fmt, encoding):
+    """開啟 (壓縮) 文字輸出串流；newline='' 讓換行與直接 to_csv(path) 相同"""
+    if fmt == 'csv.gz':
+        return gzip.open(path, 'wt', encoding=encoding, newline='')
+    if fmt == 'csv.zst':
+        import zstandard
+        raw = open(path, 'wb')
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding=encoding, newline='')
+    return open(path, 'w', encoding=encoding, newline='')
+
+
+def _write_parquet(chunks, path):
+    """以第一塊的 schema 逐塊寫入 Parquet (zstd 壓縮)；開關欄位的 categorical 寫成 dictionary 欄位"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    schema = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = pq.ParquetWriter(path, schema, compression='zstd')
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError("此範圍內沒有資料")
@@ -3,21 +3,38 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pytz
 import customtkinter as ctk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-import matplotlib.patches as mpatches
 import threading # <--- Added import
 from utils import (
     pick_datetime_with_default,
     get_switchable_cols,
     get_sensor_cols,
-    state_color,
     av_upscale,
     get_equipment_chinese_name # 新增導入
     # pick_file # utils.py 中已經有 pick_file, 但 gui.py 中直接用 filedialog.askopenfilename
 )
+from data_cache import FrameCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_MB
+from data_loader import load_sensor_data, memory_report, complete_size, append_frame, CsvTail, IngestCancelled
+from column_store import ColumnStore, DEFAULT_BUDGET_MB, DEFAULT_LAZY_LOAD_MB
+from derived import DerivedChannels, HELP_TEXT as DERIVED_HELP_TEXT
+from dataset import MultiFileDataset
+from exporter import export_frame, export_format, check_format, ExportCancelled, DEFAULT_ENCODING, FILETYPES
+from pyramid import MinMaxPyramid, load_or_build_pyramid, epoch_seconds
+from time_index import TimeIndex
+from plot_view import PlotView
+from profiler import StageProfiler
+from range_stats import RangeStats
+from transitions import TransitionIndex
+from renderer import update_view, ViewSpec, FrameSource, RenderSource, png_filename, split_windows
+from render_queue import RenderQueue
+from search_index import SearchIndex
+from sensor_list import VirtualSensorList
+import render_scheduler
+from render_scheduler import RenderScheduler
 import datetime
 import sys # 用於關閉程式
+import copy
 import json
 import os
 
@@ -34,14 +51,45 @@ class SensorPicker(ctk.CTk):
         
         self.df_all = None
         self.time_col = None
+        self.time_index = None # 時間欄的 epoch 索引 (time_index.TimeIndex)
+        self.pyramid = None # 多解析度 min/max 金字塔 (pyramid.MinMaxPyramid)
+        self.range_stats = None # 感測欄位的範圍統計 (range_stats.RangeStats)
+        self.transitions = None # 開關欄位的狀態轉換索引 (transitions.TransitionIndex)
+        self._plot_rows = None # 目前圖表範圍在 df_all 中的列區間 [i0, i1)
+        self.stats_window = None # 感測器統計表視窗
+        self.switch_window = None # 開關統計表視窗
+        self._last_event_text = '' # 最近一次跳到的狀態轉換 (顯示於開關統計表)
+        self.dataset = None # 開啟資料夾或多個檔案時的 dataset.MultiFileDataset
+        self.column_store = None # 延遲載入模式的 column_store.ColumnStore (df_all 只有時間欄與已載入的欄位)
+        self.lazy_load_mb = DEFAULT_LAZY_LOAD_MB # 檔案大於此大小 (MB) 時延遲載入欄位 (config.json 的 lazy_load_mb)
+        self.column_budget_mb = DEFAULT_BUDGET_MB # 延遲載入時已載入欄位的記憶體預算 (config.json 的 column_budget_mb)
+        self._columns_loading = False # 延遲載入模式有欄位正在背景讀取
+        self.derived = DerivedChannels() # 使用者定義的衍生通道 (config.json 的 derived_channels)
+        self._data_sensor_cols = [] # 資料本身的感測欄位 (sensor_all 另外加上衍生通道)
+        self.derived_window = None # 衍生通道對話框
+        self._dataset_skip_key = None # 取消或失敗的資料集範圍，避免重繪時反覆重新載入
+        self._tail = None # 跟隨模式的 data_loader.CsvTail
+        self._tail_offset = None # 載入時檔案中完整行的結尾位置，跟隨模式由此開始讀取
+        self._tail_after_id = None
+        self.follow_interval_ms = 1000 # 跟隨模式檢查新資料的間隔
         self.time_min = None
         self.time_max = None
         self.start_time = ctk.StringVar()
         self.end_time = ctk.StringVar()
-        self._search_after_id = None # 用於延遲搜尋刷新
-        self.ax2 = None # 次要 Y 軸
+        self.search_index = None # 欄位的 tag / 中文名稱搜尋索引 (search_index.SearchIndex)
         self.RANGE_SIMILARITY_FACTOR = 2.5 # 用於判斷範圍是否相近的因子
         self.config_file = "config.json"
+        self.frame_cache = FrameCache() # 已解析 CSV 的欄式快取
+        self._load_job_id = 0 # 背景載入作業編號，用於忽略過期的回呼
+        self._load_cancel_event = None # 非 None 表示有載入作業進行中
+        self.float32_sensors = False # 感測欄位以 float32 保存 (config.json 的 float32_sensors)
+        self.export_encoding = DEFAULT_ENCODING # 匯出 CSV 的編碼 (config.json 的 export_encoding)
+        self._export_cancel_event = None # 非 None 表示有匯出作業進行中
+        # 背景輸出 PNG 的佇列 (快照目前的檢視設定，以獨立的 Agg 圖表繪製)
+        self.png_queue = RenderQueue(on_progress=lambda *args: self.after(0, self._on_png_progress, *args))
+        self._png_errors = []
+        # 重繪、載入與清單更新的分階段計時 (config.json 的 profile_hud / profile_log)
+        self.profiler = StageProfiler(on_frame=lambda record: self.after(0, self._update_profile_hud))
 
         main_frame = ctk.CTkFrame(self)
         main_frame.pack(fill=ctk.BOTH, expand=1)
@@ -51,7 +99,20 @@ class SensorPicker(ctk.CTk):
         side_frame.pack(side=ctk.LEFT, fill=ctk.Y, padx=10, pady=6)
 
         # 新增 "開啟新 CSV" 按鈕
-        ctk.CTkButton(side_frame, text="開啟新 CSV 檔案", command=self.open_new_csv, corner_radius=8, font=self.chinese_font_bold).pack(pady=(0,5), ipady=4, fill=ctk.X)
+        self.open_csv_button = ctk.CTkButton(side_frame, text="開啟新 CSV 檔案", command=self.open_new_csv, corner_radius=8, font=self.chinese_font_bold)
+        self.open_csv_button.pack(pady=(0,5), ipady=4, fill=ctk.X)
+        self.open_folder_button = ctk.CTkButton(side_frame, text="開啟資料夾", command=self.open_folder, corner_radius=8, font=self.chinese_font_bold)
+        self.open_folder_button.pack(pady=(0,5), ipady=4, fill=ctk.X)
+
+        # 載入進度 (僅在載入時顯示)
+        self.load_frame = ctk.CTkFrame(side_frame, fg_color="transparent")
+        self.load_status_label = ctk.CTkLabel(self.load_frame, text="", font=self.chinese_font, anchor='w')
+        self.load_status_label.pack(fill=ctk.X)
+        load_bar_row = ctk.CTkFrame(self.load_frame, fg_color="transparent")
+        load_bar_row.pack(fill=ctk.X)
+        self.load_progress_bar = ctk.CTkProgressBar(load_bar_row)
+        self.load_progress_bar.pack(side=ctk.LEFT, expand=True, fill=ctk.X, padx=(0,5))
+        ctk.CTkButton(load_bar_row, text="取消", command=self.cancel_loading, width=50, height=24, corner_radius=8, font=self.chinese_font).pack(side=ctk.LEFT)
 
         # 時間區段
         time_frame = ctk.CTkFrame(side_frame, fg_color="transparent")
@@ -73,11 +134,62 @@ class SensorPicker(ctk.CTk):
         self.pick_end_button = ctk.CTkButton(end_time_row_frame, text="📅", command=self.pick_end_time, width=40, height=28, state='disabled', corner_radius=8) # 初始禁用
         self.pick_end_button.pack(side=ctk.LEFT)
 
+        # 跳到勾選的開關欄位上一個 / 下一個狀態轉換 (保持視窗長度，事件置於中間)
+        event_row_frame = ctk.CTkFrame(time_frame, fg_color="transparent")
+        event_row_frame.pack(fill=ctk.X, pady=(5, 0))
+        self.prev_event_button = ctk.CTkButton(event_row_frame, text="◀ 上一個事件", command=lambda: self.jump_to_event(-1), state='disabled', height=28, corner_radius=8, font=self.chinese_font) # 初始禁用
+        self.prev_event_button.pack(side=ctk.LEFT, expand=True, fill=ctk.X, padx=(0, 5))
+        self.next_event_button = ctk.CTkButton(event_row_frame, text="下一個事件 ▶", command=lambda: self.jump_to_event(1), state='disabled', height=28, corner_radius=8, font=self.chinese_font) # 初始禁用
+        self.next_event_button.pack(side=ctk.LEFT, expand=True, fill=ctk.X)
+
         # 下載按鈕
         self.download_csv_button = ctk.CTkButton(side_frame, text="下載資料 (CSV)", command=self.download_csv, state='disabled', corner_radius=8, font=self.chinese_font_bold) # 初始禁用
         self.download_csv_button.pack(pady=(10,5), ipady=4, fill=ctk.X)
+
+        # 匯出進度 (僅在匯出時顯示)
+        self.export_frame = ctk.CTkFrame(side_frame, fg_color="transparent")
+        self.export_status_label = ctk.CTkLabel(self.export_frame, text="", font=self.chinese_font, anchor='w')
+        self.export_status_label.pack(fill=ctk.X)
+        export_bar_row = ctk.CTkFrame(self.export_frame, fg_color="transparent")
+        export_bar_row.pack(fill=ctk.X)
+        self.export_progress_bar = ctk.CTkProgressBar(export_bar_row)
+        self.export_progress_bar.pack(side=ctk.LEFT, expand=True, fill=ctk.X, padx=(0,5))
+        ctk.CTkButton(export_bar_row, text="取消", command=self.cancel_export, width=50, height=24, corner_radius=8, font=self.chinese_font).pack(side=ctk.LEFT)
         self.download_png_button = ctk.CTkButton(side_frame, text="下載圖檔 (PNG)", command=self.download_png, state='disabled', corner_radius=8, font=self.chinese_font_bold) # 初始禁用
-        self.download_png_button.pack(pady=(0,10), ipady=4, fill=ctk.X)
+        self.download_png_button.pack(pady=(0,5), ipady=4, fill=ctk.X)
+        self.batch_png_button = ctk.CTkButton(side_frame, text="批次下載圖檔…", command=self.download_png_batch, state='disabled', corner_radius=8, font=self.chinese_font_bold) # 初始禁用
+        self.batch_png_button.pack(pady=(0,5), ipady=4, fill=ctk.X)
+
+        # 圖檔輸出進度 (僅在佇列有工作時顯示)
+        self.png_queue_frame = ctk.CTkFrame(side_frame, fg_color="transparent")
+        self.png_queue_label = ctk.CTkLabel(self.png_queue_frame, text="", font=self.chinese_font, anchor='w')
+        self.png_queue_label.pack(side=ctk.LEFT, expand=True, fill=ctk.X)
+        ctk.CTkButton(self.png_queue_frame, text="取消", command=self.cancel_png_queue, width=50, height=24, corner_radius=8, font=self.chinese_font).pack(side=ctk.LEFT)
+        self.stats_button = ctk.CTkButton(side_frame, text="感測器統計表", command=self.show_stats_table, state='disabled', corner_radius=8, font=self.chinese_font_bold) # 初始禁用
+        self.stats_button.pack(pady=(0,5), ipady=4, fill=ctk.X)
+        self.switch_stats_button = ctk.CTkButton(side_frame, text="開關統計表", command=self.show_switch_table, state='disabled', corner_radius=8, font=self.chinese_font_bold) # 初始禁用
+        self.switch_stats_button.pack(pady=(0,5), ipady=4, fill=ctk.X)
+        self.derived_button = ctk.CTkButton(side_frame, text="衍生通道…", command=self.show_derived_channels, state='disabled', corner_radius=8, font=self.chinese_font_bold) # 初始禁用
+        self.derived_button.pack(pady=(0,10), ipady=4, fill=ctk.X)
+
+        # 預設依畫布寬度抽樣 (min/max 包絡)，勾選後改為繪製全部原始資料
+        self.raw_render = ctk.BooleanVar(value=False)
+        self.raw_render.trace_add("write", lambda *_: self.request_redraw(render_scheduler.DATA))
+        ctk.CTkCheckBox(side_frame, text="繪製原始資料 (不抽樣)", variable=self.raw_render, font=self.chinese_font).pack(anchor='w', pady=(0,5))
+
+        # 跟隨模式：定時讀取 CSV 新增的資料列，時間範圍在資料尾端時自動往後移
+        self.follow_var = ctk.BooleanVar(value=False)
+        self.follow_var.trace_add("write", lambda *_: self.toggle_follow())
+        ctk.CTkCheckBox(side_frame, text="跟隨檔案更新 (即時)", variable=self.follow_var, font=self.chinese_font).pack(anchor='w', pady=(0,5))
+
+        # 效能分析：在圖表右上角顯示最近一次各階段耗時與 p50 / p95
+        self.profile_hud_var = ctk.BooleanVar(value=False)
+        self.profile_hud_var.trace_add("write", lambda *_: self.toggle_profile_hud())
+        ctk.CTkCheckBox(side_frame, text="顯示效能分析", variable=self.profile_hud_var, font=self.chinese_font).pack(anchor='w', pady=(0,5))
+
+        # 目前資料各欄位群組佔用的記憶體
+        self.memory_label = ctk.CTkLabel(side_frame, text="", font=self.chinese_font, anchor='w', justify='left')
+        self.memory_label.pack(fill=ctk.X)
 
         # 搜尋框
         ctk.CTkLabel(side_frame, text="搜尋/勾選/顯示：", font=self.chinese_font).pack(anchor='w', pady=(10,2))
@@ -88,18 +200,14 @@ class SensorPicker(ctk.CTk):
         
         scroll_outer = ctk.CTkFrame(side_frame, fg_color="transparent")
         scroll_outer.pack(fill=ctk.BOTH, expand=1, padx=0, pady=0)
-        import tkinter as tk # 保持這個 import
-        self.canvas = tk.Canvas(scroll_outer, width=350, height=540, background="#fafbfc", highlightthickness=0)
-        scrollbar = ttk.Scrollbar(scroll_outer, orient="vertical", command=self.canvas.yview)
-        self.scrollable_frame = ctk.CTkFrame(self.canvas)
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-        self.canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        # 虛擬化清單：只建立可視範圍的列元件，捲動時重複使用
+        self.sensor_list = VirtualSensorList(
+            scroll_outer, self.chinese_font, self.chinese_font_bold,
+            is_checked=lambda c: self.vars_all[c].get() if c in self.vars_all else False,
+            is_visible=lambda c: self.is_visible.get(c, True),
+            on_check=self.toggle_checked, on_eye=self.toggle_visible,
+            display_name=self._display_name,
+            width=350, height=540)
 
         self.switch_all = []
         self.av_all = []
@@ -108,31 +216,48 @@ class SensorPicker(ctk.CTk):
         self.vars_all = {}
         self.is_visible = {}
 
-        self.start_time.trace_add("write", lambda *_: self.update_plot_if_data_loaded())
-        self.end_time.trace_add("write", lambda *_: self.update_plot_if_data_loaded())
+        self.start_time.trace_add("write", lambda *_: self.request_redraw(render_scheduler.RANGE))
+        self.end_time.trace_add("write", lambda *_: self.request_redraw(render_scheduler.RANGE))
 
         # 主圖表
         self.fig, self.ax = plt.subplots(figsize=(11, 8))
+        self.plot_view = PlotView(self.fig, self.ax, range_similarity_factor=self.RANGE_SIMILARITY_FACTOR,
+                                  profiler=self.profiler)
+        self.redraw_scheduler = RenderScheduler(self, self._render)
         self.canvas_plot = FigureCanvasTkAgg(self.fig, master=main_frame)
         self.toolbar = NavigationToolbar2Tk(self.canvas_plot, main_frame)
         self.toolbar.update()
         self.canvas_plot.get_tk_widget().pack(side=ctk.RIGHT, fill=ctk.BOTH, expand=1)
+        self.profile_hud = ctk.CTkLabel(self.canvas_plot.get_tk_widget(), text="", justify='left', anchor='nw',
+                                        font=ctk.CTkFont(family="Consolas", size=11), fg_color="#fffbe6",
+                                        corner_radius=6)
 
         self._dragging = False
         self._drag_start_x = None
+        self._drag_start_xlim = None
         self._drag_start_t0 = None
         self._drag_start_t1 = None
         self._y_drag = False
         self._y_drag_start = None
         self._y_lim_start = None
+        self._pan_autoscale = [] # 水平拖曳開始前各軸的自動範圍狀態
         self.fig.canvas.mpl_connect("button_press_event", self.on_press)
         self.fig.canvas.mpl_connect("motion_notify_event", self.on_motion)
         self.fig.canvas.mpl_connect("button_release_event", self.on_release)
         self.fig.canvas.mpl_connect("scroll_event", self.on_scroll)
+        self._last_plot_width = None
+        self._resize_after_id = None
+        self.fig.canvas.mpl_connect("resize_event", self.on_canvas_resize)
 
         self.load_config_and_data()
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+    @property
+    def ax2(self):
+        """次要 Y 軸 (目前沒有正規化資料時為 None)"""
+        ax2 = self.plot_view.ax2
+        return ax2 if ax2.get_visible() else None
+
     def on_closing(self):
         self.save_config()
         self.destroy()
@@ -142,18 +267,31 @@ class SensorPicker(ctk.CTk):
             try:
                 with open(self.config_file, 'r') as f:
                     config = json.load(f)
-                
+
+                self.frame_cache = FrameCache(
+                    cache_dir=config.get("cache_dir") or DEFAULT_CACHE_DIR,
+                    max_mb=config.get("cache_max_mb", DEFAULT_CACHE_MAX_MB)
+                )
+                self.float32_sensors = bool(config.get("float32_sensors", False))
+                self.lazy_load_mb = config.get("lazy_load_mb", DEFAULT_LAZY_LOAD_MB) # null 表示一律完整載入
+                self.column_budget_mb = config.get("column_budget_mb", DEFAULT_BUDGET_MB)
+                self.export_encoding = config.get("export_encoding") or DEFAULT_ENCODING
+                self.derived = DerivedChannels(config.get("derived_channels") or {})
+                self.profiler.log_path = config.get("profile_log") or None # 每個影格一行 JSON
+                self.profile_hud_var.set(bool(config.get("profile_hud", False))) # 觸發 toggle_profile_hud
                 last_path = config.get("last_csv_path")
                 last_cols = config.get("last_selected_cols", [])
 
-                if last_path and os.path.exists(last_path):
-                    if self.load_data_from_file(last_path):
+                if last_path and self._source_exists(last_path):
+                    def restore_selection():
                         for col in last_cols:
                             if col in self.vars_all:
                                 self.vars_all[col].set(True)
                         self.refresh_panel_if_data_loaded()
-                        self.update_plot()
-                        return
+                        self.request_redraw(render_scheduler.COLUMNS)
+                    self.update_plot()
+                    self.load_data_from_file(last_path, on_loaded=restore_selection, preview_cols=last_cols)
+                    return
             except (json.JSONDecodeError, KeyError):
                  # Config is corrupted, proceed with a blank state
                  pass
@@ -161,18 +299,33 @@ class SensorPicker(ctk.CTk):
         self.update_plot()
 
     def save_config(self):
+        # 保留其他設定 (例如快取目錄、大小上限)，只更新檔案與勾選狀態
+        config = {}
+        if os.path.exists(self.config_file):
+            try:
+                with open(self.config_file, 'r') as f:
+                    config = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                config = {}
         if self.df_all is not None and hasattr(self, 'current_file_path'):
             selected_cols = [col for col, var in self.vars_all.items() if var.get()]
-            config = {
-                "last_csv_path": self.current_file_path,
-                "last_selected_cols": selected_cols
-            }
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f, indent=4)
+            config["last_csv_path"] = self.current_file_path
+            config["last_selected_cols"] = selected_cols
         else:
             # If no data is loaded, clear the config
-            with open(self.config_file, 'w') as f:
-                json.dump({"last_csv_path": "", "last_selected_cols": []}, f, indent=4)
+            config["last_csv_path"] = ""
+            config["last_selected_cols"] = []
+        config["profile_hud"] = self.profile_hud_var.get()
+        config["derived_channels"] = self.derived.definitions()
+        with open(self.config_file, 'w') as f:
+            json.dump(config, f, indent=4)
+
+    @staticmethod
+    def _source_exists(source):
+        """source 為單一檔案、資料夾或檔案清單"""
+        if isinstance(source, list):
+            return bool(source) and all(os.path.exists(p) for p in source)
+        return os.path.exists(source)
 
     def _set_controls_state(self, state):
         """啟用或禁用相關控制項"""
@@ -180,211 +333,552 @@ class SensorPicker(ctk.CTk):
         self.pick_start_button.configure(state=state)
         self.end_entry.configure(state=state)
         self.pick_end_button.configure(state=state)
+        self.prev_event_button.configure(state=state)
+        self.next_event_button.configure(state=state)
         self.download_csv_button.configure(state=state)
         self.download_png_button.configure(state=state)
+        self.batch_png_button.configure(state=state)
+        self.stats_button.configure(state=state)
+        self.switch_stats_button.configure(state=state)
+        self.derived_button.configure(state=state)
         self.search_entry.configure(state=state)
         # 根據是否有資料來決定 refresh_panel 是否應該執行
         if state == 'disabled':
-            for widget in self.scrollable_frame.winfo_children():
-                widget.destroy() # 清空欄位列表
+            self.sensor_list.clear() # 清空欄位列表
         elif state == 'normal' and self.df_all is not None:
              self.refresh_panel_if_data_loaded() # <--- Changed
 
 
-    def load_data_from_file(self, file_path):
-        try:
-            # 增加錯誤處理選項，跳過格式錯誤的行
-            # 使用 on_bad_lines='skip' 替代 error_bad_lines=False (適用於 pandas 1.3.0+)
-            df = pd.read_csv(file_path, low_memory=False, on_bad_lines='skip')
-            # 處理混合類型，並確保字串中的逗號不會導致欄位解析錯誤
-            # 預設情況下，pandas 會處理引號內的逗號，但明確指定 quotechar 和 doublequote 可以增加健壯性
-            # df = pd.read_csv(file_path, low_memory=False, on_bad_lines='skip', sep=',', quotechar='"', doublequote=True)
-            
-            # Handle mixed types for column 'lt-302m' (column 104)
-            if 'lt-302m' in df.columns:
-                # Attempt to convert to numeric, coercing errors to NaN
-                df['lt-302m'] = pd.to_numeric(df['lt-302m'], errors='coerce')
-            if 'Timestamp' in df.columns:
-                df['Timestamp'] = pd.to_datetime(df['Timestamp'], unit='s', errors='coerce', utc=True)
-                df['Timestamp'] = df['Timestamp'].dt.tz_convert('Asia/Taipei')
-                df = df.sort_values('Timestamp')
-                time_col = 'Timestamp'
-            elif 'Date' in df.columns and 'Time' in df.columns:
-                df['Datetime'] = pd.to_datetime(df['Date'] + ' ' + df['Time'], errors='coerce')
-                df['Datetime'] = df['Datetime'].dt.tz_localize('Asia/Taipei')
-                df = df.sort_values('Datetime')
-                time_col = 'Datetime'
+    def load_data_from_file(self, file_path, on_loaded=None, on_failed=None, preview_cols=None):
+        """
+        在背景執行緒分塊載入 CSV (或讀取快取)，進度顯示於進度條，可按取消。
+        完成後透過 after() 回到主執行緒套用資料，再呼叫 on_loaded()
+        file_path 為資料夾或檔案清單時建立多檔資料集，先載入時間最早的檔案
+        """
+        if self._load_cancel_event is not None:
+            return False # 已有載入作業進行中
+        self._load_job_id += 1
+        job_id = self._load_job_id
+        cancel_event = threading.Event()
+        self._load_cancel_event = cancel_event
+        self._set_controls_state('disabled') # 載入期間禁用控制項
+        self.open_csv_button.configure(state='disabled')
+        self.open_folder_button.configure(state='disabled')
+        is_dataset = isinstance(file_path, list) or os.path.isdir(file_path)
+        if isinstance(file_path, list):
+            self._show_load_progress(f"{len(file_path)} 個檔案")
+        else:
+            self._show_load_progress(os.path.basename(file_path))
+
+        def progress(rows, bytes_read, total_bytes):
+            self.after(0, self._update_load_progress, job_id, rows, bytes_read, total_bytes)
+
+        def on_preview(df_preview, time_col):
+            self.after(0, self._render_load_preview, job_id, df_preview, time_col, preview_cols or [])
+
+        def worker():
+            profiler = self.profiler
+            column_store = None
+            try:
+                with profiler.frame('load'):
+                    if is_dataset:
+                        kwargs = dict(cache=self.frame_cache, float32=self.float32_sensors)
+                        with profiler.stage('parse'):
+                            if isinstance(file_path, list):
+                                dataset = MultiFileDataset(file_path, **kwargs)
+                            else:
+                                dataset = MultiFileDataset.from_folder(file_path, **kwargs)
+                            tail_offset = None
+                            first = dataset.parts[0]
+                            df, time_col = dataset.load_window(first.start, first.end, progress=progress,
+                                                               cancel_event=cancel_event)
+                        with profiler.stage('pyramid'):
+                            pyramid = load_or_build_pyramid(df, time_col, get_sensor_cols(df))
+                    elif self._use_lazy_load(file_path):
+                        dataset = None
+                        tail_offset = None
+                        column_store = ColumnStore(file_path, cache=self.frame_cache, budget_mb=self.column_budget_mb,
+                                                   float32=self.float32_sensors)
+                        with profiler.stage('parse'):
+                            df, time_col = column_store.open(progress=progress, cancel_event=cancel_event)
+                        with profiler.stage('pyramid'):
+                            pyramid = column_store.cached_pyramid()
+                    else:
+                        dataset = None
+                        tail_offset = complete_size(file_path) # 之後新增的資料由跟隨模式讀取
+                        with profiler.stage('parse'):
+                            df, time_col = load_sensor_data(file_path, cache=self.frame_cache, progress=progress,
+                                                            cancel_event=cancel_event, on_preview=on_preview,
+                                                            float32=self.float32_sensors)
+                        with profiler.stage('pyramid'):
+                            pyramid = load_or_build_pyramid(df, time_col, get_sensor_cols(df),
+                                                            cache=self.frame_cache, file_path=file_path)
+                    with profiler.stage('transitions'):
+                        transitions = TransitionIndex(df).build(get_switchable_cols(df))
+            except IngestCancelled:
+                self.after(0, self._on_load_cancelled, job_id)
+            except Exception as e:
+                self.after(0, self._on_load_failed, job_id, e, on_failed)
             else:
-                messagebox.showerror("錯誤", "CSV 沒有 Timestamp 或 Date/Time 欄")
-                return False
-
-            self.current_file_path = file_path # Store current file path
-            self.df_all = df.copy()
-            self.time_col = time_col
-            self.time_min = pd.Timestamp(df[time_col].min())
-            self.time_max = pd.Timestamp(df[time_col].max())
-            self.start_time.set(str(self.time_min)[:19])
-            self.end_time.set(str(self.time_max)[:19])
-
-            self.switch_all = get_switchable_cols(self.df_all)
-            self.sensor_all = get_sensor_cols(self.df_all)
-            self.all_cols = self.switch_all + self.sensor_all
-            # self.vars_all = {} # Old line
-            self.vars_all = {col: ctk.BooleanVar(value=False) for col in self.all_cols} # New: Initialize all
-            self.is_visible = {col: True for col in self.all_cols}
-            
-            self._set_controls_state('normal') # 啟用控制項
-            self.refresh_panel_if_data_loaded() # 替換為正確的方法
-            self.update_plot()
-            return True
+                self.after(0, self._on_load_finished, job_id, file_path, df, time_col, pyramid, on_loaded,
+                           dataset, tail_offset, column_store, transitions)
+
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def cancel_loading(self):
+        if self._load_cancel_event is not None:
+            self._load_cancel_event.set()
+            self.load_status_label.configure(text="取消中…")
+
+    def _end_load_job(self, job_id):
+        """載入作業結束 (成功、失敗或取消)，回傳此結果是否仍屬於目前作業"""
+        if job_id != self._load_job_id:
+            return False
+        self._load_cancel_event = None
+        self._hide_load_progress()
+        self.open_csv_button.configure(state='normal')
+        self.open_folder_button.configure(state='normal')
+        return True
+
+    def _show_load_progress(self, name):
+        self.load_progress_bar.set(0)
+        self.load_status_label.configure(text=f"載入中：{name}")
+        self.load_frame.pack(after=self.open_csv_button, fill=ctk.X, pady=(0, 5))
+
+    def _hide_load_progress(self):
+        self.load_frame.pack_forget()
+
+    def _update_load_progress(self, job_id, rows, bytes_read, total_bytes):
+        if job_id != self._load_job_id or self._load_cancel_event is None:
+            return
+        fraction = bytes_read / total_bytes if total_bytes else 1.0
+        self.load_progress_bar.set(fraction)
+        self.load_status_label.configure(
+            text=f"已解析 {rows:,} 列 / {bytes_read / 1048576:.1f} MB ({fraction:.0%})")
+
+    def _render_load_preview(self, job_id, df_preview, time_col, preview_cols):
+        """以第一塊資料先畫出預覽圖"""
+        if job_id != self._load_job_id or self._load_cancel_event is None:
+            return
+        self.plot_view.clear(f'載入中… (預覽前 {len(df_preview):,} 筆)')
+        sensor_cols = get_sensor_cols(df_preview)
+        for col_name in [c for c in preview_cols if c in sensor_cols]:
+            y_raw = pd.to_numeric(df_preview[col_name], errors='coerce').values
+            if not np.all(np.isnan(y_raw)):
+                self.ax.plot(df_preview[time_col], y_raw, label=get_equipment_chinese_name(col_name))
+        if self.ax.get_legend_handles_labels()[0]:
+            self.ax.legend(loc='upper left', fontsize=9, ncol=1)
+        self.fig.tight_layout()
+        self.canvas_plot.draw()
+
+    def _use_lazy_load(self, file_path):
+        """單一大檔案 (lazy_load_mb 以上) 開啟時只讀時間欄，欄位勾選時才載入"""
+        if self.lazy_load_mb is None:
+            return False
+        try:
+            return os.path.getsize(file_path) >= self.lazy_load_mb * 1024 * 1024
+        except OSError:
+            return False
+
+    def _on_load_finished(self, job_id, file_path, df, time_col, pyramid, on_loaded, dataset=None, tail_offset=None,
+                          column_store=None, transitions=None):
+        if not self._end_load_job(job_id):
+            return
+        self.follow_var.set(False) # 新資料需重新開啟跟隨模式
+        try:
+            with self.profiler.frame('load_apply'):
+                self._tail_offset = tail_offset
+                self.current_file_path = file_path # Store current file path
+                self.dataset = dataset
+                self.column_store = column_store
+                self._dataset_skip_key = None
+                self.df_all = df # 載入結果不與其他物件共用，不需複製
+                self.time_col = time_col
+                with self.profiler.stage('time_index'):
+                    self.time_index = TimeIndex(df[time_col])
+                self.range_stats = RangeStats(df)
+                self.transitions = transitions or TransitionIndex(df)
+                self.pyramid = pyramid
+                if dataset is not None:
+                    # 整個資料集的時間範圍；初始只顯示第一個檔案
+                    self.time_min = dataset.time_min
+                    self.time_max = dataset.time_max
+                    self.start_time.set(str(pd.Timestamp(df[time_col].min()))[:19])
+                    self.end_time.set(str(pd.Timestamp(df[time_col].max()))[:19])
+                else:
+                    self.time_min = pd.Timestamp(df[time_col].min())
+                    self.time_max = pd.Timestamp(df[time_col].max())
+                    self.start_time.set(str(self.time_min)[:19])
+                    self.end_time.set(str(self.time_max)[:19])
+
+                if column_store is not None: # 欄位清單來自標頭，資料勾選時才載入
+                    self.switch_all = column_store.switch_cols
+                    self._data_sensor_cols = column_store.sensor_cols
+                else:
+                    self.switch_all = get_switchable_cols(self.df_all)
+                    self._data_sensor_cols = get_sensor_cols(self.df_all)
+                self.vars_all = {}
+                self.is_visible = {}
+                self._update_column_lists()
+                self._update_memory_label()
+
+                self._set_controls_state('normal') # 啟用控制項
+                self.refresh_panel_if_data_loaded() # 替換為正確的方法
+                self.request_redraw(render_scheduler.DATA)
         except Exception as e:
+            self._show_load_error(e)
+            return
+        self._report_coercions(df)
+        if on_loaded:
+            on_loaded()
+
+    def _report_coercions(self, df):
+        """解析時有無法轉為數值 / 時間而成為缺值的欄位時，列出各欄位的個數"""
+        coercions = df.attrs.get('coercions')
+        if not coercions:
+            return
+        items = sorted(coercions.items(), key=lambda kv: -kv[1])
+        lines = [f"{get_equipment_chinese_name(col)} ({col})：{n:,} 筆" for col, n in items[:15]]
+        if len(items) > 15:
+            lines.append(f"…另有 {len(items) - 15} 個欄位")
+        messagebox.showwarning("資料轉換", "下列欄位有無法解析的值，已視為缺值：\n" + "\n".join(lines))
+
+    def _update_column_lists(self):
+        """依資料欄位與衍生通道重建欄位清單與搜尋索引 (保留既有欄位的勾選 / 顯示狀態)"""
+        derived = [name for name in self.derived.names
+                   if name not in self._data_sensor_cols and name not in self.switch_all] # 與資料欄位同名時以資料為準
+        self.sensor_all = self._data_sensor_cols + derived
+        self.all_cols = self.switch_all + self.sensor_all
+        with self.profiler.stage('search_index'):
+            self.search_index = SearchIndex(self.all_cols)
+        self.vars_all = {col: self.vars_all.get(col) or ctk.BooleanVar(value=False) for col in self.all_cols}
+        self.is_visible = {col: self.is_visible.get(col, True) for col in self.all_cols}
+
+    def _display_name(self, col):
+        """欄位清單的顯示名稱：中文名稱和原始 tag；衍生通道顯示運算式"""
+        if col in self.derived.expressions and col not in self._data_sensor_cols:
+            return f"{col} = {self.derived.expressions[col].text}"
+        return f"{get_equipment_chinese_name(col)} ({col})"
+
+    def _load_columns(self, cols):
+        """延遲載入模式：在背景讀取尚未載入的欄位，完成後加入 df_all 並重繪 (一次只進行一個讀取)"""
+        if self._columns_loading:
+            return # 讀取完成後的重繪會再檢查還缺哪些欄位
+        self._columns_loading = True
+        store = self.column_store
+        self._update_memory_label()
+
+        def worker():
+            try:
+                with self.profiler.frame('load_columns'):
+                    new = store.read(cols)
+            except Exception as e:
+                self.after(0, self._on_columns_loaded, store, cols, None, e)
+            else:
+                self.after(0, self._on_columns_loaded, store, cols, new, None)
+
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+
+    def _on_columns_loaded(self, store, cols, new, error):
+        self._columns_loading = False
+        if store is not self.column_store:
+            return # 已開啟其他檔案
+        if error is not None:
+            messagebox.showerror("讀取欄位錯誤", str(error))
+            for col in cols: # 取消勾選，避免重繪時反覆重試
+                if col in self.vars_all:
+                    self.vars_all[col].set(False)
+            self.refresh_panel_if_data_loaded()
+            self._update_memory_label()
+            return
+        pinned = {col for col, v in self.vars_all.items() if v.get()}
+        pinned.update(self.derived.inputs(pinned)) # 勾選中的衍生通道引用的欄位
+        for col in store.attach(self.df_all, new, pinned):
+            self.range_stats.discard(col)
+            self.transitions.discard(col)
+        self._update_memory_label()
+        self._report_coercions(new)
+        self.request_redraw(render_scheduler.DATA)
+
+    def _load_dataset_window(self, start, end):
+        """在背景載入資料集中與 [start, end] 重疊的檔案，完成後替換目前資料並保留勾選狀態"""
+        if self._load_cancel_event is not None:
+            return # 目前作業完成後的重繪會再次檢查
+        self._load_job_id += 1
+        job_id = self._load_job_id
+        cancel_event = threading.Event()
+        self._load_cancel_event = cancel_event
+        dataset = self.dataset
+        key = dataset.window_key(start, end)
+        self._show_load_progress(f"{len(key)} 個檔案")
+
+        def progress(rows, bytes_read, total_bytes):
+            self.after(0, self._update_load_progress, job_id, rows, bytes_read, total_bytes)
+
+        def worker():
+            try:
+                df, time_col = dataset.load_window(start, end, progress=progress, cancel_event=cancel_event)
+                pyramid = load_or_build_pyramid(df, time_col, get_sensor_cols(df))
+                transitions = TransitionIndex(df).build(get_switchable_cols(df))
+            except IngestCancelled:
+                self.after(0, self._on_window_load_stopped, job_id, key, None)
+            except Exception as e:
+                self.after(0, self._on_window_load_stopped, job_id, key, e)
+            else:
+                self.after(0, self._on_window_loaded, job_id, dataset, df, time_col, pyramid, transitions)
+
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+
+    def _on_window_loaded(self, job_id, dataset, df, time_col, pyramid, transitions):
+        if not self._end_load_job(job_id) or dataset is not self.dataset:
+            return
+        self.df_all = df
+        self.time_col = time_col
+        self.time_index = TimeIndex(df[time_col])
+        self.range_stats = RangeStats(df)
+        self.transitions = transitions
+        self.pyramid = pyramid
+        self._dataset_skip_key = None
+        self._update_memory_label()
+        self.request_redraw(render_scheduler.DATA)
+
+    def _on_window_load_stopped(self, job_id, key, error):
+        """資料集範圍載入取消或失敗：保留原本資料，直到使用者改變時間範圍前不再重試"""
+        if not self._end_load_job(job_id):
+            return
+        self._dataset_skip_key = key
+        if error is not None:
+            messagebox.showerror("讀取檔案錯誤", str(error))
+        self.request_redraw(render_scheduler.DATA)
+
+    def toggle_follow(self):
+        if not self.follow_var.get():
+            if self._tail_after_id:
+                self.after_cancel(self._tail_after_id)
+                self._tail_after_id = None
+            self._tail = None
+            return
+        if self._tail is not None:
+            return
+        if self.df_all is None or self.dataset is not None:
+            messagebox.showinfo("提示", "跟隨模式只支援單一 CSV 檔案")
+            self.follow_var.set(False)
+            return
+        if self.column_store is not None:
+            messagebox.showinfo("提示", "延遲載入欄位的大檔案不支援跟隨模式")
+            self.follow_var.set(False)
+            return
+        try:
+            self._tail = CsvTail(self.current_file_path, self._tail_offset)
+        except (OSError, ValueError) as e:
             messagebox.showerror("讀取檔案錯誤", str(e))
-            self._set_controls_state('disabled') # 禁用控制項
-            self.ax.clear()
-            self.ax.set_title('讀取檔案錯誤或無資料')
-            self.canvas_plot.draw()
-            return False
+            self.follow_var.set(False)
+            return
+        self._tail_after_id = self.after(self.follow_interval_ms, self._poll_tail)
+
+    def _poll_tail(self):
+        """在背景執行緒解析新增的完整行，完成後由 _on_tail_read 接到目前資料"""
+        self._tail_after_id = None
+        tail = self._tail
+        if tail is None:
+            return
+        if self._load_cancel_event is not None: # 載入中，稍後再試
+            self._tail_after_id = self.after(self.follow_interval_ms, self._poll_tail)
+            return
+
+        def worker():
+            try:
+                result = tail.read()
+            except Exception as e:
+                self.after(0, self._on_tail_read, tail, None, e)
+            else:
+                self.after(0, self._on_tail_read, tail, result, None)
+
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+
+    def _on_tail_read(self, tail, result, error):
+        if tail is not self._tail:
+            return # 跟隨模式已關閉或已開啟其他檔案
+        if error is not None:
+            messagebox.showerror("跟隨模式錯誤", str(error))
+            self.follow_var.set(False)
+            return
+        if result is not None:
+            self._append_rows(*result)
+        self._tail_after_id = self.after(self.follow_interval_ms, self._poll_tail)
+
+    def _append_rows(self, df_new, time_col):
+        """將新增的資料列接到 df_all，並增量更新時間索引與金字塔的尾端"""
+        if time_col != self.time_col:
+            return
+        epoch_ns = self.time_index.epoch_ns
+        last_ns = epoch_ns[-1] if len(epoch_ns) else np.iinfo(np.int64).min
+        new_ns = df_new[time_col].values.astype('datetime64[ns]').view('i8')
+        df_new = df_new[new_ns > last_ns] # 去除已載入過的時間與 NaT
+        if df_new.empty:
+            return
+
+        tz = pytz.timezone('Asia/Taipei')
+        try:
+            start = pd.Timestamp(self.start_time.get())
+            if start.tzinfo is None: start = start.tz_localize(tz)
+            end = pd.Timestamp(self.end_time.get())
+            if end.tzinfo is None: end = end.tz_localize(tz)
+            at_edge = end >= self.time_max # 目前正在看資料尾端
+        except Exception:
+            start = end = None
+            at_edge = False
+
+        # 排在最後的 NaT 列不在時間索引內，先去除讓位置與索引一致
+        trimmed = len(self.df_all) != len(self.time_index)
+        self.df_all = append_frame(self.df_all.iloc[:len(self.time_index)], df_new)
+        if trimmed:
+            self.transitions = TransitionIndex(self.df_all)
+        else:
+            self.transitions.extend(self.df_all) # 已建立的欄位只處理新增的列
+        derived = [col for col in self._derived_cols() if col in self.df_all.columns]
+        self.df_all.drop(columns=derived, inplace=True) # 衍生通道於下次重繪時以新的資料範圍重新計算
+        self.time_index.append(df_new[time_col])
+        self.range_stats = RangeStats(self.df_all) # 各欄位於下次查詢時重新建立
+        if self.pyramid is not None:
+            t0 = self.pyramid.tail_start(int(epoch_seconds(df_new[time_col])[0]))
+            i = int(np.searchsorted(self.time_index.epoch_ns, t0 * 10**9, side='left'))
+            tail_df = self.df_all.iloc[i:]
+            self.pyramid.extend(epoch_seconds(tail_df[time_col]),
+                                {c: pd.to_numeric(tail_df[c], errors='coerce').to_numpy(dtype=float)
+                                 for c in self.pyramid.columns if c in tail_df.columns})
+
+        new_max = pd.Timestamp(df_new[time_col].iloc[-1])
+        self.time_max = new_max
+        self._update_memory_label()
+        if at_edge and new_max > end:
+            # 保持視窗長度，整個往後滑動到新的資料尾端 (trace 會合併成一次重繪)
+            shift = new_max - end
+            self.start_time.set(str(start + shift)[:19])
+            self.end_time.set(str(new_max)[:19])
+        elif end is not None and pd.Timestamp(df_new[time_col].iloc[0]) <= end:
+            self.request_redraw(render_scheduler.DATA)
+
+    def _update_memory_label(self):
+        """顯示目前資料各欄位群組的記憶體用量"""
+        report = {k: v / 1048576 for k, v in memory_report(self.df_all, self.time_col).items()}
+        text = (f"記憶體：{report['total']:.1f} MB\n"
+                f"時間 {report['time']:.1f} / 開關 {report['switch']:.1f} / "
+                f"感測 {report['sensor']:.1f} / 其他 {report['other']:.1f} MB")
+        if self.column_store is not None:
+            text += (f"\n延遲載入：{self.column_store.loaded_count} / {len(self.all_cols)} 欄"
+                     f" (預算 {self.column_budget_mb} MB)" + ("，讀取欄位中…" if self._columns_loading else ""))
+        self.memory_label.configure(text=text)
+
+    def _on_load_failed(self, job_id, error, on_failed):
+        if not self._end_load_job(job_id):
+            return
+        if isinstance(error, ValueError):
+            messagebox.showerror("錯誤", str(error))
+            self.df_all = None
+            self._set_controls_state('disabled')
+            self.request_redraw(render_scheduler.DATA)
+        else:
+            self._show_load_error(error)
+        if on_failed:
+            on_failed()
+
+    def _show_load_error(self, error):
+        messagebox.showerror("讀取檔案錯誤", str(error))
+        self.df_all = None
+        self._set_controls_state('disabled') # 禁用控制項
+        self.plot_view.clear('讀取檔案錯誤或無資料')
+        self.canvas_plot.draw()
+
+    def _on_load_cancelled(self, job_id):
+        if not self._end_load_job(job_id):
+            return
+        # 取消時保留原本已載入的資料
+        if self.df_all is not None:
+            self._set_controls_state('normal')
+        self.request_redraw(render_scheduler.DATA)
 
     def open_new_csv(self):
-        file_path = filedialog.askopenfilename(
-            title="選擇新的 CSV 檔案",
+        file_paths = filedialog.askopenfilenames(
+            title="選擇新的 CSV 檔案 (可多選)",
             filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
         )
+        if file_paths:
+            # 多選時視為同一個資料集
+            self._open_source(file_paths[0] if len(file_paths) == 1 else list(file_paths))
+        # else:
+            # 使用者取消選擇，不做任何事
+
+    def open_folder(self):
+        folder = filedialog.askdirectory(title="選擇 CSV 資料夾")
+        if folder:
+            self._open_source(folder)
+
+    def _open_source(self, file_path):
         if file_path:
-            # 清空舊的勾選狀態和圖表
-            self.vars_all = {}
-            self.is_visible = {col: True for col in self.all_cols} # 重設可見度
-            self.ax.clear() # 清除圖表
-            if self.ax2: # Clear secondary axis if it exists
-                if self.ax2.get_figure(): self.ax2.remove()
-                self.ax2 = None
-            self.canvas_plot.draw() # 更新空白圖表
-            
-            if not self.load_data_from_file(file_path):
+            def on_failed():
                 messagebox.showwarning("提示", "載入新檔案失敗。")
                 # 保持UI為禁用狀態，因為新檔案載入失敗
                 self._set_controls_state('disabled')
-                self.ax.clear()
-                if self.ax2:
-                    if self.ax2.get_figure(): self.ax2.remove()
-                    self.ax2 = None
-                self.ax.set_title('載入新檔案失敗')
+                self.plot_view.clear('載入新檔案失敗')
                 self.canvas_plot.draw()
-            # 如果成功，load_data_from_file 會處理UI更新
-        # else:
-            # 使用者取消選擇，不做任何事
+            # 成功時 _on_load_finished 會重設勾選狀態並更新UI
+            self.load_data_from_file(file_path, on_failed=on_failed)
 
     def refresh_panel_if_data_loaded(self, *args):
-        if self._search_after_id:
-            self.after_cancel(self._search_after_id) # 取消之前的延遲任務
-        
-        # 延遲 500ms 後執行刷新 (原為 300ms)
-        self._search_after_id = self.after(500, self._do_refresh_panel)
-
-    def _do_refresh_panel(self):
-        if self.df_all is not None:
-            # self.refresh_panel() # Old direct call
-            search_key = self.search_var.get().strip().lower()
-            # Create a snapshot of vars_all and is_visible for thread safety
-            vars_all_snapshot = {k: v.get() for k, v in self.vars_all.items()}
-            is_visible_snapshot = self.is_visible.copy()
-            
-            # Start a new thread for filtering
-            thread = threading.Thread(target=self._filter_columns_thread_target,
-                                      args=(search_key, vars_all_snapshot, is_visible_snapshot, self.all_cols[:])) # Pass a copy of all_cols
-            thread.daemon = True # Allow main program to exit even if threads are still running
-            thread.start()
-
-    def _filter_columns_thread_target(self, search_key, vars_all_snapshot, is_visible_snapshot, all_cols_snapshot):
-        if self.df_all is None:
+        """依搜尋字串更新欄位清單；使用預先建立的索引，每次輸入都直接查詢，不需延遲"""
+        if self.df_all is None or self.search_index is None:
             return
+        with self.profiler.frame('panel'):
+            with self.profiler.stage('search'):
+                # 已勾選的欄位不受搜尋過濾，一律顯示在 "已勾選"
+                selected_cols = [col for col in self.all_cols if self.vars_all[col].get()]
+                matched_cols = self.search_index.search(self.search_var.get())
+            with self.profiler.stage('rebind'):
+                # 只重新綁定可視範圍內的列，不重建元件
+                self.sensor_list.set_items(selected_cols, matched_cols)
 
-        selected_cols_data = []
-        all_sensors_data = []
-
-        # Process selected columns
-        # Ensure vars_all_snapshot is used correctly
-        current_selected_cols = [col for col in all_cols_snapshot if vars_all_snapshot.get(col, False)]
-
-        for col in current_selected_cols:
-            # No search filter for already selected items, they always show in "已勾選"
-            selected_cols_data.append({
-                'name': col,
-                'is_checked': True, # They are by definition checked
-                'is_visible': is_visible_snapshot.get(col, True)
-            })
-
-        # Process all sensors for the "全部感測器" list
-        for col in all_cols_snapshot:
-            if not search_key or search_key in col.lower():
-                all_sensors_data.append({
-                    'name': col,
-                    'is_checked': vars_all_snapshot.get(col, False),
-                    'is_visible': is_visible_snapshot.get(col, True)
-                })
-        
-        # Schedule the UI update on the main thread
-        self.after(0, self._render_panel_from_data, selected_cols_data, all_sensors_data)
-
-    def _render_panel_from_data(self, selected_cols_data, all_sensors_data):
-        if self.df_all is None: # Double check if data is still loaded
-            return
-
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-
-        if selected_cols_data:
-            ctk.CTkLabel(self.scrollable_frame, text="已勾選 (點擊取消/隱藏)", font=self.chinese_font_bold).pack(anchor='w', pady=(5,3), padx=5)
-            for item_data in selected_cols_data:
-                col = item_data['name']
-                frm = ctk.CTkFrame(self.scrollable_frame, fg_color="transparent")
-                frm.pack(anchor='w', fill=ctk.X, padx=5, pady=1)
-                checked_text = "✅" # Always checked in this section
-                btn_check = ctk.CTkButton(frm, text=checked_text, width=30, height=30, command=lambda c=col: self.toggle_checked(c), corner_radius=6, fg_color="transparent", hover_color="#DCE4EE", text_color_disabled="grey", text_color="black", font=self.chinese_font)
-                btn_check.pack(side=ctk.LEFT, padx=(0,3))
-                
-                eye_text = "👁️" if item_data['is_visible'] else "🙈"
-                btn_eye = ctk.CTkButton(frm, text=eye_text, width=30, height=30, command=lambda c=col: self.toggle_visible(c), corner_radius=6, fg_color="transparent", hover_color="#DCE4EE", text_color_disabled="grey", text_color="black", font=self.chinese_font)
-                btn_eye.pack(side=ctk.LEFT, padx=(0,5))
-                display_text = f"{get_equipment_chinese_name(col)} ({col})" # 顯示中文名稱和原始 tag
-                ctk.CTkLabel(frm, text=display_text, font=self.chinese_font).pack(side=ctk.LEFT, pady=2)
-
-        ctk.CTkLabel(self.scrollable_frame, text="全部感測器 (點擊勾選/隱藏)", font=self.chinese_font_bold).pack(anchor='w', pady=(10,3), padx=5)
-        for item_data in all_sensors_data:
-            col = item_data['name']
-            frm = ctk.CTkFrame(self.scrollable_frame, fg_color="transparent")
-            frm.pack(anchor='w', fill=ctk.X, padx=5, pady=1)
-            
-            checked_text = "✅" if item_data['is_checked'] else "🔲"
-            btn_check = ctk.CTkButton(frm, text=checked_text, width=30, height=30, command=lambda c=col: self.toggle_checked(c), corner_radius=6, fg_color="transparent", hover_color="#DCE4EE", text_color_disabled="grey", text_color="black", font=self.chinese_font)
-            btn_check.pack(side=ctk.LEFT, padx=(0,3))
-            
-            eye_text = "👁️" if item_data['is_visible'] else "🙈"
-            btn_eye = ctk.CTkButton(frm, text=eye_text, width=30, height=30, command=lambda c=col: self.toggle_visible(c), corner_radius=6, fg_color="transparent", hover_color="#DCE4EE", text_color_disabled="grey", text_color="black", font=self.chinese_font)
-            btn_eye.pack(side=ctk.LEFT, padx=(0,5))
-            display_text = f"{get_equipment_chinese_name(col)} ({col})" # 顯示中文名稱和原始 tag
-            ctk.CTkLabel(frm, text=display_text, font=self.chinese_font).pack(side=ctk.LEFT, pady=2)
-            
     def update_plot_if_data_loaded(self):
         if self.df_all is not None:
-            self.update_plot()
+            self.request_redraw(render_scheduler.DATA)
 
-    # refresh_panel method is now removed, its logic is split into
-    # _filter_columns_thread_target and _render_panel_from_data
+    def request_redraw(self, *reasons):
+        """標記需要重繪 (見 render_scheduler 的重繪原因)，由排程器合併後於下一個影格執行"""
+        if self.plot_view.interacting:
+            return # 拖曳中以 blit 更新，放開滑鼠後再完整重繪
+        self.redraw_scheduler.request(*reasons)
+
+    def _render(self, reasons):
+        if self.df_all is not None and reasons <= {render_scheduler.YLIM}:
+            self.canvas_plot.draw_idle() # 只有 Y 軸範圍改變，不需重新計算資料
+        else:
+            # 範圍、資料或欄位改變時不保留拖曳 / 縮放過的軸範圍，只有 YLIM 在同一個檢視內保留
+            self.plot_view.reset_autoscale()
+            self.update_plot()
 
     def toggle_visible(self, col):
         if self.df_all is None: return
         self.is_visible[col] = not self.is_visible.get(col, True)
-        self.refresh_panel_if_data_loaded()
-        self.after(1, self.update_plot)
+        self.sensor_list.refresh_col(col) # 只更新顯示此欄位的列
+        self.request_redraw(render_scheduler.COLUMNS)
 
     def toggle_checked(self, col):
         if self.df_all is None: return
         v = self.vars_all.get(col, None)
         if v:
             v.set(not v.get())
-        self.refresh_panel_if_data_loaded()
-        self.after(1, self.update_plot)
+        with self.profiler.frame('panel'), self.profiler.stage('rebind'):
+            self.sensor_list.set_selected([c for c in self.all_cols if self.vars_all[c].get()])
+        self.request_redraw(render_scheduler.COLUMNS)
 
     def pick_start_time(self):
         if self.df_all is None: return
@@ -412,13 +906,15 @@ class SensorPicker(ctk.CTk):
         if self.df_all is None: return
         if event.button == 1 and event.inaxes == self.ax:
             self._dragging = True
-            self._drag_start_x = event.xdata
+            self._drag_start_x = event.x # 以像素計算位移，拖曳期間 xlim 會跟著改變
+            self._drag_start_xlim = self.ax.get_xlim()
             try:
                 self._drag_start_t0 = pd.Timestamp(self.start_time.get())
                 self._drag_start_t1 = pd.Timestamp(self.end_time.get())
             except Exception: # 如果時間格式不對，則不進行拖曳
                 self._dragging = False
                 return
+            self._begin_x_pan()
         elif event.button in [2, 3] and event.inaxes == self.ax: # Middle or Right click for Y-axis drag
             active_ax = event.inaxes
             if self.ax2 and active_ax == self.ax2: # If event is on ax2, drag ax2
@@ -430,16 +926,43 @@ class SensorPicker(ctk.CTk):
                 self._y_drag = True
                 self._y_drag_start = event.y
                 self._y_lim_start = self._y_drag_ax.get_ylim()
+                self.redraw_scheduler.flush()
+                self.plot_view.begin_interaction()
 
+    def _begin_x_pan(self):
+        """
+        開始水平拖曳：先快取靜態背景，再把線條資料延伸到左右各一個視窗寬度，
+        拖曳期間只移動 xlim 並 blit，放開時再完整重繪
+        """
+        self.redraw_scheduler.flush()
+        self.plot_view.begin_interaction()
+        xlim = self.ax.get_xlim()
+        ylims = [(ax, ax.get_ylim()) for ax in (self.ax, self.plot_view.ax2)]
+        # 拖曳期間的 set_xlim / set_ylim 會關閉自動範圍，放開時恢復
+        self._pan_autoscale = [(ax, ax.get_autoscalex_on(), ax.get_autoscaley_on()) for ax in (self.ax, self.plot_view.ax2)]
+        tz = pytz.timezone('Asia/Taipei')
+        start, end = self._drag_start_t0, self._drag_start_t1
+        if start.tzinfo is None: start = start.tz_localize(tz)
+        if end.tzinfo is None: end = end.tz_localize(tz)
+        span = end - start
+        self._update_artists(start - span, end + span, self._plot_bucket_count() * 3)
+        self.ax.set_xlim(xlim)
+        for ax, ylim in ylims:
+            ax.set_ylim(ylim)
+        self.plot_view.blit()
 
     def on_motion(self, event):
         if self.df_all is None: return
-        if self._dragging and event.inaxes == self.ax and event.xdata is not None and self._drag_start_x is not None:
-            offset = self._drag_start_x - event.xdata
-            offset_s = offset * 24 * 60 * 60 
+        if self._dragging and event.x is not None and self._drag_start_x is not None:
+            x0, x1 = self._drag_start_xlim
+            offset = (self._drag_start_x - event.x) * (x1 - x0) / self.ax.bbox.width
+            self.ax.set_xlim(x0 + offset, x1 + offset)
+            self.plot_view.blit()
+            offset_s = offset * 24 * 60 * 60
             try:
                 new_t0 = self._drag_start_t0 + pd.Timedelta(seconds=offset_s)
                 new_t1 = self._drag_start_t1 + pd.Timedelta(seconds=offset_s)
+                # 拖曳中 request_redraw 會被略過，只更新輸入框
                 self.start_time.set(new_t0.strftime("%Y-%m-%d %H:%M:%S"))
                 self.end_time.set(new_t1.strftime("%Y-%m-%d %H:%M:%S"))
             except Exception:
@@ -450,17 +973,27 @@ class SensorPicker(ctk.CTk):
             pixel_to_data = (y1 - y0) / self._y_drag_ax.get_figure().bbox.height
             shift = delta * pixel_to_data
             self._y_drag_ax.set_ylim(y0 + shift, y1 + shift)
-            self.fig.tight_layout()
-            self.canvas_plot.draw()
+            self.plot_view.blit()
 
     def on_release(self, event):
         if self.df_all is None: return
+        was_dragging, was_y_drag = self._dragging, self._y_drag
         self._dragging = False
         self._drag_start_x = None
         self._y_drag = False
         self._y_drag_start = None
         self._y_lim_start = None
         self._y_drag_ax = None # Reset dragged axis
+        if self.plot_view.interacting:
+            self.plot_view.end_interaction()
+            if was_dragging:
+                for ax, x_on, y_on in self._pan_autoscale:
+                    ax.set_autoscalex_on(x_on)
+                    ax.set_autoscaley_on(y_on)
+                self.request_redraw(render_scheduler.RANGE) # 依新範圍重新切片與抽樣
+            elif was_y_drag:
+                self.fig.tight_layout()
+                self.canvas_plot.draw_idle()
 
     def on_scroll(self, event):
         if self.df_all is None or event.inaxes not in [self.ax, self.ax2]: # Check if scroll is on ax or ax2
@@ -479,8 +1012,7 @@ class SensorPicker(ctk.CTk):
         new_ymax = y_mouse + new_height * (1 - rel_pos)
         
         active_ax.set_ylim([new_ymin, new_ymax])
-        self.fig.tight_layout()
-        self.canvas_plot.draw()
+        self.request_redraw(render_scheduler.YLIM)
 
     def download_csv(self):
         if self.df_all is None:
@@ -498,20 +1030,23 @@ class SensorPicker(ctk.CTk):
             messagebox.showerror("錯誤", "請正確輸入時間")
             return
 
-        mask = (self.df_all[self.time_col] >= start) & (self.df_all[self.time_col] <= end)
-        df_to_download = self.df_all.loc[mask]
+        i0, i1 = self.time_index.positions(start, end)
         selected_cols_to_download = [col for col, v in self.vars_all.items() if v.get()]
         
-        if not selected_cols_to_download or df_to_download.empty:
+        if not selected_cols_to_download or i1 <= i0:
             messagebox.showwarning("無資料", "此區段無資料可下載，或未勾選任何欄位")
             return
             
+        self._update_derived([c for c in selected_cols_to_download if c in self._derived_cols()]) # 隱藏中的衍生通道尚未計算
         cols_to_export = [self.time_col] + selected_cols_to_download
-        export_cols_final = [c for c in cols_to_export if c in df_to_download.columns]
+        export_cols_final = [c for c in cols_to_export if c in self.df_all.columns]
         
         if not export_cols_final:
             messagebox.showwarning("無資料", "選取的欄位在此時間區段內無資料")
             return
+        if self._export_cancel_event is not None:
+            messagebox.showinfo("提示", "已有匯出作業進行中")
+            return
 
         timefmt = "%Y%m%d_%H%M%S"
         fname = f"sensor_{start.strftime(timefmt)}_{end.strftime(timefmt)}.csv"
@@ -519,13 +1054,65 @@ class SensorPicker(ctk.CTk):
             title="儲存資料為CSV",
             defaultextension=".csv",
             initialfile=fname,
-            filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")]
+            filetypes=FILETYPES # 另可選 gzip / zstd 壓縮的 CSV 或 Parquet
         )
         if fpath:
             try:
-                df_to_download[export_cols_final].to_csv(fpath, index=False, encoding="utf-8-sig")
-            except Exception as e:
+                check_format(export_format(fpath))
+            except ValueError as e:
                 messagebox.showerror("CSV儲存錯誤", str(e))
+                return
+            # 淺複製：延遲載入模式之後移除的欄位不影響匯出中的資料
+            self._start_export(self.df_all.copy(deep=False), export_cols_final, fpath, i0, i1)
+
+    def _start_export(self, df, columns, fpath, i0, i1):
+        """
+        在背景執行緒分塊寫出 df 第 [i0, i1) 列，不複製整個範圍，介面在匯出時仍可操作。
+        df 為開始時的資料 (跟隨模式接上新資料時會建立新的 DataFrame，不影響匯出中的內容)
+        """
+        cancel_event = threading.Event()
+        self._export_cancel_event = cancel_event
+        self.export_progress_bar.set(0)
+        self.export_status_label.configure(text=f"匯出中：{os.path.basename(fpath)}")
+        self.export_frame.pack(after=self.download_csv_button, fill=ctk.X, pady=(0, 5))
+
+        def progress(rows, total_rows):
+            self.after(0, self._update_export_progress, cancel_event, rows, total_rows)
+
+        def worker():
+            try:
+                export_frame(df, columns, fpath, i0, i1, encoding=self.export_encoding,
+                             progress=progress, cancel_event=cancel_event)
+            except ExportCancelled:
+                self.after(0, self._on_export_finished, cancel_event, None)
+            except Exception as e:
+                self.after(0, self._on_export_finished, cancel_event, e)
+            else:
+                self.after(0, self._on_export_finished, cancel_event, None)
+
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+
+    def cancel_export(self):
+        if self._export_cancel_event is not None:
+            self._export_cancel_event.set()
+            self.export_status_label.configure(text="取消中…")
+
+    def _update_export_progress(self, cancel_event, rows, total_rows):
+        if cancel_event is not self._export_cancel_event or cancel_event.is_set():
+            return
+        fraction = rows / total_rows if total_rows else 1.0
+        self.export_progress_bar.set(fraction)
+        self.export_status_label.configure(text=f"已匯出 {rows:,} / {total_rows:,} 列 ({fraction:.0%})")
+
+    def _on_export_finished(self, cancel_event, error):
+        if cancel_event is not self._export_cancel_event:
+            return
+        self._export_cancel_event = None
+        self.export_frame.pack_forget()
+        if error is not None:
+            messagebox.showerror("CSV儲存錯誤", str(error))
 
     def download_png(self):
         if self.df_all is None:
@@ -542,224 +1129,502 @@ class SensorPicker(ctk.CTk):
         except Exception:
             messagebox.showerror("錯誤", "請正確輸入時間")
             return
-        timefmt = "%Y%m%d_%H%M%S"
-        fname = f"plot_{start.strftime(timefmt)}_{end.strftime(timefmt)}.png"
+        self.redraw_scheduler.flush() # 確保圖表反映最新狀態
         img_path = filedialog.asksaveasfilename(
             title="儲存目前圖表為PNG",
             defaultextension=".png",
-            initialfile=fname,
+            initialfile=png_filename(start, end),
             filetypes=[("PNG Images", "*.png"), ("All Files", "*.*")]
         )
         if img_path:
-            try:
-                self.fig.savefig(img_path, dpi=180, bbox_inches='tight', transparent=False)
-            except Exception as e:
-                messagebox.showerror("圖表儲存錯誤", str(e))
+            # 在背景以目前檢視設定的快照重新繪製，不佔用介面
+            self._submit_png_jobs([(self._view_spec(start, end), img_path)])
+
+    # 批次輸出的切分方式：名稱 -> (每段小時數, 對齊的起始時刻)
+    BATCH_SPLITS = {
+        "每小時": (1, 0),
+        "每班 (06:00 / 18:00)": (12, 6),
+        "每天": (24, 0),
+    }
+
+    def download_png_batch(self):
+        """將目前時間範圍依小時 / 班別 / 天切成多張圖，在背景依序輸出到選擇的資料夾"""
+        if self.df_all is None:
+            messagebox.showwarning("無資料", "請先載入 CSV 檔案")
+            return
+        tz = pytz.timezone('Asia/Taipei')
+        try:
+            start = pd.Timestamp(self.start_time.get())
+            if start.tzinfo is None:
+                start = start.tz_localize(tz)
+            end = pd.Timestamp(self.end_time.get())
+            if end.tzinfo is None:
+                end = end.tz_localize(tz)
+        except Exception:
+            messagebox.showerror("錯誤", "請正確輸入時間")
+            return
+        self.redraw_scheduler.flush()
+
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("批次下載圖檔")
+        dialog.transient(self)
+        ctk.CTkLabel(dialog, text=f"{str(start)[:19]} ~ {str(end)[:19]}\n依下列方式切分，每段一張圖：",
+                     font=self.chinese_font, justify='left').pack(padx=15, pady=(15, 5), anchor='w')
+        split_var = ctk.StringVar(value=next(iter(self.BATCH_SPLITS)))
+        ctk.CTkOptionMenu(dialog, variable=split_var, values=list(self.BATCH_SPLITS), font=self.chinese_font,
+                          dropdown_font=self.chinese_font).pack(padx=15, pady=5, fill=ctk.X)
+
+        def ok():
+            hours, anchor_hour = self.BATCH_SPLITS[split_var.get()]
+            dialog.destroy()
+            out_dir = filedialog.askdirectory(title="選擇輸出資料夾")
+            if not out_dir:
+                return
+            windows = split_windows(start, end, hours, anchor_hour)
+            self._submit_png_jobs([(self._view_spec(s, e), os.path.join(out_dir, png_filename(s, e)))
+                                   for s, e in windows])
+        ctk.CTkButton(dialog, text="開始", command=ok, corner_radius=8, font=self.chinese_font_bold).pack(padx=15, pady=(5, 15))
+        dialog.grab_set()
+
+    def _view_spec(self, start, end):
+        """目前檢視設定的快照：可見的勾選欄位、抽樣設定、圖表大小與使用者調整過的 Y 範圍"""
+        tags = [col for col, v in self.vars_all.items() if v.get() and self.is_visible.get(col, True)]
+        ax2 = self.plot_view.ax2
+        return ViewSpec(
+            tags=tags, start=start, end=end, raw=self.raw_render.get(),
+            figsize=tuple(self.fig.get_size_inches()),
+            ylim=None if self.ax.get_autoscaley_on() else self.ax.get_ylim(),
+            ylim2=None if ax2.get_autoscaley_on() else ax2.get_ylim())
+
+    def _render_source(self, specs):
+        """
+        輸出用的資料來源：目前資料的快照 (跟隨模式之後接上的資料不影響)；
+        資料集中有範圍尚未載入時，改為在工作執行緒建立涵蓋整個資料集的 RenderSource
+        """
+        if self.dataset is not None and not all(self.dataset.is_loaded(sp.start, sp.end) for sp in specs):
+            paths = [part.path for part in self.dataset.parts]
+            cache_dir, float32 = self.frame_cache.cache_dir, self.float32_sensors
+            return lambda: RenderSource(paths, cache_dir=cache_dir, float32=float32)
+        time_index = copy.copy(self.time_index) # append() 只替換原物件的屬性
+        pyramid = None
+        if self.pyramid is not None:
+            pyramid = MinMaxPyramid(self.pyramid.columns, dict(self.pyramid.levels)) # extend() 只替換原物件的各層
+        # 工作執行緒使用目前欄位的快照與各自的範圍統計：主執行緒之後加入 / 移除欄位
+        # (延遲載入、衍生通道) 或接上新資料時不影響輸出中的資料
+        df = self.df_all.copy(deep=False)
+        return FrameSource(df, self.time_col, time_index, pyramid, RangeStats(df))
+
+    def _submit_png_jobs(self, jobs):
+        if not jobs:
+            return
+        if not self.png_queue.busy:
+            self._png_errors = []
+        self.png_queue.submit(self._render_source([spec for spec, _ in jobs]), jobs)
+        self._update_png_queue_label()
+
+    def cancel_png_queue(self):
+        self.png_queue.cancel()
+        self._update_png_queue_label()
+
+    def _on_png_progress(self, done, total, path, error):
+        if error is not None:
+            self._png_errors.append(f"{os.path.basename(path)}: {error}")
+        self._update_png_queue_label()
+        if not self.png_queue.busy and self._png_errors:
+            errors, self._png_errors = self._png_errors, []
+            messagebox.showerror("圖表儲存錯誤", "\n".join(errors[:10]))
+
+    def _update_png_queue_label(self):
+        if self.png_queue.busy:
+            self.png_queue_label.configure(text=f"圖檔輸出中：{self.png_queue.done} / {self.png_queue.total}")
+            self.png_queue_frame.pack(after=self.batch_png_button, fill=ctk.X, pady=(0, 5))
+        else:
+            self.png_queue_frame.pack_forget()
+
+    def _plot_bucket_count(self):
+        """依目前主軸寬度 (像素) 決定抽樣段數；勾選原始資料時回傳 0 表示不抽樣"""
+        if self.raw_render.get():
+            return 0
+        return max(int(self.ax.bbox.width), 1)
+
+    def on_canvas_resize(self, event):
+        """畫布寬度改變時重新抽樣 (延遲執行，避免拖曳視窗時連續重繪)"""
+        if self.df_all is None or self.raw_render.get():
+            return
+        width = int(self.ax.bbox.width)
+        if width == self._last_plot_width:
+            return
+        self._last_plot_width = width
+        if self._resize_after_id:
+            self.after_cancel(self._resize_after_id)
+        self._resize_after_id = self.after(200, lambda: self.request_redraw(render_scheduler.DATA))
 
     def update_plot(self):
+        with self.profiler.frame('redraw'):
+            self._update_plot()
+
+    def _update_plot(self):
         if self.df_all is None or self.time_col is None:
-            self.ax.clear()
-            if self.ax2:
-                if self.ax2.get_figure(): self.ax2.remove()
-                self.ax2 = None
-            self.ax.set_title('請先載入 CSV 檔案')
-            self.canvas_plot.draw()
+            self.plot_view.clear('請先載入 CSV 檔案')
+            self.canvas_plot.draw_idle()
             return
 
-        self.ax.clear()
-        if self.ax2:
-            if self.ax2.get_figure(): self.ax2.remove()
-            self.ax2 = None
-
         tz = pytz.timezone('Asia/Taipei')
         try:
             start_str = self.start_time.get()
             end_str = self.end_time.get()
             if not start_str or not end_str:
-                self.ax.set_title('時間範圍未設定')
-                self.canvas_plot.draw()
+                self.plot_view.clear('時間範圍未設定')
+                self.canvas_plot.draw_idle()
                 return
             start = pd.Timestamp(start_str)
             if start.tzinfo is None: start = start.tz_localize(tz)
             end = pd.Timestamp(end_str)
             if end.tzinfo is None: end = end.tz_localize(tz)
         except Exception as e:
-            self.ax.set_title(f'請正確輸入時間: {e}')
+            self.plot_view.clear(f'請正確輸入時間: {e}')
             self.fig.tight_layout()
-            self.canvas_plot.draw()
+            self.canvas_plot.draw_idle()
             return
 
-        mask = (self.df_all[self.time_col] >= start) & (self.df_all[self.time_col] <= end)
-        df = self.df_all.loc[mask]
+        if (self.dataset is not None and not self.dataset.is_loaded(start, end)
+                and self.dataset.window_key(start, end) != self._dataset_skip_key):
+            self._load_dataset_window(start, end) # 先以目前已載入的資料繪製
 
-        if df.empty:
-            self.ax.set_title('此時間範圍內無資料')
+        with self.profiler.stage('slice'):
+            i0, i1 = self.time_index.positions(start, end) # 二分搜尋，不需對整欄做遮罩
+        if i1 <= i0:
+            self.plot_view.clear('載入中…' if self._load_cancel_event is not None else '此時間範圍內無資料')
             self.fig.tight_layout()
-            self.canvas_plot.draw()
+            self.canvas_plot.draw_idle()
+            return
+
+        self._last_plot_width = int(self.ax.bbox.width)
+        self._plot_rows = (i0, i1)
+        layout_changed = self._update_artists(start, end, self._plot_bucket_count())
+        if layout_changed:
+            with self.profiler.stage('tight_layout'):
+                self.fig.tight_layout()
+        self._draw_canvas()
+        if self.stats_window is not None:
+            self._refresh_stats_table()
+        if self.switch_window is not None:
+            self._refresh_switch_table()
+
+    def _draw_canvas(self):
+        """排程重繪畫布；計時中改為立即繪製，才能量到 Agg draw 的時間"""
+        if self.profiler.enabled:
+            with self.profiler.stage('draw'):
+                self.canvas_plot.draw()
+        else:
+            self.canvas_plot.draw_idle()
+
+    def toggle_profile_hud(self):
+        """切換效能分析顯示；有設定記錄檔 (profile_log) 時即使不顯示也持續計時"""
+        show = self.profile_hud_var.get()
+        self.profiler.enabled = show or bool(self.profiler.log_path)
+        if show:
+            self.profile_hud.place(relx=1.0, rely=0.0, x=-12, y=12, anchor='ne')
+            self._update_profile_hud()
+        else:
+            self.profile_hud.place_forget()
+
+    def _update_profile_hud(self):
+        if not self.profile_hud_var.get():
             return
+        reports = [self.profiler.report(name) for name in ('redraw', 'panel', 'load', 'load_apply', 'load_columns')
+                   if name in self.profiler.last]
+        self.profile_hud.configure(text='\n'.join(reports) or "尚無計時資料")
 
+    def _update_artists(self, start, end, n_buckets):
+        """以 [start, end] 的資料更新圖上的 artist，回傳版面是否改變"""
         selected_cols = [col for col, v in self.vars_all.items() if v.get() and self.is_visible.get(col, True)]
+        derived_cols = [col for col in selected_cols if col in self._derived_cols()]
+        if self.column_store is not None:
+            needed = selected_cols + self.derived.inputs(derived_cols)
+            missing = self.column_store.missing(needed)
+            if missing:
+                self._load_columns(missing) # 先畫已載入的欄位，讀取完成後再重繪
+            self.column_store.touch(needed)
+        self._update_derived(derived_cols)
+        selected_cols = [col for col in selected_cols if col in self.df_all.columns]
         switch_cols_selected = [col for col in selected_cols if col in self.switch_all]
         sensor_cols_selected = [col for col in selected_cols if col in self.sensor_all]
+        pyramid = None if self.raw_render.get() else self.pyramid
+        # 與批次輸出 (render_cli.py) 共用同一個繪圖流程
+        return update_view(self.plot_view, self.df_all, self.time_index, pyramid,
+                           switch_cols_selected, sensor_cols_selected, start, end, n_buckets, self.range_stats,
+                           self.transitions)
 
-        patch_handles = []
-        short_bar_ymin = 0.85
-        short_bar_height = 0.03
-        short_bar_gap = 0.01
-        short_bar_levels = []
-        short_bar_pos_map = {}
-        for col in switch_cols_selected:
-            if col.startswith("b-") or col.startswith("p-") or col.startswith("av-"):
-                y_base = short_bar_ymin - (len(short_bar_levels) * (short_bar_height + short_bar_gap))
-                short_bar_pos_map[col] = (y_base, y_base + short_bar_height)
-                short_bar_levels.append(col)
-
-        for col_name in switch_cols_selected:
-            if col_name not in df.columns or df[col_name].empty: continue
-            times = df[self.time_col].values
-            vals = df[col_name].astype(str).values
-            if not len(times): continue
-            seg_start = times[0]
-            seg_val = vals[0]
-            for i in range(1, len(times)):
-                if vals[i] != seg_val or i == len(times)-1:
-                    seg_end = times[i] if vals[i] != seg_val else times[i]+np.timedelta64(1,'s')
-                    y0, y1 = short_bar_pos_map.get(col_name, (0.0, 1.0))
-                    self.ax.axvspan(pd.to_datetime(seg_start), pd.to_datetime(seg_end),
-                                    facecolor=state_color(seg_val, col_name), alpha=0.45,
-                                    ymin=y0, ymax=y1)
-                    if i < len(times) -1 or vals[i] == seg_val:
-                        seg_start = times[i]
-                        seg_val = vals[i]
-                    elif i == len(times)-1 and vals[i] != seg_val:
-                        y0, y1 = short_bar_pos_map.get(col_name, (0.0, 1.0))
-                        self.ax.axvspan(pd.to_datetime(times[i]), pd.to_datetime(times[i]+np.timedelta64(1,'s')),
-                                        facecolor=state_color(vals[i], col_name), alpha=0.45,
-                                        ymin=y0, ymax=y1)
-            unique_switch_vals = sorted(list(set(vals)))
-            for state_val in unique_switch_vals:
-                patch_handles.append(mpatches.Patch(color=state_color(state_val), label=f"{col_name} = {state_val}"))
-    
-        # --- 準備 sensor data 並分類 (移出迴圈) ---
-        valid_sensor_cols = [col for col in sensor_cols_selected if col in df.columns and not df[col].isnull().all()]
-        ys_sensor_raw_map = {col: pd.to_numeric(df[col], errors='coerce').values for col in valid_sensor_cols}
-        sensor_means_map = {col: np.nanmean(ys_sensor_raw_map[col]) if col in ys_sensor_raw_map and not np.all(np.isnan(ys_sensor_raw_map[col])) else np.nan for col in valid_sensor_cols}
-        
-        # 按 sensor 類型分組
-        sensor_groups = {}
-        for col in valid_sensor_cols:
-            prefix = col.split('-')[0]
-            if prefix not in sensor_groups:
-                sensor_groups[prefix] = []
-            sensor_groups[prefix].append(col)
-    
-        # 計算每個組的 min/max/range
-        group_stats = {}
-        for prefix, cols in sensor_groups.items():
-            min_vals, max_vals = [], []
-            for col in cols:
-                y_raw = ys_sensor_raw_map[col]
-                if not np.all(np.isnan(y_raw)):
-                    min_vals.append(np.nanmin(y_raw))
-                    max_vals.append(np.nanmax(y_raw))
-            if min_vals and max_vals:
-                group_min = min(min_vals)
-                group_max = max(max_vals)
-                group_stats[prefix] = {'min': group_min, 'max': group_max, 'range': group_max - group_min}
-    
-        reference_cols_list = []
-        scaled_cols_list = []
-        
-        if group_stats:
-            # 選擇第一個有範圍的組作為參考基準
-            reference_prefix = next((p for p, s in group_stats.items() if s['range'] > 1e-9), None)
-            
-            if reference_prefix is None: # 如果所有組都沒有範圍 (都是常數)
-                reference_prefix = next(iter(group_stats)) # 就選第一個
-    
-            reference_range = group_stats[reference_prefix]['range']
-            
-            for prefix, cols in sensor_groups.items():
-                current_range = group_stats.get(prefix, {}).get('range', 0.0)
-                # 如果沒有參考範圍，或當前範圍與參考範圍相似，或就是參考組本身，則畫在主軸
-                if reference_range < 1e-9 or current_range <= reference_range * self.RANGE_SIMILARITY_FACTOR or prefix == reference_prefix:
-                    reference_cols_list.extend(cols)
-                else:
-                    scaled_cols_list.extend(cols)
-        
-        
-        # --- Y 軸管理 ---
-        ax1_has_data_lines = bool(reference_cols_list)
-        ax2_needs_creation = bool(scaled_cols_list)
-    
-        if ax2_needs_creation:
-            self.ax2 = self.ax.twinx() # Create secondary axis
-        
-        # --- 繪製 reference_cols_list (主 Y 軸) ---
-        for col_name in reference_cols_list:
-            y_raw = ys_sensor_raw_map.get(col_name)
-            if y_raw is not None and not np.all(np.isnan(y_raw)):
-                self.ax.plot(df[self.time_col], y_raw, label=f"{get_equipment_chinese_name(col_name)} (μ: {sensor_means_map.get(col_name, np.nan):.2f})")
-    
-        # --- 繪製 scaled_cols_list (次 Y 軸) ---
-        if self.ax2 and scaled_cols_list:
-            # 定義一組高對比度的顏色
-            colors = plt.cm.get_cmap('tab10').colors
-            for i, col_name in enumerate(scaled_cols_list):
-                y_raw = ys_sensor_raw_map.get(col_name)
-                mean_v = sensor_means_map.get(col_name, np.nan)
-                if y_raw is not None and not np.all(np.isnan(y_raw)):
-                    min_v, max_v = np.nanmin(y_raw), np.nanmax(y_raw)
-                    color = colors[i % len(colors)] # 循環使用顏色
-                    if (max_v - min_v) > 1e-9:
-                        y_scaled = (y_raw - min_v) / (max_v - min_v) # Scale to [0,1]
-                        self.ax2.plot(df[self.time_col], y_scaled, label=f"{get_equipment_chinese_name(col_name)} (scaled, μ: {mean_v:.2f})", color=color)
-                    else: # Constant value, plot as 0.5 on scaled axis
-                        self.ax2.plot(df[self.time_col], np.full_like(y_raw, 0.5), label=f"{get_equipment_chinese_name(col_name)} (scaled, μ: {mean_v:.2f})", color=color)
-        
-        # --- 圖例 ---
-        h1, l1 = self.ax.get_legend_handles_labels()
-        h2, l2 = [], []
-        if self.ax2: # If ax2 was created
-            h2_temp, l2_temp = self.ax2.get_legend_handles_labels()
-            if h2_temp: # If ax2 actually plotted something
-                h2, l2 = h2_temp, l2_temp
-        
-        all_handles = patch_handles + h1 + h2
-        all_labels_text = [h.get_label() for h in patch_handles] + l1 + l2
-        
-        unique_labels_map = {} # To store unique labels and their handles
-        final_handles, final_labels_text_ordered = [], []
-        for handle, label_text_item in zip(all_handles, all_labels_text):
-            if label_text_item not in unique_labels_map: # Ensure unique labels in legend
-                unique_labels_map[label_text_item] = handle
-                final_handles.append(handle)
-                final_labels_text_ordered.append(label_text_item)
-    
-        if final_handles:
-             self.ax.legend(final_handles, final_labels_text_ordered, loc='upper left', fontsize=9, ncol=1)
-        
-        # --- Y 軸標籤 ---
-        self.ax.set_ylabel("絕對數值 (基準組)" if ax1_has_data_lines else "數值") # Set primary Y-axis label
-        if self.ax2 and scaled_cols_list: # Only set label and make visible if ax2 has data
-            self.ax2.set_ylabel("正規化數值 (其他組)")
-            self.ax2.set_visible(True)
-        elif self.ax2: # ax2 exists but has no data, make it invisible
-             self.ax2.set_visible(False)
-    
-    
-        # --- 圖表標題 ---
-        if not (switch_cols_selected or valid_sensor_cols):
-            self.ax.set_title('請至少勾選一個感測器')
-        # df.empty case is handled at the beginning, no need to set title here for it
-        
-        # --- Final adjustments ---
-        self.ax.set_xlabel('時間')
-        self.ax.relim()
-        self.ax.autoscale_view(tight=True)
-        if self.ax2 and self.ax2.get_visible():
-            self.ax2.relim()
-            self.ax2.autoscale_view(tight=True)
-        self.fig.tight_layout()
-        self.canvas_plot.draw()
+    def _derived_cols(self):
+        """欄位清單中的衍生通道"""
+        return self.sensor_all[len(self._data_sensor_cols):]
+
+    def _data_window_key(self):
+        """目前資料範圍的 key (列數與首尾時間)，衍生通道的結果依此快取"""
+        epoch_ns = self.time_index.epoch_ns
+        if not len(epoch_ns):
+            return (0,)
+        return (len(self.df_all), int(epoch_ns[0]), int(epoch_ns[-1]))
+
+    def _update_derived(self, cols):
+        """計算尚未在 df_all 中的衍生通道並加入為欄位；引用的欄位尚未載入時等載入完成的重繪"""
+        pending = [col for col in cols if col not in self.df_all.columns]
+        if not pending:
+            return
+        if self.column_store is not None and self.column_store.missing(self.derived.inputs(pending)):
+            return
+        key = self._data_window_key()
+        failed = []
+        with self.profiler.stage('derived'):
+            for col in pending:
+                try:
+                    values = self.derived.evaluate(col, self.df_all, self.time_col, key)
+                except ValueError as e:
+                    failed.append(f"{col}: {e}")
+                    self.vars_all[col].set(False) # 取消勾選，避免重繪時反覆計算
+                    continue
+                self.df_all[col] = values
+                self.range_stats.discard(col)
+        if failed:
+            self.refresh_panel_if_data_loaded()
+            messagebox.showerror("衍生通道錯誤", "\n".join(failed))
+        self._update_derived_list()
+
+    def _drop_derived(self, name):
+        """移除 df_all 中已計算的衍生通道 (定義變更或刪除時)"""
+        if self.df_all is not None and name in self.df_all.columns and name not in self._data_sensor_cols:
+            del self.df_all[name]
+            self.range_stats.discard(name)
+
+    def show_derived_channels(self):
+        """開啟衍生通道對話框：以運算式定義新的通道，在欄位清單中與一般感測欄位相同"""
+        if self.df_all is None: return
+        if self.derived_window is not None:
+            self.derived_window.lift()
+            return
+        win = ctk.CTkToplevel(self)
+        win.title("衍生通道")
+        win.geometry("640x480")
+        ctk.CTkLabel(win, text=DERIVED_HELP_TEXT, font=self.chinese_font, anchor='w', justify='left').pack(fill=ctk.X, padx=10, pady=(8, 4))
+        table_frame = ctk.CTkFrame(win, fg_color="transparent")
+        table_frame.pack(fill=ctk.BOTH, expand=1, padx=10)
+        columns = ('name', 'expr', 'time')
+        headings = ('名稱', '運算式', '計算時間')
+        self.derived_tree = ttk.Treeview(table_frame, columns=columns, show='headings', selectmode='browse')
+        for col, heading in zip(columns, headings):
+            self.derived_tree.heading(col, text=heading)
+            self.derived_tree.column(col, width={'name': 120, 'expr': 360, 'time': 90}[col], anchor='e' if col == 'time' else 'w')
+        self.derived_tree.pack(fill=ctk.BOTH, expand=1)
+
+        form = ctk.CTkFrame(win, fg_color="transparent")
+        form.pack(fill=ctk.X, padx=10, pady=(5, 0))
+        ctk.CTkLabel(form, text="名稱：", font=self.chinese_font).grid(row=0, column=0, sticky='w')
+        name_var = ctk.StringVar()
+        ctk.CTkEntry(form, textvariable=name_var, width=140).grid(row=0, column=1, sticky='w', padx=(0, 10))
+        ctk.CTkLabel(form, text="運算式：", font=self.chinese_font).grid(row=0, column=2, sticky='w')
+        expr_var = ctk.StringVar()
+        ctk.CTkEntry(form, textvariable=expr_var).grid(row=0, column=3, sticky='ew')
+        form.grid_columnconfigure(3, weight=1)
+
+        def on_select(_event=None):
+            sel = self.derived_tree.selection()
+            if sel:
+                name_var.set(sel[0])
+                expr_var.set(self.derived.expressions[sel[0]].text)
+        self.derived_tree.bind('<<TreeviewSelect>>', on_select)
+
+        def save():
+            name = name_var.get().strip()
+            try:
+                self.derived.define(name, expr_var.get())
+            except ValueError as e:
+                messagebox.showerror("衍生通道錯誤", str(e), parent=win)
+                return
+            if name in self._data_sensor_cols or name in self.switch_all:
+                messagebox.showwarning("衍生通道", f"資料中已有欄位 {name}，清單中仍顯示資料欄位", parent=win)
+            self._on_derived_changed(name)
+
+        def remove():
+            sel = self.derived_tree.selection()
+            if not sel:
+                return
+            self.derived.remove(sel[0])
+            self._on_derived_changed(sel[0])
+
+        buttons = ctk.CTkFrame(win, fg_color="transparent")
+        buttons.pack(fill=ctk.X, padx=10, pady=(5, 10))
+        ctk.CTkButton(buttons, text="新增 / 更新", command=save, corner_radius=8, font=self.chinese_font_bold).pack(side=ctk.LEFT, padx=(0, 5))
+        ctk.CTkButton(buttons, text="刪除", command=remove, corner_radius=8, font=self.chinese_font).pack(side=ctk.LEFT)
+
+        def on_close():
+            self.derived_window = None
+            win.destroy()
+        win.protocol("WM_DELETE_WINDOW", on_close)
+        self.derived_window = win
+        self._update_derived_list()
 
+    def _on_derived_changed(self, name):
+        """衍生通道新增、修改或刪除後更新欄位清單並重繪 (引用此通道的其他通道一併重新計算)"""
+        for col in self._derived_cols() + [name]:
+            self._drop_derived(col)
+        self._update_column_lists()
+        self.refresh_panel_if_data_loaded()
+        self._update_derived_list()
+        self.save_config()
+        self.request_redraw(render_scheduler.COLUMNS)
+
+    def _update_derived_list(self):
+        """更新衍生通道對話框的清單與各通道最近一次的計算時間"""
+        if self.derived_window is None:
+            return
+        self.derived_tree.delete(*self.derived_tree.get_children())
+        for name, text in self.derived.definitions().items():
+            seconds = self.derived.last_eval.get(name)
+            self.derived_tree.insert('', 'end', iid=name, values=(
+                name, text, '' if seconds is None else f"{seconds * 1000:.1f} ms"))
+
+    def show_stats_table(self):
+        """開啟感測器統計表：目前時間範圍內各感測欄位的平均、最小、最大與缺值數 (已勾選的排在前面)"""
+        if self.df_all is None: return
+        if self.stats_window is not None:
+            self.stats_window.lift()
+            self._refresh_stats_table()
+            return
+        win = ctk.CTkToplevel(self)
+        win.title("感測器統計表")
+        win.geometry("760x480")
+        self.stats_range_label = ctk.CTkLabel(win, text="", font=self.chinese_font, anchor='w')
+        self.stats_range_label.pack(fill=ctk.X, padx=10, pady=(8, 4))
+        table_frame = ctk.CTkFrame(win, fg_color="transparent")
+        table_frame.pack(fill=ctk.BOTH, expand=1, padx=10, pady=(0, 10))
+        columns = ('name', 'tag', 'mean', 'min', 'max', 'count', 'nan')
+        headings = ('名稱', 'Tag', '平均', '最小', '最大', '有效筆數', '缺值')
+        self.stats_tree = ttk.Treeview(table_frame, columns=columns, show='headings')
+        for col, heading in zip(columns, headings):
+            self.stats_tree.heading(col, text=heading)
+            self.stats_tree.column(col, width=160 if col == 'name' else 80, anchor='w' if col in ('name', 'tag') else 'e')
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.stats_tree.yview)
+        self.stats_tree.configure(yscrollcommand=scrollbar.set)
+        self.stats_tree.pack(side=ctk.LEFT, fill=ctk.BOTH, expand=1)
+        scrollbar.pack(side=ctk.RIGHT, fill=ctk.Y)
+
+        def on_close():
+            self.stats_window = None
+            win.destroy()
+        win.protocol("WM_DELETE_WINDOW", on_close)
+        self.stats_window = win
+        self._refresh_stats_table()
+
+    def _refresh_stats_table(self):
+        """以範圍統計更新表格 (每欄只需 O(1) 個區塊查詢，重繪時一併更新)"""
+        if self._plot_rows is None or self.range_stats is None:
+            return
+        i0, i1 = self._plot_rows
+        selected = [c for c in self.sensor_all if self.vars_all[c].get()]
+        cols = selected + [c for c in self.sensor_all if not self.vars_all[c].get()]
+        table = self.range_stats.table(cols, i0, i1)
+        self.stats_tree.delete(*self.stats_tree.get_children())
+        fmt = lambda v: '' if np.isnan(v) else f"{v:.2f}"
+        for col, st in table.items():
+            self.stats_tree.insert('', 'end', values=(get_equipment_chinese_name(col), col, fmt(st.mean), fmt(st.min),
+                                                      fmt(st.max), f"{st.count:,}", f"{st.nan_count:,}"))
+        self.stats_range_label.configure(
+            text=f"{self.start_time.get()} ~ {self.end_time.get()}，共 {i1 - i0:,} 筆 (已勾選 {len(selected)} 個排在前面)")
+
+    def _event_cols(self):
+        """事件導覽使用的開關欄位：勾選且已載入的開關欄位"""
+        return [c for c in self.switch_all if self.vars_all[c].get() and c in self.df_all.columns]
+
+    def jump_to_event(self, direction):
+        """
+        將時間範圍移到勾選的開關欄位下一個 (direction=1) 或上一個 (-1) 狀態轉換，保持視窗長度並使事件位於中間。
+        以目前範圍的中間 (整秒) 為基準，在轉換索引中二分搜尋 (O(log n))
+        """
+        if self.df_all is None: return
+        cols = self._event_cols()
+        if not cols:
+            messagebox.showinfo("提示", "請先勾選開關欄位")
+            return
+        tz = pytz.timezone('Asia/Taipei')
+        try:
+            start = pd.Timestamp(self.start_time.get())
+            if start.tzinfo is None: start = start.tz_localize(tz)
+            end = pd.Timestamp(self.end_time.get())
+            if end.tzinfo is None: end = end.tz_localize(tz)
+        except Exception as e:
+            messagebox.showerror("時間格式錯誤", str(e))
+            return
+        length_s = max(int((end - start).total_seconds()), 1)
+        center_s = int(start.timestamp()) + length_s // 2
+        epoch_ns = self.time_index.epoch_ns
+        if direction > 0:
+            # 同一秒內的其他轉換視為目前的事件
+            i = int(np.searchsorted(epoch_ns, (center_s + 1) * 10**9, side='left'))
+            event = self.transitions.next_event(cols, i)
+        else:
+            i = int(np.searchsorted(epoch_ns, center_s * 10**9, side='left'))
+            event = self.transitions.prev_event(cols, i)
+        if event is None or event[0] >= len(epoch_ns): # 時間索引外的 NaT 列
+            messagebox.showinfo("提示", "已載入的資料中沒有{}的狀態轉換".format("之後" if direction > 0 else "之前"))
+            return
+        row, col = event
+        event_time = pd.Timestamp(int(epoch_ns[row]), tz='UTC').tz_convert(tz).floor('s')
+        new_start = event_time - pd.Timedelta(seconds=length_s // 2)
+        # trace 會合併成一次重繪
+        self.start_time.set(str(new_start)[:19])
+        self.end_time.set(str(new_start + pd.Timedelta(seconds=length_s))[:19])
+        _, from_states, to_states = self.transitions.events(col, row, row + 1)
+        self._last_event_text = f"{get_equipment_chinese_name(col)} ({col})：{from_states[0]} → {to_states[0]}"
+
+    def show_switch_table(self):
+        """開啟開關統計表：目前時間範圍內各開關欄位的切換次數、開啟次數與開啟 / 關閉時間 (已勾選的排在前面)"""
+        if self.df_all is None: return
+        if self.switch_window is not None:
+            self.switch_window.lift()
+            self._refresh_switch_table()
+            return
+        win = ctk.CTkToplevel(self)
+        win.title("開關統計表")
+        win.geometry("820x480")
+        self.switch_range_label = ctk.CTkLabel(win, text="", font=self.chinese_font, anchor='w', justify='left')
+        self.switch_range_label.pack(fill=ctk.X, padx=10, pady=(8, 4))
+        table_frame = ctk.CTkFrame(win, fg_color="transparent")
+        table_frame.pack(fill=ctk.BOTH, expand=1, padx=10, pady=(0, 10))
+        columns = ('name', 'tag', 'transitions', 'runs', 'on', 'off', 'last')
+        headings = ('名稱', 'Tag', '切換次數', '開啟次數', '開啟時間', '關閉時間', '最後狀態')
+        self.switch_tree = ttk.Treeview(table_frame, columns=columns, show='headings')
+        for col, heading in zip(columns, headings):
+            self.switch_tree.heading(col, text=heading)
+            self.switch_tree.column(col, width=160 if col == 'name' else 90, anchor='w' if col in ('name', 'tag', 'last') else 'e')
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.switch_tree.yview)
+        self.switch_tree.configure(yscrollcommand=scrollbar.set)
+        self.switch_tree.pack(side=ctk.LEFT, fill=ctk.BOTH, expand=1)
+        scrollbar.pack(side=ctk.RIGHT, fill=ctk.Y)
+
+        def on_close():
+            self.switch_window = None
+            win.destroy()
+        win.protocol("WM_DELETE_WINDOW", on_close)
+        self.switch_window = win
+        self._refresh_switch_table()
+
+    def _refresh_switch_table(self):
+        """以轉換索引更新開關統計表 (每欄只需二分搜尋與範圍內的轉換，重繪時一併更新)"""
+        if self._plot_rows is None or self.transitions is None:
+            return
+        i0, i1 = self._plot_rows
+        loaded = [c for c in self.switch_all if c in self.df_all.columns] # 延遲載入模式只列出已載入的欄位
+        selected = [c for c in loaded if self.vars_all[c].get()]
+        cols = selected + [c for c in loaded if not self.vars_all[c].get()]
+        epoch_ns = self.time_index.epoch_ns
+        fmt = lambda s: f"{int(s) // 3600}:{int(s) % 3600 // 60:02d}:{int(s) % 60:02d}"
+        self.switch_tree.delete(*self.switch_tree.get_children())
+        for col in cols:
+            st = self.transitions.summary(col, i0, i1, epoch_ns)
+            self.switch_tree.insert('', 'end', values=(get_equipment_chinese_name(col), col, f"{st.transitions:,}",
+                                                       f"{st.runs:,}", fmt(st.on_s), fmt(st.off_s), st.last_state))
+        text = f"{self.start_time.get()} ~ {self.end_time.get()}，共 {i1 - i0:,} 筆 (已勾選 {len(selected)} 個排在前面)"
+        if self._last_event_text:
+            text += f"\n最近跳到的事件：{self._last_event_text}"
+        self.switch_range_label.configure(text=text)
@@ -0,0 +1,360 @@
+import matplotlib
+import matplotlib.colors as mcolors
+import matplotlib.dates as mdates
+import matplotlib.patches as mpatches
+import numpy as np
+import pandas as pd
+import pytz
+from matplotlib.collections import PathCollection
+from matplotlib.lines import Line2D
+from matplotlib.path import Path
+
+from downsample import decimate
+from profiler import NULL_PROFILER
+from range_stats import RangeStats
+from utils import state_color_lut, state_segments, get_equipment_chinese_name
+
+TIMEZONE = pytz.timezone('Asia/Taipei')
+
+# 開關狀態短條的位置 (軸座標)
+SHORT_BAR_YMIN = 0.85
+SHORT_BAR_HEIGHT = 0.03
+SHORT_BAR_GAP = 0.01
+
+
+class PlotView:
+    """
+    保留式 (retained-mode) 繪圖模型：每個勾選欄位對應一個固定的 Line2D 或 PathCollection，
+    時間範圍改變時只以 set_data / set_paths 更新資料與軸範圍，
+    勾選或隱藏欄位時只新增或移除受影響的 artist，圖例僅在標籤改變時重建
+    """
+
+    def __init__(self, fig, ax, range_similarity_factor=2.5, profiler=None):
+        self.fig = fig
+        self.ax = ax
+        self.range_similarity_factor = range_similarity_factor
+        self.profiler = profiler or NULL_PROFILER # 分階段計時 (profiler.StageProfiler)
+        self.ax2 = ax.twinx() # 次要 Y 軸，只建立一次，沒有資料時隱藏
+        self.ax2.set_visible(False)
+        self.ax.xaxis_date(TIMEZONE)
+        self.ax.set_xlabel('時間')
+        self.lines = {} # col -> Line2D
+        self.switch_bars = {} # col -> PathCollection
+        self._bar_extents = {} # col -> 狀態短條的 x 範圍 (date2num)
+        self._legend_labels = None
+        self._layout_key = None
+        self._background = None # blit 用的靜態背景
+        self.interacting = False
+
+    def reset_autoscale(self):
+        """恢復兩個 Y 軸與 X 軸的自動範圍 (set_xlim / set_ylim 會關閉自動範圍，且之後不會自動恢復)"""
+        for ax in (self.ax, self.ax2):
+            ax.set_autoscale_on(True)
+
+    def clear(self, title=''):
+        """移除所有資料 artist 並顯示訊息標題"""
+        for ax in (self.ax, self.ax2):
+            for artist in list(ax.lines) + list(ax.collections) + list(ax.patches):
+                artist.remove()
+            if ax.get_legend():
+                ax.get_legend().remove()
+        self.lines = {}
+        self.switch_bars = {}
+        self._bar_extents = {}
+        self._legend_labels = None
+        self._layout_key = None
+        self.ax2.set_visible(False)
+        self.ax.set_ylabel('')
+        self.reset_autoscale() # 與 ax.clear() 相同，下一次更新重新依資料決定範圍
+        self.ax.set_title(title)
+
+    def update(self, df, times, switch_cols, sensor_cols, window_s, pyramid=None, n_buckets=0,
+               range_stats=None, rows=None, transitions=None):
+        """
+        df: 時間範圍內的資料切片；times: 對應的 datetime64 時間
+        switch_cols / sensor_cols: 要顯示的開關與感測欄位 (依勾選順序)
+        window_s: (起, 迄) epoch 秒；pyramid / n_buckets: 金字塔與抽樣段數 (0 表示不抽樣)
+        range_stats / rows: 整份資料的 range_stats.RangeStats 與 df 在其中的列區間 [i0, i1)
+        transitions: 整份資料的 transitions.TransitionIndex，提供時狀態短條直接由轉換索引取得區段
+        回傳版面是否需要重新 tight_layout
+        """
+        patch_handles = self._update_switch_bars(df, times, switch_cols,
+                                                 transitions if rows is not None else None, rows)
+        reference_cols, scaled_cols, stats = self._group_sensors(df, sensor_cols, range_stats, rows)
+
+        # --- 選擇金字塔層級 (None 表示使用原始資料) ---
+        level = None
+        if pyramid is not None:
+            level = pyramid.select_level(window_s[1] - window_s[0], n_buckets)
+
+        self._update_lines(times, reference_cols, scaled_cols, stats, level, window_s, pyramid, n_buckets)
+        with self.profiler.stage('legend'):
+            self._update_legend(patch_handles, reference_cols, scaled_cols)
+
+        # --- Y 軸標籤 ---
+        self.ax.set_ylabel("絕對數值 (基準組)" if reference_cols else "數值")
+        ax2_visible = bool(scaled_cols)
+        self.ax2.set_visible(ax2_visible)
+        if ax2_visible:
+            self.ax2.set_ylabel("正規化數值 (其他組)")
+
+        # --- 圖表標題 ---
+        if not (switch_cols or stats):
+            self.ax.set_title('請至少勾選一個感測器')
+        else:
+            self.ax.set_title('')
+
+        # --- 軸範圍 ---
+        with self.profiler.stage('autoscale'):
+            self.ax.relim()
+            x_extents = [x for extent in self._bar_extents.values() for x in extent]
+            if x_extents: # 開關區段的 y 為軸座標，只將 x 範圍加入 dataLim
+                self.ax.update_datalim([(x, 0.0) for x in x_extents], updatey=False)
+            self.ax.autoscale_view(tight=True)
+            if ax2_visible:
+                self.ax2.relim()
+                self.ax2.autoscale_view(tight=True)
+
+        layout_key = (tuple(switch_cols), tuple(reference_cols), tuple(scaled_cols), self.ax.get_title())
+        layout_changed = layout_key != self._layout_key
+        self._layout_key = layout_key
+        return layout_changed
+
+    def _update_lines(self, times, reference_cols, scaled_cols, stats, level, window_s, pyramid, n_buckets):
+        """依分組結果新增、更新或移除各感測欄位的 Line2D"""
+        cycle_colors = matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
+        scaled_colors = matplotlib.colormaps['tab10'].colors # 一組高對比度的顏色
+        wanted = {}
+        for i, col_name in enumerate(reference_cols):
+            x, y = self._line_xy(col_name, times, stats[col_name]['values'], level, window_s, pyramid, n_buckets)
+            label = f"{get_equipment_chinese_name(col_name)} (μ: {stats[col_name]['mean']:.2f})"
+            wanted[col_name] = (self.ax, x, y, label, cycle_colors[i % len(cycle_colors)])
+        for i, col_name in enumerate(scaled_cols):
+            st = stats[col_name]
+            label = f"{get_equipment_chinese_name(col_name)} (scaled, μ: {st['mean']:.2f})"
+            if (st['max'] - st['min']) > 1e-9:
+                # Scale to [0,1]
+                x, y = self._line_xy(col_name, times, st['values'], level, window_s, pyramid, n_buckets,
+                                     scale=(st['min'], st['max']))
+            else: # Constant value, plot as 0.5 on scaled axis
+                x, y = times[[0, -1]], np.array([0.5, 0.5])
+            wanted[col_name] = (self.ax2, x, y, label, scaled_colors[i % len(scaled_colors)])
+
+        with self.profiler.stage('plot'):
+            for col_name in list(self.lines):
+                line = self.lines[col_name]
+                if col_name not in wanted or line.axes is not wanted[col_name][0]:
+                    line.remove()
+                    del self.lines[col_name]
+            for col_name, (ax, x, y, label, color) in wanted.items():
+                line = self.lines.get(col_name)
+                if line is None:
+                    line, = ax.plot(x, y, label=label, color=color)
+                    self.lines[col_name] = line
+                else:
+                    line.set_data(x, y)
+                    line.set_label(label)
+                    line.set_color(color)
+
+    def _update_legend(self, patch_handles, reference_cols, scaled_cols):
+        """去除重複標籤後更新圖例 (標籤或顏色改變時才重建)"""
+        handles = patch_handles + [self.lines[c] for c in reference_cols] + [self.lines[c] for c in scaled_cols]
+        final_handles, final_labels = [], []
+        seen = set()
+        for handle in handles:
+            label_text = handle.get_label()
+            if label_text not in seen: # Ensure unique labels in legend
+                seen.add(label_text)
+                final_handles.append(handle)
+                final_labels.append(label_text)
+        legend_key = [(label, mcolors.to_hex(h.get_color() if isinstance(h, Line2D) else h.get_facecolor()))
+                      for h, label in zip(final_handles, final_labels)]
+        if legend_key != self._legend_labels:
+            if self.ax.get_legend():
+                self.ax.get_legend().remove()
+            if final_handles:
+                self.ax.legend(final_handles, final_labels, loc='upper left', fontsize=9, ncol=1)
+            self._legend_labels = legend_key
+
+    # --- 互動 (拖曳) 期間的 blit 快速路徑 ---
+
+    def _data_artists(self):
+        artists = list(self.switch_bars.values()) + [l for l in self.lines.values() if l.axes is self.ax]
+        if self.ax2.get_visible():
+            artists += [l for l in self.lines.values() if l.axes is self.ax2]
+        return artists
+
+    def begin_interaction(self):
+        """將資料 artist 設為 animated 並快取其餘靜態背景，之後以 blit() 只重畫移動中的 artist"""
+        for artist in self._data_artists():
+            artist.set_animated(True)
+        canvas = self.fig.canvas
+        canvas.draw()
+        self._background = canvas.copy_from_bbox(self.fig.bbox)
+        self.interacting = True
+
+    def blit(self):
+        if not self.interacting or self._background is None:
+            return
+        canvas = self.fig.canvas
+        canvas.restore_region(self._background)
+        for artist in self._data_artists():
+            artist.set_animated(True) # 互動中新建立的 artist 也走 blit
+            artist.axes.draw_artist(artist)
+        canvas.blit(self.ax.bbox)
+
+    def end_interaction(self):
+        """結束互動，恢復一般繪製 (呼叫端負責之後的完整重繪)"""
+        for ax in (self.ax, self.ax2):
+            for artist in list(ax.lines) + list(ax.collections):
+                artist.set_animated(False)
+        self._background = None
+        self.interacting = False
+
+    def _update_switch_bars(self, df, times, switch_cols, transitions=None, rows=None):
+        """更新開關欄位的狀態短條，回傳圖例用的 Patch"""
+        patch_handles = []
+        short_bar_pos_map = {}
+        short_bar_levels = []
+        for col in switch_cols:
+            if col.startswith("b-") or col.startswith("p-") or col.startswith("av-"):
+                y_base = SHORT_BAR_YMIN - (len(short_bar_levels) * (SHORT_BAR_HEIGHT + SHORT_BAR_GAP))
+                short_bar_pos_map[col] = (y_base, y_base + SHORT_BAR_HEIGHT)
+                short_bar_levels.append(col)
+
+        drawn = set()
+        for col_name in switch_cols:
+            if col_name not in df.columns or df[col_name].empty or not len(times): continue
+            y0, y1 = short_bar_pos_map.get(col_name, (0.0, 1.0))
+            with self.profiler.stage('segments'):
+                if transitions is not None and col_name in transitions.df.columns:
+                    # 只取範圍內的轉換，不需逐筆比較
+                    idx, state_codes, labels = transitions.segments(col_name, *rows)
+                    starts = times[idx]
+                    ends = np.concatenate((times[idx[1:]], [times[-1] + np.timedelta64(1, 's')]))
+                    codes = state_codes
+                else:
+                    codes, labels = _state_codes(df[col_name])
+                    starts, ends, state_codes = state_segments(times, codes)
+                x0 = mdates.date2num(starts)
+                x1 = mdates.date2num(ends)
+            with self.profiler.stage('bar_paths'):
+                # 狀態顏色以查表取得 (與 state_color 相同)
+                unique_codes, inverse = np.unique(state_codes, return_inverse=True)
+                unique_states = labels[unique_codes]
+                palette = state_color_lut(labels, col_name, alpha=0.45)[unique_codes]
+                # 同一狀態的所有區段合併成一條複合 Path，繪製時只需轉換少數幾條路徑
+                inverse = inverse.ravel()
+                paths = [_rects_path(x0[inverse == k], x1[inverse == k], y0, y1) for k in range(len(unique_states))]
+                bars = self.switch_bars.get(col_name)
+                if bars is None:
+                    bars = PathCollection(paths, facecolors=palette, edgecolors='none',
+                                          transform=self.ax.get_xaxis_transform())
+                    self.ax.add_collection(bars, autolim=False)
+                    self.switch_bars[col_name] = bars
+                else:
+                    bars.set_paths(paths)
+                    bars.set_facecolors(palette)
+            self._bar_extents[col_name] = (x0[0], x1[-1])
+            drawn.add(col_name)
+            with self.profiler.stage('legend'):
+                # 圖例與原本相同使用預設色盤 (不區分 av-)，依狀態字串排序
+                present = np.unique(codes)
+                present_labels = labels[present]
+                legend_colors = state_color_lut(labels)[present]
+                for k in np.argsort(present_labels, kind='stable'):
+                    patch_handles.append(mpatches.Patch(color=legend_colors[k], label=f"{col_name} = {present_labels[k]}"))
+
+        for col_name in list(self.switch_bars):
+            if col_name not in drawn:
+                self.switch_bars.pop(col_name).remove()
+                self._bar_extents.pop(col_name, None)
+        return patch_handles
+
+    def _group_sensors(self, df, sensor_cols, range_stats=None, rows=None):
+        """
+        取得各感測欄位的數值與統計，依前綴分組後決定畫在主軸 (reference) 或正規化次軸 (scaled)
+        統計由 range_stats 查詢 (未提供時以 df 本身建立)，不需每次重新轉換與掃描整個範圍
+        回傳 (reference_cols, scaled_cols, stats)
+        """
+        if range_stats is None:
+            range_stats, rows = RangeStats(df), (0, len(df))
+        stats = {}
+        for col in sensor_cols:
+            if col not in df.columns:
+                continue
+            with self.profiler.stage('sensor_stats'):
+                st = range_stats.window(col, *rows)
+                if not st.count: # 範圍內全為缺值或無法轉為數值，不畫線
+                    continue
+                stats[col] = {'values': range_stats.values(col, *rows), 'mean': st.mean,
+                              'min': st.min, 'max': st.max}
+
+        # 按 sensor 類型分組
+        sensor_groups = {}
+        for col in stats:
+            prefix = col.split('-')[0]
+            sensor_groups.setdefault(prefix, []).append(col)
+
+        # 計算每個組的 min/max/range
+        group_stats = {}
+        for prefix, cols in sensor_groups.items():
+            group_min = min(stats[c]['min'] for c in cols)
+            group_max = max(stats[c]['max'] for c in cols)
+            group_stats[prefix] = {'min': group_min, 'max': group_max, 'range': group_max - group_min}
+
+        reference_cols, scaled_cols = [], []
+        if group_stats:
+            # 選擇第一個有範圍的組作為參考基準
+            reference_prefix = next((p for p, s in group_stats.items() if s['range'] > 1e-9), None)
+            if reference_prefix is None: # 如果所有組都沒有範圍 (都是常數)
+                reference_prefix = next(iter(group_stats)) # 就選第一個
+            reference_range = group_stats[reference_prefix]['range']
+            for prefix, cols in sensor_groups.items():
+                current_range = group_stats.get(prefix, {}).get('range', 0.0)
+                # 如果沒有參考範圍，或當前範圍與參考範圍相似，或就是參考組本身，則畫在主軸
+                if reference_range < 1e-9 or current_range <= reference_range * self.range_similarity_factor or prefix == reference_prefix:
+                    reference_cols.extend(cols)
+                else:
+                    scaled_cols.extend(cols)
+        return reference_cols, scaled_cols, stats
+
+    def _line_xy(self, col_name, times, y, level, window_s, pyramid, n_buckets, scale=None):
+        """
+        取得要繪製的線段資料。level 不為 None 時從金字塔讀取該層的 min/max 包絡，
+        否則使用原始資料；兩者最後都依畫布寬度抽樣。scale=(min, max) 時正規化到 [0, 1]
+        """
+        with self.profiler.stage('downsample'):
+            if level is not None and col_name in pyramid.col_index:
+                x, y = pyramid.envelope(col_name, level, *window_s)
+            else:
+                x = times
+            if scale is not None:
+                y = (y - scale[0]) / (scale[1] - scale[0])
+            return decimate(x, y, n_buckets)
+
+def _state_codes(series):
+    """
+    將開關欄位轉為 (整數代碼, 狀態字串表)。categorical 欄位直接使用其代碼，
+    其餘欄位以 astype(str) 的結果編碼；缺值對應到 'nan'
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(str).astype('category')
+    labels = np.append(series.cat.categories.astype(str).to_numpy(dtype=object), 'nan')
+    codes = series.cat.codes.to_numpy()
+    return np.where(codes < 0, len(labels) - 1, codes), labels
+
+
+_RECT_CODES = np.array([Path.MOVETO, Path.LINETO, Path.LINETO, Path.LINETO, Path.CLOSEPOLY], dtype=Path.code_type)
+
+
+def _rects_path(x0, x1, y0, y1):
+    """將多個 [x0, x1] x [y0, y1] 矩形組成一條複合 Path"""
+    verts = np.empty((len(x0), 5, 2))
+    verts[:, 0, 0] = x0; verts[:, 0, 1] = y0
+    verts[:, 1, 0] = x0; verts[:, 1, 1] = y1
+    verts[:, 2, 0] = x1; verts[:, 2, 1] = y1
+    verts[:, 3, 0] = x1; verts[:, 3, 1] = y0
+    verts[:, 4] = verts[:, 0]
+    codes = np.tile(_RECT_CODES, len(x0))
+    return Path(verts.reshape(-1, 2), codes)
@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+HISTORY = 120 # 每種影格保留最近幾次的耗時，用於計算百分位數
+
+
+class _NullStage:
+    """停用時使用的空計時器"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, frame, name):
+        self.frame = frame
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        # 同一影格內重複出現的階段 (例如每個欄位一次) 累加
+        stages = self.frame['stages']
+        stages[self.name] = stages.get(self.name, 0.0) + time.perf_counter() - self.t0
+        return False
+
+
+class _Frame:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.record = {'frame': self.name, 'stages': {}}
+        self.t0 = time.perf_counter()
+        self.profiler._local.frame = self.record
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._local.frame = None
+        self.record['total'] = time.perf_counter() - self.t0
+        self.record['time'] = time.time()
+        self.profiler._finish(self.record)
+        return False
+
+
+class StageProfiler:
+    """
+    分階段計時：以 frame(name) 包住一次完整的工作 (重繪、載入、清單更新)，
+    其中以 stage(name) 標記各階段；影格結束時保留最近的耗時並可寫入 JSON lines 記錄檔。
+    停用時 frame / stage 直接回傳空計時器，只多一次屬性檢查。
+    每個執行緒各自記錄目前的影格，背景載入與主執行緒的重繪不會互相干擾
+    """
+
+    def __init__(self, enabled=False, log_path=None, on_frame=None):
+        self.enabled = enabled
+        self.log_path = log_path or None
+        self.on_frame = on_frame # 影格結束時呼叫 on_frame(record)，可能在背景執行緒
+        self.last = {} # 影格名稱 -> 最近一次的記錄
+        self._history = {} # (影格名稱, 階段名稱) -> 最近的耗時 (秒)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def frame(self, name):
+        """開始一個影格；已在影格中時視為其中的一個階段"""
+        if not self.enabled:
+            return _NULL_STAGE
+        current = getattr(self._local, 'frame', None)
+        if current is not None:
+            return _Stage(current, name)
+        return _Frame(self, name)
+
+    def stage(self, name):
+        """標記目前影格中的一個階段；不在影格中時不計時"""
+        if not self.enabled:
+            return _NULL_STAGE
+        current = getattr(self._local, 'frame', None)
+        if current is None:
+            return _NULL_STAGE
+        return _Stage(current, name)
+
+    def _finish(self, record):
+        name = record['frame']
+        with self._lock:
+            self.last[name] = record
+            for stage, seconds in list(record['stages'].items()) + [('total', record['total'])]:
+                self._history.setdefault((name, stage), deque(maxlen=HISTORY)).append(seconds)
+            if self.log_path:
+                line = {'time': record['time'], 'frame': name, 'total_ms': round(record['total'] * 1000, 3),
+                        'stages_ms': {k: round(v * 1000, 3) for k, v in record['stages'].items()}}
+                try:
+                    with open(self.log_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(line, ensure_ascii=False) + '\n')
+                except OSError:
+                    self.log_path = None # 無法寫入時停止記錄，不影響繪圖
+        if self.on_frame:
+            self.on_frame(record)
+
+    def percentiles(self, frame_name, stage, q=(50, 95)):
+        """回傳該階段最近耗時的百分位數 (毫秒)；沒有記錄時回傳 None"""
+        with self._lock:
+            history = self._history.get((frame_name, stage))
+            if not history:
+                return None
+            values = np.array(history)
+        return tuple(float(v) * 1000 for v in np.percentile(values, q))
+
+    def report(self, frame_name):
+        """最近一次影格的各階段耗時與 p50 / p95 (毫秒)，依耗時由大到小排列"""
+        record = self.last.get(frame_name)
+        if record is None:
+            return f"{frame_name}: (尚無記錄)"
+        p50, p95 = self.percentiles(frame_name, 'total')
+        lines = [f"{frame_name:<14}{record['total'] * 1000:8.1f} ms  p50 {p50:6.1f}  p95 {p95:6.1f}"]
+        for stage, seconds in sorted(record['stages'].items(), key=lambda kv: -kv[1]):
+            p50, p95 = self.percentiles(frame_name, stage)
+            lines.append(f"  {stage:<12}{seconds * 1000:8.1f} ms  p50 {p50:6.1f}  p95 {p95:6.1f}")
+        return '\n'.join(lines)
+
+
+NULL_PROFILER = StageProfiler(enabled=False) # 未指定時使用，所有計時皆為空操作
@@ -0,0 +1,204 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# 各層的時間桶大小 (秒)，每層由前一層合併而成
+LEVEL_SECONDS = (10, 60, 600, 3600)
+PYRAMID_VERSION = 1
+PYRAMID_FILE = 'pyramid.npz'
+
+
+def epoch_seconds(times):
+    """將時間欄 (datetime64 或 tz-aware Series) 轉為 int64 epoch 秒"""
+    values = times.values if hasattr(times, 'values') else np.asarray(times)
+    return values.astype('datetime64[s]').view('i8')
+
+
+class MinMaxPyramid:
+    """
+    多解析度 min/max 金字塔：每一層以固定秒數分桶，
+    保存每個感測欄位在各桶的 min / max / mean / count，
+    讓縮放到長時間範圍時只需讀取少量的桶而不必掃描原始資料
+    """
+
+    def __init__(self, columns, levels):
+        self.columns = list(columns)
+        self.col_index = {col: i for i, col in enumerate(self.columns)}
+        # levels: {桶秒數: {'t': int64 桶起點, 'min'/'max'/'mean': float32 (桶數, 欄數), 'count': int32}}
+        self.levels = levels
+
+    @classmethod
+    def from_frame(cls, df, time_col, columns, level_seconds=LEVEL_SECONDS):
+        t = epoch_seconds(df[time_col])
+        valid = ~pd.isna(df[time_col]).values
+        data = {}
+        for col in columns:
+            data[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)[valid]
+        return cls.build(t[valid], data, level_seconds)
+
+    @classmethod
+    def build(cls, epoch_s, data, level_seconds=LEVEL_SECONDS):
+        """epoch_s: 已排序的 epoch 秒；data: {欄位: float 陣列}"""
+        columns = list(data)
+        levels = {}
+        prev = None
+        for bucket_s in sorted(level_seconds):
+            if prev is None:
+                levels[bucket_s] = _build_from_raw(epoch_s, data, columns, bucket_s)
+            else:
+                levels[bucket_s] = _merge_level(prev, bucket_s)
+            prev = levels[bucket_s]
+        return cls(columns, levels)
+
+    def select_level(self, span_s, min_points):
+        """回傳在 span_s 秒內仍至少有 min_points 個桶的最粗層級；都不夠時回傳 None (使用原始資料)"""
+        if min_points <= 0:
+            return None
+        best = None
+        for bucket_s in sorted(self.levels):
+            if span_s / bucket_s >= min_points:
+                best = bucket_s
+        return best
+
+    def envelope(self, col, bucket_s, t0_s, t1_s):
+        """
+        取得某欄位在 [t0_s, t1_s] 內的 min/max 包絡，
+        回傳 (times, values)：每桶依序放入 min 與 max 兩點
+        """
+        level = self.levels[bucket_s]
+        j = self.col_index[col]
+        i0 = np.searchsorted(level['t'], t0_s - t0_s % bucket_s, side='left')
+        i1 = np.searchsorted(level['t'], t1_s, side='right')
+        t = level['t'][i0:i1]
+        lo = level['min'][i0:i1, j]
+        hi = level['max'][i0:i1, j]
+        times = np.repeat(t, 2).astype('datetime64[s]')
+        values = np.column_stack((lo, hi)).ravel().astype(float)
+        return times, values
+
+    def tail_start(self, t_s):
+        """新增資料從 t_s 開始時，需要重新計算的最細層桶起點；extend() 需要從這個時間起的原始資料"""
+        finest = min(self.levels)
+        return t_s - t_s % finest
+
+    def extend(self, epoch_s, data):
+        """
+        以新增的資料更新各層尾端：epoch_s / data 為自 tail_start() 起的全部原始資料。
+        只重新計算受影響的最後幾個桶，其餘桶保持不變
+        """
+        if not len(epoch_s):
+            return
+        data = {col: np.asarray(data.get(col, np.full(len(epoch_s), np.nan)), dtype=float) for col in self.columns}
+        changed_t = epoch_s[0] # 上一層第一個重新計算的桶起點
+        prev = None
+        for bucket_s in sorted(self.levels):
+            level = self.levels[bucket_s]
+            cut = changed_t - changed_t % bucket_s
+            if prev is None:
+                tail = _build_from_raw(epoch_s, data, self.columns, bucket_s)
+            else:
+                i = np.searchsorted(prev['t'], cut, side='left')
+                tail = _merge_level({key: arr[i:] for key, arr in prev.items()}, bucket_s)
+            keep = np.searchsorted(level['t'], cut, side='left')
+            self.levels[bucket_s] = {key: np.concatenate((level[key][:keep], tail[key])) for key in level}
+            prev = self.levels[bucket_s]
+            changed_t = cut
+
+    def save(self, path):
+        arrays = {
+            'version': np.array(PYRAMID_VERSION),
+            'columns': np.array(self.columns, dtype='U'),
+            'level_seconds': np.array(sorted(self.levels), dtype='i8'),
+        }
+        for bucket_s, level in self.levels.items():
+            for key, arr in level.items():
+                arrays[f'{bucket_s}_{key}'] = arr
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """讀取 save() 的結果；版本不符時回傳 None"""
+        with np.load(path) as npz:
+            if int(npz['version']) != PYRAMID_VERSION:
+                return None
+            columns = [str(c) for c in npz['columns']]
+            levels = {}
+            for bucket_s in npz['level_seconds']:
+                bucket_s = int(bucket_s)
+                levels[bucket_s] = {key: npz[f'{bucket_s}_{key}'] for key in ('t', 'min', 'max', 'mean', 'count')}
+        return cls(columns, levels)
+
+
+def load_or_build_pyramid(df, time_col, columns, cache=None, file_path=None):
+    """優先讀取與資料快取放在一起的金字塔，沒有時重新建立並寫回快取"""
+    path = None
+    if cache is not None and file_path is not None:
+        path = cache.sidecar_path(file_path, PYRAMID_FILE)
+    if path and os.path.exists(path):
+        try:
+            pyramid = MinMaxPyramid.load(path)
+            if pyramid is not None and pyramid.columns == list(columns):
+                return pyramid
+        except Exception as e:
+            print(f"金字塔快取讀取失敗，重新建立: {e}")
+    pyramid = MinMaxPyramid.from_frame(df, time_col, columns)
+    if path:
+        try:
+            pyramid.save(path)
+        except Exception as e:
+            print(f"金字塔快取寫入失敗: {e}")
+    return pyramid
+
+
+def _bucket_bounds(keys):
+    """已排序的桶編號 -> 每桶起始位置"""
+    if not len(keys):
+        return np.zeros(0, dtype=np.intp)
+    return np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+
+
+def _build_from_raw(epoch_s, data, columns, bucket_s):
+    keys = epoch_s // bucket_s
+    starts = _bucket_bounds(keys)
+    n_buckets = len(starts)
+    out = {
+        't': (keys[starts] * bucket_s).astype('i8'),
+        'min': np.full((n_buckets, len(columns)), np.nan, dtype=np.float32),
+        'max': np.full((n_buckets, len(columns)), np.nan, dtype=np.float32),
+        'mean': np.full((n_buckets, len(columns)), np.nan, dtype=np.float32),
+        'count': np.zeros((n_buckets, len(columns)), dtype=np.int32),
+    }
+    if not n_buckets:
+        return out
+    for j, col in enumerate(columns):
+        y = data[col]
+        nan_mask = np.isnan(y)
+        # fmin/fmax 會忽略 NaN，全為 NaN 的桶結果仍為 NaN
+        out['min'][:, j] = np.fmin.reduceat(y, starts)
+        out['max'][:, j] = np.fmax.reduceat(y, starts)
+        count = np.add.reduceat((~nan_mask).astype(np.int64), starts)
+        total = np.add.reduceat(np.where(nan_mask, 0.0, y), starts)
+        out['count'][:, j] = count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out['mean'][:, j] = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+    return out
+
+
+def _merge_level(prev, bucket_s):
+    """由較細的一層合併出較粗的一層"""
+    keys = prev['t'] // bucket_s
+    starts = _bucket_bounds(keys)
+    if not len(starts):
+        return {key: arr[:0].copy() for key, arr in prev.items()}
+    count = np.add.reduceat(prev['count'].astype(np.int64), starts, axis=0)
+    total = np.add.reduceat(np.nan_to_num(prev['mean'].astype(float)) * prev['count'], starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+    return {
+        't': (keys[starts] * bucket_s).astype('i8'),
+        'min': np.fmin.reduceat(prev['min'], starts, axis=0),
+        'max': np.fmax.reduceat(prev['max'], starts, axis=0),
+        'mean': mean.astype(np.float32),
+        'count': count.astype(np.int32),
+    }
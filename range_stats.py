@@ -0,0 +1,105 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+BLOCK_ROWS = 64 # 每個區塊的列數；查詢時頭尾不足一個區塊的部分直接掃描
+
+# rows: 範圍內列數；count: 有效 (非 NaN) 數值個數；nan_count: 缺值個數
+WindowStats = namedtuple('WindowStats', ['rows', 'count', 'nan_count', 'mean', 'min', 'max'])
+
+
+class _ColumnStats:
+    """單一欄位的數值陣列與區塊統計：區塊和 / 個數的前綴和，及區塊 min / max 的稀疏表"""
+
+    def __init__(self, series, block_rows):
+        values = pd.to_numeric(series, errors='coerce').to_numpy()
+        if values.dtype.kind != 'f':
+            values = values.astype(float)
+        self.values = values # float64 欄位直接共用 DataFrame 的記憶體
+        n_blocks = len(values) // block_rows
+        blocks = values[:n_blocks * block_rows].reshape(n_blocks, block_rows)
+        valid = ~np.isnan(blocks)
+        self.sum_prefix = np.concatenate(([0.0], np.cumsum(np.where(valid, blocks, 0.0).sum(axis=1, dtype=float))))
+        self.count_prefix = np.concatenate(([0], np.cumsum(valid.sum(axis=1))))
+        # fmin / fmax 忽略 NaN，整個區塊都是 NaN 時結果為 NaN
+        self.min_table = _sparse_table(np.fmin.reduce(blocks, axis=1), np.fmin)
+        self.max_table = _sparse_table(np.fmax.reduce(blocks, axis=1), np.fmax)
+
+
+class RangeStats:
+    """
+    感測欄位在任意列區間 [i0, i1) 的 min / max / 平均 / 缺值數，每個資料集建立一次。
+    每欄第一次查詢時轉為數值陣列並建立區塊統計 (O(n) 時間、O(n / BLOCK_ROWS) 額外記憶體)，
+    之後的查詢只需合併 O(1) 個區塊結果並掃描頭尾不足一個區塊的列，與範圍長度無關
+    """
+
+    def __init__(self, df, block_rows=BLOCK_ROWS):
+        self.df = df
+        self.block_rows = block_rows
+        self._columns = {} # 欄位 -> _ColumnStats
+
+    def _column(self, col):
+        stats = self._columns.get(col)
+        if stats is None:
+            stats = self._columns[col] = _ColumnStats(self.df[col], self.block_rows)
+        return stats
+
+    def discard(self, col):
+        """丟棄欄位的統計 (欄位已從 DataFrame 移除時呼叫，釋放共用的數值陣列)"""
+        self._columns.pop(col, None)
+
+    def values(self, col, i0=0, i1=None):
+        """欄位的數值陣列 (float，無法轉換的值為 NaN)；回傳的是共用的陣列，不可修改"""
+        return self._column(col).values[i0:i1]
+
+    def window(self, col, i0, i1):
+        """回傳欄位在列區間 [i0, i1) 的 WindowStats；沒有有效數值時 mean / min / max 為 NaN"""
+        c = self._column(col)
+        i1 = min(i1, len(c.values))
+        rows = max(0, i1 - i0)
+        if rows == 0:
+            return WindowStats(0, 0, 0, np.nan, np.nan, np.nan)
+        b = self.block_rows
+        b0 = -(-i0 // b) # 第一個完整區塊
+        b1 = i1 // b # 最後一個完整區塊之後
+        if b1 <= b0: # 不到一個完整區塊，直接掃描
+            edges = [c.values[i0:i1]]
+            total, count = 0.0, 0
+            lo = hi = np.nan
+        else:
+            edges = [c.values[i0:b0 * b], c.values[b1 * b:i1]]
+            total = c.sum_prefix[b1] - c.sum_prefix[b0]
+            count = int(c.count_prefix[b1] - c.count_prefix[b0])
+            lo = _query_table(c.min_table, np.fmin, b0, b1)
+            hi = _query_table(c.max_table, np.fmax, b0, b1)
+        for edge in edges:
+            if len(edge):
+                valid = ~np.isnan(edge)
+                total += edge[valid].sum(dtype=float)
+                count += int(np.count_nonzero(valid))
+                lo = np.fmin(lo, np.fmin.reduce(edge))
+                hi = np.fmax(hi, np.fmax.reduce(edge))
+        mean = total / count if count else np.nan
+        return WindowStats(rows, count, rows - count, float(mean), float(lo), float(hi))
+
+    def table(self, cols, i0, i1):
+        """多個欄位的 WindowStats，回傳 {欄位: WindowStats} (供統計表使用)"""
+        return {col: self.window(col, i0, i1) for col in cols if col in self.df.columns}
+
+
+def _sparse_table(values, ufunc):
+    """稀疏表：第 k 層第 i 個元素為 values[i:i + 2**k] 的 ufunc 歸約"""
+    table = [values]
+    k = 1
+    while 2 * k <= len(values):
+        prev = table[-1]
+        table.append(ufunc(prev[:len(prev) - k], prev[k:]))
+        k *= 2
+    return table
+
+
+def _query_table(table, ufunc, b0, b1):
+    """區塊 [b0, b1) 的歸約結果：以兩段 (可重疊) 的 2 的冪次長度涵蓋整個區間"""
+    k = (b1 - b0).bit_length() - 1
+    return ufunc(table[k][b0], table[k][b1 - (1 << k)])
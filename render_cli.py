@@ -0,0 +1,88 @@
+"""
+批次輸出圖表 (不需開啟 GUI)：
+    python render_cli.py 資料.csv --tags pit-311a,pit-311b --tags p-101a \\
+        --window "2025-06-11 06:00" "2025-06-11 18:00" --window "2025-06-11 18:00" "2025-06-12 06:00" \\
+        --out-dir reports
+資料可為單一 CSV、多個 CSV 或資料夾；每組 tags 與每個時間範圍的組合各輸出一張 PNG。
+資料只在主程序載入一次並寫入快取，各工作程序從快取讀取後重複使用
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from font_config import set_chinese_font
+from renderer import RenderSource, render_chart, parse_time, png_filename
+
+_source = None # 每個工作程序各自持有的 RenderSource
+
+
+def _init_worker(source, cache_dir, float32):
+    global _source
+    set_chinese_font()
+    if _source is None: # fork 時已繼承主程序載入的資料
+        _source = RenderSource(source, cache_dir=cache_dir, float32=float32)
+
+
+def _render_job(job):
+    tags, start, end, path, raw = job
+    return render_chart(_source, tags, start, end, path, raw=raw)
+
+
+def build_jobs(tag_sets, windows, out_dir, raw=False):
+    """tags 與時間範圍的所有組合，檔名與 GUI「下載圖檔」相同並加上 tags 組別編號"""
+    jobs = []
+    for i, tags in enumerate(tag_sets, 1):
+        for start, end in windows:
+            jobs.append((tags, start, end, os.path.join(out_dir, png_filename(start, end, f"_{i}")), raw))
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批次輸出感測器圖表 (PNG)")
+    parser.add_argument('data', nargs='+', help="CSV 檔案 (可多個) 或資料夾")
+    parser.add_argument('--tags', action='append', required=True, help="以逗號分隔的一組 tag，可重複指定")
+    parser.add_argument('--window', action='append', nargs=2, metavar=('START', 'END'), required=True,
+                        help="時間範圍，例如 \"2025-06-11 06:00\" \"2025-06-11 18:00\"，可重複指定")
+    parser.add_argument('--out-dir', default='.', help="輸出資料夾")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="工作程序數 (預設為 CPU 核心數)")
+    parser.add_argument('--raw', action='store_true', help="繪製原始資料 (不抽樣)")
+    parser.add_argument('--float32', action='store_true', help="感測欄位以 float32 保存")
+    parser.add_argument('--cache-dir', default=None, help="解析快取資料夾")
+    args = parser.parse_args(argv)
+
+    source = args.data[0] if len(args.data) == 1 else args.data
+    tag_sets = [[t.strip() for t in tags.split(',') if t.strip()] for tags in args.tags]
+    windows = [(parse_time(start), parse_time(end)) for start, end in args.window]
+    os.makedirs(args.out_dir, exist_ok=True)
+    jobs = build_jobs(tag_sets, windows, args.out_dir, raw=args.raw)
+
+    # 主程序先載入一次 (同時寫入快取)，fork 的工作程序直接共用，其餘平台從快取讀取
+    global _source
+    set_chinese_font()
+    _source = RenderSource(source, cache_dir=args.cache_dir, float32=args.float32)
+    unknown = sorted({t for tags in tag_sets for t in tags} - set(_source.columns))
+    if unknown:
+        print(f"警告: 資料中沒有這些欄位: {', '.join(unknown)}", file=sys.stderr)
+
+    if args.workers <= 1:
+        for job in jobs:
+            print(_render_job(job))
+        return 0
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(source, args.cache_dir, args.float32)) as pool:
+        futures = {pool.submit(_render_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                print(future.result())
+            except Exception as e:
+                failed += 1
+                print(f"錯誤: {futures[future][3]}: {e}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support() # PyInstaller 打包後的工作程序需要
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import queue
+import threading
+
+from renderer import render_spec
+
+
+class _SharedSource:
+    """同一批工作共用的資料來源；傳入函式時於第一次使用 (工作執行緒中) 才建立"""
+
+    def __init__(self, source):
+        self._source = source
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if callable(self._source):
+                self._source = self._source()
+            return self._source
+
+
+class RenderQueue:
+    """
+    背景輸出 PNG 的佇列：單一工作執行緒依序以獨立的 Agg 圖表處理 (資料來源, ViewSpec, 路徑)，
+    Tk 主執行緒不需等待高解析度的點陣化。
+    on_progress(done, total, path, error) 於每張完成 (或失敗) 後呼叫，位於工作執行緒，
+    呼叫端需以 after() 轉回主執行緒
+    """
+
+    def __init__(self, on_progress=None):
+        self.on_progress = on_progress
+        self.done = 0
+        self.total = 0
+        self._generation = 0 # cancel() 後遞增，略過之前排入的工作
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, source, jobs):
+        """
+        排入一批工作。source: 具有 window(start, end) 與 columns 的資料來源 (例如 renderer.FrameSource)，
+        或建立資料來源的函式；jobs: [(ViewSpec, 路徑)]
+        """
+        shared = _SharedSource(source)
+        with self._lock:
+            if self.done >= self.total: # 前一批已完成，重新計數
+                self.done = self.total = 0
+            self.total += len(jobs)
+            for spec, path in jobs:
+                self._jobs.put((self._generation, shared, spec, path))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def cancel(self):
+        """取消尚未開始的工作 (正在輸出的那一張會完成)"""
+        with self._lock:
+            self._generation += 1
+            self.total = self.done
+            while True:
+                try:
+                    self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+
+    @property
+    def busy(self):
+        return self.done < self.total
+
+    def _run(self):
+        while True:
+            generation, shared, spec, path = self._jobs.get()
+            if generation != self._generation:
+                continue
+            error = None
+            try:
+                render_spec(shared.get(), spec, path)
+            except Exception as e:
+                error = e
+            with self._lock:
+                if generation != self._generation:
+                    continue # 輸出期間已取消，不再回報
+                self.done += 1
+                done, total = self.done, self.total
+            if self.on_progress is not None:
+                self.on_progress(done, total, path, error)
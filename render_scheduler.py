@@ -0,0 +1,62 @@
+import time
+
+# 重繪原因
+RANGE = 'range' # 時間範圍改變
+COLUMNS = 'columns' # 勾選/顯示的欄位改變
+YLIM = 'ylim' # 只有 Y 軸範圍改變
+DATA = 'data' # 資料或繪圖設定改變 (重新載入、抽樣設定、畫布大小)
+
+
+class RenderScheduler:
+    """
+    合併重繪請求：呼叫端以 request() 標記改變的項目，
+    每個影格間隔 (interval_ms) 最多執行一次 render(reasons)，且一定使用最新狀態
+    """
+
+    def __init__(self, widget, render, interval_ms=33):
+        self.widget = widget # 提供 after / after_cancel 的 Tk 元件
+        self.render = render
+        self.interval_ms = interval_ms
+        self.requested = 0
+        self.performed = 0
+        self._reasons = set()
+        self._after_id = None
+        self._last_render = 0.0
+
+    def request(self, *reasons):
+        self.requested += 1
+        self._reasons.update(reasons or (DATA,))
+        if self._after_id is not None:
+            return # 已排程，執行時會合併這次的原因
+        elapsed_ms = (time.perf_counter() - self._last_render) * 1000
+        delay = max(0, int(self.interval_ms - elapsed_ms))
+        self._after_id = self.widget.after(delay, self._run)
+
+    def flush(self):
+        """立即執行尚未處理的重繪"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._run()
+
+    def cancel(self):
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        self._reasons = set()
+
+    def _run(self):
+        self._after_id = None
+        reasons, self._reasons = self._reasons, set()
+        if not reasons:
+            return
+        self._last_render = time.perf_counter()
+        self.performed += 1
+        self.render(reasons)
+
+    def stats(self):
+        """回傳請求與實際執行的重繪次數"""
+        return {
+            'requested': self.requested,
+            'performed': self.performed,
+            'coalesced': self.requested - self.performed,
+        }
@@ -0,0 +1,165 @@
+import os
+from collections import namedtuple
+
+import pandas as pd
+import pytz
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from data_cache import FrameCache, DEFAULT_CACHE_DIR
+from data_loader import load_sensor_data
+from dataset import MultiFileDataset
+from plot_view import PlotView
+from pyramid import load_or_build_pyramid
+from range_stats import RangeStats
+from time_index import TimeIndex
+from utils import get_switchable_cols, get_sensor_cols
+
+TIMEZONE = pytz.timezone('Asia/Taipei')
+FIGSIZE = (11, 8) # 與 GUI 主圖表相同
+PNG_DPI = 180
+
+# 輸出一張圖所需的檢視設定 (GUI 按下下載時的快照)：
+# tags 依勾選且可見的欄位；ylim / ylim2 為使用者調整過的主軸 / 次軸範圍 (None 表示自動)
+ViewSpec = namedtuple('ViewSpec', ['tags', 'start', 'end', 'raw', 'figsize', 'ylim', 'ylim2'])
+
+
+def parse_time(value):
+    """字串或 Timestamp -> Asia/Taipei 的 tz-aware Timestamp (沒有時區時視為台北時間)"""
+    ts = pd.Timestamp(value)
+    return ts.tz_localize(TIMEZONE) if ts.tzinfo is None else ts
+
+
+def split_columns(columns, tags):
+    """依資料欄位順序 (與 GUI 勾選清單相同) 將 tags 分成開關欄位與感測欄位"""
+    frame = pd.DataFrame(columns=list(columns))
+    wanted = set(tags)
+    return ([c for c in get_switchable_cols(frame) if c in wanted],
+            [c for c in get_sensor_cols(frame) if c in wanted])
+
+
+def update_view(plot_view, df, time_index, pyramid, switch_cols, sensor_cols, start, end, n_buckets,
+                range_stats=None, transitions=None):
+    """
+    以 [start, end] 的資料更新 plot_view (GUI 與批次輸出共用)。
+    range_stats: df 的 range_stats.RangeStats，提供時範圍統計不需掃描整個範圍。
+    transitions: df 的 transitions.TransitionIndex，提供時開關區段直接由轉換索引取得。
+    回傳版面是否改變；範圍內沒有資料時回傳 None
+    """
+    i0, i1 = time_index.positions(start, end)
+    if i1 <= i0:
+        return None
+    window_s = (int(start.timestamp()), int(end.timestamp()))
+    return plot_view.update(df.iloc[i0:i1], time_index.times(i0, i1), switch_cols, sensor_cols,
+                            window_s, pyramid=pyramid, n_buckets=n_buckets,
+                            range_stats=range_stats, rows=(i0, i1), transitions=transitions)
+
+
+def png_filename(start, end, suffix=''):
+    """PNG 的預設檔名 (GUI「下載圖檔」與批次輸出相同)"""
+    timefmt = "%Y%m%d_%H%M%S"
+    return f"plot_{start.strftime(timefmt)}_{end.strftime(timefmt)}{suffix}.png"
+
+
+def split_windows(start, end, hours, anchor_hour=0):
+    """
+    將 [start, end] 依 hours 小時切成多個時間範圍，邊界對齊當地每日 anchor_hour 點
+    (例如 hours=12, anchor_hour=6 為 06:00 / 18:00 交班)；頭尾不足一段的部分截到 start / end
+    """
+    step = pd.Timedelta(hours=hours)
+    anchor = start.normalize() + pd.Timedelta(hours=anchor_hour)
+    first = anchor + ((start - anchor) // step) * step # start 所在的那一段起點
+    windows = []
+    t = first
+    while t < end:
+        windows.append((max(t, start), min(t + step, end)))
+        t += step
+    return windows
+
+
+def save_png(fig, path):
+    """儲存 PNG (GUI 的「下載圖檔」與批次輸出使用相同設定)"""
+    fig.savefig(path, dpi=PNG_DPI, bbox_inches='tight', transparent=False)
+
+
+class RenderSource:
+    """
+    批次輸出用的資料來源 (單一 CSV、資料夾或檔案清單)，不依賴 Tk。
+    單一檔案載入一次後重複使用；多檔資料集依時間範圍載入需要的檔案
+    """
+
+    def __init__(self, source, cache_dir=None, float32=False):
+        self.cache = FrameCache(cache_dir or DEFAULT_CACHE_DIR)
+        self.dataset = None
+        self._frame = None # (df, time_col, time_index, pyramid, range_stats)
+        if isinstance(source, (list, tuple)) or os.path.isdir(source):
+            if isinstance(source, (list, tuple)):
+                self.dataset = MultiFileDataset(list(source), cache=self.cache, float32=float32)
+            else:
+                self.dataset = MultiFileDataset.from_folder(source, cache=self.cache, float32=float32)
+            self.columns = self.dataset.columns
+        else:
+            df, time_col = load_sensor_data(source, cache=self.cache, float32=float32)
+            pyramid = load_or_build_pyramid(df, time_col, get_sensor_cols(df), cache=self.cache, file_path=source)
+            self._frame = (df, time_col, TimeIndex(df[time_col]), pyramid, RangeStats(df))
+            self.columns = list(df.columns)
+
+    def window(self, start, end):
+        """回傳涵蓋 [start, end] 的 (df, time_col, time_index, pyramid, range_stats)"""
+        if self.dataset is not None and not (self._frame is not None and self.dataset.is_loaded(start, end)):
+            df, time_col = self.dataset.load_window(start, end)
+            pyramid = load_or_build_pyramid(df, time_col, get_sensor_cols(df))
+            self._frame = (df, time_col, TimeIndex(df[time_col]), pyramid, RangeStats(df))
+        return self._frame
+
+
+class FrameSource:
+    """已在記憶體中的資料 (GUI 目前載入的資料)，介面與 RenderSource 相同"""
+
+    def __init__(self, df, time_col, time_index, pyramid, range_stats):
+        self._frame = (df, time_col, time_index, pyramid, range_stats)
+        self.columns = list(df.columns)
+
+    def window(self, start, end):
+        return self._frame
+
+
+def render_spec(source, spec, path):
+    """依 ViewSpec 輸出 PNG"""
+    return render_chart(source, spec.tags, spec.start, spec.end, path, raw=spec.raw, figsize=spec.figsize,
+                        ylim=spec.ylim, ylim2=spec.ylim2)
+
+
+def render_chart(source, tags, start, end, path, raw=False, figsize=FIGSIZE, ylim=None, ylim2=None):
+    """
+    以 Agg 畫出 tags 在 [start, end] 的圖表並存成 PNG。
+    繪圖流程與 GUI 相同 (PlotView + update_view + tight_layout + save_png)，
+    抽樣段數依排版後的主軸寬度決定 (與 GUI 調整畫布大小後的重繪相同)。
+    ylim / ylim2: 固定主軸 / 次軸的 Y 範圍 (None 表示依資料自動調整)
+    """
+    df, _time_col, time_index, pyramid, range_stats = source.window(start, end)
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    plot_view = PlotView(fig, ax)
+    switch_cols, sensor_cols = split_columns(source.columns, tags)
+    pyramid = None if raw else pyramid
+
+    def draw():
+        n_buckets = 0 if raw else max(int(ax.bbox.width), 1)
+        if update_view(plot_view, df, time_index, pyramid, switch_cols, sensor_cols, start, end, n_buckets,
+                       range_stats) is None:
+            plot_view.clear('此時間範圍內無資料')
+        else:
+            if ylim is not None:
+                ax.set_ylim(ylim)
+            if ylim2 is not None and plot_view.ax2.get_visible():
+                plot_view.ax2.set_ylim(ylim2)
+        fig.tight_layout()
+        return n_buckets
+
+    n_buckets = draw()
+    if not raw and n_buckets != max(int(ax.bbox.width), 1):
+        draw() # 排版後主軸寬度改變，依新的寬度重新抽樣
+    save_png(fig, path)
+    return path
@@ -0,0 +1,95 @@
+import re
+
+from utils import get_equipment_chinese_name
+
+# 各種比對方式的分數，分數高的排在前面
+SCORE_EXACT = 100 # 與 tag 或中文名稱完全相同
+SCORE_PREFIX = 80 # tag 或中文名稱的開頭
+SCORE_TOKEN = 60 # 前綴 (av-、pit-) 或區域代號 (20xx) 相同
+SCORE_SUBSTRING = 40 # 出現在 tag 或中文名稱中
+SCORE_FUZZY = 10 # 字元依序出現 (可不連續)，間隔越小分數越高
+
+
+class SearchIndex:
+    """
+    感測器欄位的搜尋索引，每個資料集建立一次。
+    每個欄位的搜尋欄位包含 tag、equipments.json 的中文名稱、tag 前綴 (av-、pit-) 與區域代號 (2021 -> 20xx)；
+    以「字元 -> 欄位集合」的反向索引先篩出候選，再依前綴、子字串、模糊比對評分排序
+    """
+
+    def __init__(self, columns, name_of=get_equipment_chinese_name):
+        self.columns = list(columns)
+        self._fields = [] # 每個欄位的 (tag, 中文名稱, 分類代號集合)
+        self._char_index = {} # 字元 -> 含該字元的欄位編號集合
+        for i, col in enumerate(self.columns):
+            tag = col.lower()
+            name = name_of(col).lower()
+            tokens = _tokens(tag)
+            self._fields.append((tag, name, tokens))
+            for ch in set(tag) | set(name) | set(''.join(tokens)):
+                self._char_index.setdefault(ch, set()).add(i)
+
+    def search(self, query):
+        """回傳符合 query 的欄位 (依分數排序，同分維持原順序)；空白分隔的多個詞須全部符合"""
+        terms = query.strip().lower().split()
+        if not terms:
+            return list(self.columns)
+        candidates = None
+        for ch in set(''.join(terms)):
+            hits = self._char_index.get(ch)
+            if not hits:
+                return []
+            candidates = set(hits) if candidates is None else candidates & hits
+            if not candidates:
+                return []
+        scored = []
+        for i in sorted(candidates):
+            total = 0
+            for term in terms:
+                score = self._score(term, *self._fields[i])
+                if not score:
+                    break
+                total += score
+            else:
+                scored.append((-total, i))
+        scored.sort()
+        return [self.columns[i] for _, i in scored]
+
+    @staticmethod
+    def _score(term, tag, name, tokens):
+        if term == tag or term == name:
+            return SCORE_EXACT
+        if tag.startswith(term) or name.startswith(term):
+            return SCORE_PREFIX
+        if any(token.startswith(term) for token in tokens):
+            return SCORE_TOKEN
+        if term in tag or term in name:
+            return SCORE_SUBSTRING
+        return max(_fuzzy_score(term, tag), _fuzzy_score(term, name))
+
+
+def _tokens(tag):
+    """tag 的分類代號：前綴 ('av-'、'av')、數字與區域代號 ('2021' -> '20xx')"""
+    tokens = set()
+    if '-' in tag:
+        prefix = tag.split('-', 1)[0]
+        tokens.update((prefix, prefix + '-'))
+    for digits in re.findall(r'\d+', tag):
+        tokens.add(digits)
+        if len(digits) >= 3:
+            tokens.add(digits[:-2] + 'xx')
+    return tokens
+
+
+def _fuzzy_score(term, text):
+    """term 的字元依序出現在 text 中時回傳 1~SCORE_FUZZY 分 (間隔越少越高)，否則 0"""
+    pos = -1
+    gaps = 0
+    for ch in term:
+        nxt = text.find(ch, pos + 1)
+        if nxt < 0:
+            return 0
+        if pos >= 0:
+            gaps += nxt - pos - 1
+        pos = nxt
+    return max(1, SCORE_FUZZY - gaps)
@@ -0,0 +1,167 @@
+import math
+import tkinter as tk
+from tkinter import ttk
+
+import customtkinter as ctk
+
+ROW_HEIGHT = 34 # 每列固定高度 (像素)，虛擬捲動依此換算列號
+
+
+class _Row:
+    """可重複使用的一列元件：勾選按鈕、顯示按鈕與名稱；標題列只顯示名稱"""
+
+    def __init__(self, canvas, list_view):
+        self.col = None
+        self.is_header = None
+        self.frame = ctk.CTkFrame(canvas, fg_color="transparent", height=ROW_HEIGHT)
+        self.btn_check = ctk.CTkButton(self.frame, text="", width=30, height=30, command=lambda: list_view._on_check_row(self), corner_radius=6, fg_color="transparent", hover_color="#DCE4EE", text_color_disabled="grey", text_color="black", font=list_view.font)
+        self.btn_eye = ctk.CTkButton(self.frame, text="", width=30, height=30, command=lambda: list_view._on_eye_row(self), corner_radius=6, fg_color="transparent", hover_color="#DCE4EE", text_color_disabled="grey", text_color="black", font=list_view.font)
+        self.label = ctk.CTkLabel(self.frame, text="", font=list_view.font, anchor='w')
+        self.window_id = canvas.create_window(0, 0, window=self.frame, anchor="nw", height=ROW_HEIGHT)
+        for widget in (self.frame, self.btn_check, self.btn_eye, self.label):
+            list_view._bind_wheel(widget)
+
+
+class VirtualSensorList:
+    """
+    虛擬化的感測器清單：只建立可視範圍所需數量的列元件，
+    捲動時將同一批元件移到新的位置並重新綁定欄位，不再為每個欄位建立元件。
+    項目為 "已勾選" 與 "全部感測器" 兩個區段，勾選 / 顯示狀態由呼叫端提供的函式即時查詢
+    """
+
+    def __init__(self, master, font, font_bold, is_checked, is_visible, on_check, on_eye, display_name,
+                 width=350, height=540):
+        self.font = font
+        self.font_bold = font_bold
+        self.is_checked = is_checked
+        self.is_visible = is_visible
+        self.on_check = on_check
+        self.on_eye = on_eye
+        self.display_name = display_name
+        self.canvas = tk.Canvas(master, width=width, height=height, background="#fafbfc", highlightthickness=0,
+                                yscrollincrement=ROW_HEIGHT)
+        self.scrollbar = ttk.Scrollbar(master, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_yscroll)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.canvas)
+        self._rows = [] # 重複使用的列元件
+        self._entries = [] # [(kind, value)]：('header', 標題) 或 ('selected' / 'all', 欄位)
+        self._selected = []
+        self._matched = []
+
+    # --- 資料 ---
+
+    def set_items(self, selected_cols, matched_cols):
+        """設定 "已勾選" 區段與搜尋結果區段的欄位"""
+        self._selected = list(selected_cols)
+        self._matched = list(matched_cols)
+        self.canvas.yview_moveto(0) # 新的搜尋結果從頂端開始
+        self._rebuild_entries()
+
+    def set_selected(self, selected_cols):
+        """只更新 "已勾選" 區段 (勾選狀態改變時使用，搜尋結果不變)"""
+        self._selected = list(selected_cols)
+        self._rebuild_entries()
+
+    def refresh_col(self, col):
+        """欄位的勾選 / 顯示狀態改變時，只更新目前顯示該欄位的列"""
+        for row in self._rows:
+            if row.col == col and not row.is_header:
+                self._update_row_state(row)
+
+    def clear(self):
+        self._selected = []
+        self._matched = []
+        self._rebuild_entries()
+
+    def _rebuild_entries(self):
+        entries = []
+        if self._selected:
+            entries.append(('header', "已勾選 (點擊取消/隱藏)"))
+            entries.extend(('selected', col) for col in self._selected)
+        if self._selected or self._matched:
+            entries.append(('header', "全部感測器 (點擊勾選/隱藏)"))
+            entries.extend(('all', col) for col in self._matched)
+        self._entries = entries
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), len(entries) * ROW_HEIGHT))
+        self._layout()
+
+    # --- 版面 ---
+
+    def _on_resize(self, event):
+        needed = math.ceil(event.height / ROW_HEIGHT) + 1 # 可視列數 (含捲動時的半列)
+        while len(self._rows) < needed:
+            self._rows.append(_Row(self.canvas, self))
+        for row in self._rows:
+            self.canvas.itemconfigure(row.window_id, width=event.width)
+        self.canvas.configure(scrollregion=(0, 0, event.width, len(self._entries) * ROW_HEIGHT))
+        self._layout()
+
+    def _on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._layout()
+
+    def _layout(self):
+        """將列元件放到目前可視範圍的位置並綁定對應項目，多出的列移到畫面外"""
+        first = max(0, int(self.canvas.canvasy(0) // ROW_HEIGHT))
+        for k, row in enumerate(self._rows):
+            idx = first + k
+            if idx < len(self._entries):
+                self.canvas.coords(row.window_id, 0, idx * ROW_HEIGHT)
+                self.canvas.itemconfigure(row.window_id, state='normal')
+                self._bind_row(row, *self._entries[idx])
+            else:
+                self.canvas.itemconfigure(row.window_id, state='hidden')
+                row.col = None
+
+    def _bind_row(self, row, kind, value):
+        is_header = kind == 'header'
+        if is_header != row.is_header:
+            # 只有列的種類改變時才重新排版子元件
+            for widget in (row.btn_check, row.btn_eye, row.label):
+                widget.pack_forget()
+            if is_header:
+                row.label.configure(font=self.font_bold)
+                row.label.pack(side=ctk.LEFT, padx=5)
+            else:
+                row.label.configure(font=self.font)
+                row.btn_check.pack(side=ctk.LEFT, padx=(5,3))
+                row.btn_eye.pack(side=ctk.LEFT, padx=(0,5))
+                row.label.pack(side=ctk.LEFT, pady=2)
+            row.is_header = is_header
+        if is_header:
+            row.col = None
+            row.label.configure(text=value)
+            return
+        if row.col != value:
+            row.col = value
+            row.label.configure(text=self.display_name(value))
+        self._update_row_state(row)
+
+    def _update_row_state(self, row):
+        checked_text = "✅" if self.is_checked(row.col) else "🔲"
+        eye_text = "👁️" if self.is_visible(row.col) else "🙈"
+        if row.btn_check.cget("text") != checked_text:
+            row.btn_check.configure(text=checked_text)
+        if row.btn_eye.cget("text") != eye_text:
+            row.btn_eye.configure(text=eye_text)
+
+    # --- 事件 ---
+
+    def _on_check_row(self, row):
+        if row.col is not None:
+            self.on_check(row.col)
+
+    def _on_eye_row(self, row):
+        if row.col is not None:
+            self.on_eye(row.col)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel, add="+")
+        widget.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"), add="+") # Linux
+        widget.bind("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"), add="+")
+
+    def _on_wheel(self, event):
+        self.canvas.yview_scroll(-1 if event.delta > 0 else 1, "units")
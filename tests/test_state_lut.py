@@ -0,0 +1,58 @@
+"""
+向量化查表 (state_color_lut / av_upscale_lut) 與逐筆函式 (state_color / av_upscale) 的結果必須一致：
+    python -m pytest tests
+"""
+import itertools
+import os
+import sys
+
+import matplotlib.colors as mcolors
+import numpy as np
+import pytest
+
+# 從 tests/ 執行時，讓上一層的程式模組可以匯入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import state_color, state_color_lut, av_upscale, av_upscale_lut
+
+TWO_DIGIT = [''.join(bits) for bits in itertools.product('01', repeat=2)]
+FOUR_DIGIT = [''.join(bits) for bits in itertools.product('01', repeat=4)]
+# 缺值、無法辨識的狀態，以及 CSV 中帶引號 / 空白的寫法
+OTHER = ['nan', 'None', '', '2', '012', '1111111', 'x', "'01'", '"11"', " '10' ", "'0101'"]
+LABELS = TWO_DIGIT + FOUR_DIGIT + OTHER
+COL_NAMES = ['', 'p-101a', 'b-203a', 'mx-401', 'av-2021a']
+
+
+@pytest.mark.parametrize('col_name', COL_NAMES)
+@pytest.mark.parametrize('alpha', [None, 0.45])
+def test_state_color_lut_matches_state_color(col_name, alpha):
+    lut = state_color_lut(LABELS, col_name, alpha=alpha)
+    assert lut.shape == (len(LABELS), 4)
+    for label, rgba in zip(LABELS, lut):
+        expected = mcolors.to_rgba(state_color(label, col_name), alpha=alpha)
+        assert tuple(rgba) == pytest.approx(expected), (col_name, label)
+
+
+def test_state_color_lut_av_palette():
+    """av- 欄位的 '11' / '10' 使用 av- 色盤，與一般欄位不同"""
+    general = state_color_lut(TWO_DIGIT)
+    av = state_color_lut(TWO_DIGIT, 'av-2021a')
+    for label, g, a in zip(TWO_DIGIT, general, av):
+        assert tuple(a) == pytest.approx(mcolors.to_rgba(state_color(label, 'av-2021a')))
+        assert tuple(g) == pytest.approx(mcolors.to_rgba(state_color(label)))
+    assert tuple(av[TWO_DIGIT.index('11')]) != tuple(general[TWO_DIGIT.index('11')])
+
+
+def test_state_color_lut_codes_lookup():
+    """lut[codes] 與逐筆呼叫 state_color 相同"""
+    codes = np.random.default_rng(0).integers(0, len(LABELS), 500)
+    lut = state_color_lut(LABELS, 'p-101a')
+    for code, rgba in zip(codes, lut[codes]):
+        assert tuple(rgba) == pytest.approx(mcolors.to_rgba(state_color(LABELS[code], 'p-101a')))
+
+
+def test_av_upscale_lut_matches_av_upscale():
+    lut = av_upscale_lut(LABELS)
+    assert lut.dtype == np.int8
+    for label, value in zip(LABELS, lut):
+        assert value == av_upscale(label), label
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+
+class TimeIndex:
+    """
+    已排序時間欄的 int64 epoch (ns, UTC) 索引。
+    以 np.searchsorted 將時間範圍轉成位置區間，取代對整欄做布林遮罩
+    """
+
+    def __init__(self, times):
+        values = times.values if hasattr(times, 'values') else np.asarray(times)
+        epoch_ns = values.astype('datetime64[ns]').view('i8')
+        # 載入時已依時間排序，NaT 會排在最後，搜尋時排除
+        self.n_valid = int(np.count_nonzero(~pd.isna(values)))
+        self.epoch_ns = epoch_ns[:self.n_valid]
+
+    def append(self, times):
+        """接上新的時間 (必須已排序、不含 NaT 且晚於目前最後一筆)"""
+        values = times.values if hasattr(times, 'values') else np.asarray(times)
+        new_ns = values.astype('datetime64[ns]').view('i8')
+        self.epoch_ns = np.concatenate((self.epoch_ns, new_ns))
+        self.n_valid = len(self.epoch_ns)
+
+    def __len__(self):
+        return self.n_valid
+
+    def positions(self, start, end):
+        """回傳 start <= t <= end 的位置區間 [i0, i1)，start/end 為 tz-aware Timestamp"""
+        i0 = int(np.searchsorted(self.epoch_ns, pd.Timestamp(start).value, side='left'))
+        i1 = int(np.searchsorted(self.epoch_ns, pd.Timestamp(end).value, side='right'))
+        return i0, max(i0, i1)
+
+    def slice(self, df, start, end):
+        """以位置切片取得時間範圍內的資料 (不複製)"""
+        i0, i1 = self.positions(start, end)
+        return df.iloc[i0:i1]
+
+    def times(self, i0, i1):
+        """位置區間內的時間 (datetime64[ns], UTC)，供繪圖使用"""
+        return self.epoch_ns[i0:i1].view('datetime64[ns]')
@@ -0,0 +1,171 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from utils import av_upscale
+
+# transitions: 範圍內的切換次數；runs: 開啟 (運轉) 的次數，範圍開始時已開啟也算一次；
+# on_s / off_s: 開啟與關閉的秒數 (缺值或無法判斷的狀態不列入)；last_state: 範圍最後一筆的狀態
+SwitchStats = namedtuple('SwitchStats', ['transitions', 'runs', 'on_s', 'off_s', 'last_state'])
+
+
+def is_on_state(state, col_name=""):
+    """
+    開關狀態是否為開啟 / 運轉：av- 依 av_upscale ('11' 開啟、'10' 關閉)，
+    其他欄位以最低位元為運轉 ('01'、'11'、'0101' 等)。缺值或無法判斷的狀態回傳 None
+    """
+    state = str(state).strip().strip("'\"")
+    if col_name.startswith('av-'):
+        return {1: True, 0: False}.get(av_upscale(state))
+    if not state or not set(state) <= {'0', '1'}:
+        return None
+    return state.endswith('1')
+
+
+class _Transitions:
+    """
+    單一開關欄位的狀態轉換：rows 為狀態改變的列 (與前一列不同)，
+    from_codes / to_codes 為改變前後的 categorical 代碼 (缺值為 -1)，first 為第一列的代碼
+    """
+
+    def __init__(self, series):
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(str).astype('category') # 與 plot_view._state_codes 相同
+        self.categorical = series
+        self._labels = None
+        self._on_lut = None
+        codes = series.cat.codes.to_numpy()
+        self.n = len(codes)
+        self.first = codes[0] if len(codes) else -1
+        self.rows = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        self.from_codes = codes[self.rows - 1]
+        self.to_codes = codes[self.rows]
+
+    @property
+    def labels(self):
+        """狀態字串表，最後一個為缺值 'nan' (與 plot_view._state_codes 相同)"""
+        if self._labels is None:
+            self._labels = np.append(self.categorical.cat.categories.astype(str).to_numpy(dtype=object), 'nan')
+        return self._labels
+
+    def extend(self, series):
+        """series 為接上新資料列後的整欄 (前段與原本相同，categorical 詞彙只會往後擴充)"""
+        if not isinstance(series.dtype, pd.CategoricalDtype) or self.n == 0:
+            self.__init__(series)
+            return
+        codes = series.cat.codes.to_numpy()[self.n - 1:] # 含原本的最後一列，用於比較第一筆新資料
+        rows = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        self.rows = np.concatenate((self.rows, rows + self.n - 1))
+        self.from_codes = np.concatenate((self.from_codes, codes[rows - 1]))
+        self.to_codes = np.concatenate((self.to_codes, codes[rows]))
+        self.categorical = series
+        self._labels = self._on_lut = None # 詞彙可能擴充
+        self.n = len(series)
+
+    def on_lut(self, col_name):
+        """labels 對應的開啟 (1) / 關閉 (0) / 無法判斷 (-1) 查表，見 is_on_state"""
+        if self._on_lut is None:
+            self._on_lut = np.array([{True: 1, False: 0}.get(is_on_state(v, col_name), -1) for v in self.labels],
+                                    dtype=np.int8)
+        return self._on_lut
+
+    def state_at(self, i):
+        """第 i 列的代碼 (O(log n))"""
+        k = int(np.searchsorted(self.rows, i, side='right'))
+        return self.to_codes[k - 1] if k else self.first
+
+    def segments(self, i0, i1):
+        """
+        列區間 [i0, i1) 的狀態區段：回傳 (各區段起始列相對 i0 的位置, 區段狀態代碼)，
+        代碼為 labels 的索引 (缺值對應最後的 'nan')，與 state_segments 對該範圍的結果相同
+        """
+        k0 = int(np.searchsorted(self.rows, i0, side='right'))
+        k1 = int(np.searchsorted(self.rows, i1, side='left'))
+        starts = np.concatenate(([0], self.rows[k0:k1] - i0))
+        codes = np.concatenate(([self.state_at(i0)], self.to_codes[k0:k1])).astype(np.int64)
+        return starts, np.where(codes < 0, len(self.categorical.cat.categories), codes)
+
+
+class TransitionIndex:
+    """
+    開關欄位的狀態轉換索引，每個資料集建立一次 (載入時先建立全部開關欄位，之後加入的欄位第一次查詢時建立)。
+    每欄只保存轉換發生的列與前後狀態，狀態短條、上一個 / 下一個事件與開關統計
+    只需二分搜尋與範圍內的轉換，不需逐筆掃描
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._columns = {} # 欄位 -> _Transitions
+
+    def _column(self, col):
+        tr = self._columns.get(col)
+        if tr is None:
+            tr = self._columns[col] = _Transitions(self.df[col])
+        return tr
+
+    def build(self, cols):
+        """先建立 cols 的轉換 (在載入的背景執行緒呼叫)"""
+        for col in cols:
+            self._column(col)
+        return self
+
+    def discard(self, col):
+        """丟棄欄位的轉換 (欄位已從 DataFrame 移除時呼叫)"""
+        self._columns.pop(col, None)
+
+    def extend(self, df):
+        """df 為接上新資料列後的 DataFrame (append_frame 的結果)，已建立的欄位只處理新增的列"""
+        self.df = df
+        for col, tr in self._columns.items():
+            tr.extend(df[col])
+
+    def segments(self, col, i0, i1):
+        """列區間 [i0, i1) 的 (區段起始位置, 狀態代碼, 狀態字串表)，見 _Transitions.segments"""
+        tr = self._column(col)
+        starts, codes = tr.segments(i0, i1)
+        return starts, codes, tr.labels
+
+    def events(self, col, i0=0, i1=None):
+        """列區間 [i0, i1) 內的轉換：(列, 改變前狀態, 改變後狀態)，狀態為字串"""
+        tr = self._column(col)
+        k0 = int(np.searchsorted(tr.rows, i0, side='left'))
+        k1 = len(tr.rows) if i1 is None else int(np.searchsorted(tr.rows, i1, side='left'))
+        labels = tr.labels
+        return tr.rows[k0:k1], labels[tr.from_codes[k0:k1]], labels[tr.to_codes[k0:k1]]
+
+    def next_event(self, cols, i):
+        """cols 中在第 i 列 (含) 之後最早的轉換，回傳 (列, 欄位)；沒有時回傳 None"""
+        best = None
+        for col in cols:
+            rows = self._column(col).rows
+            k = int(np.searchsorted(rows, i, side='left'))
+            if k < len(rows) and (best is None or rows[k] < best[0]):
+                best = (int(rows[k]), col)
+        return best
+
+    def prev_event(self, cols, i):
+        """cols 中在第 i 列 (不含) 之前最晚的轉換，回傳 (列, 欄位)；沒有時回傳 None"""
+        best = None
+        for col in cols:
+            rows = self._column(col).rows
+            k = int(np.searchsorted(rows, i, side='left'))
+            if k > 0 and (best is None or rows[k - 1] > best[0]):
+                best = (int(rows[k - 1]), col)
+        return best
+
+    def summary(self, col, i0, i1, epoch_ns):
+        """
+        欄位在列區間 [i0, i1) 的 SwitchStats；epoch_ns 為時間索引的 epoch 奈秒。
+        各區段持續到下一區段開始，最後一段延長 1 秒 (與狀態短條相同)
+        """
+        if i1 <= i0:
+            return SwitchStats(0, 0, 0.0, 0.0, '')
+        starts, codes, labels = self.segments(col, i0, i1)
+        on = self._column(col).on_lut(col)[codes]
+        t = epoch_ns[i0 + starts]
+        durations = np.diff(np.append(t, epoch_ns[i1 - 1] + 10**9)) / 1e9
+        runs = int(np.count_nonzero((on == 1) & (np.append(-1, on[:-1]) != 1)))
+        return SwitchStats(transitions=len(starts) - 1, runs=runs,
+                           on_s=float(durations[on == 1].sum()), off_s=float(durations[on == 0].sum()),
+                           last_state=labels[codes[-1]])
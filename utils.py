@@ -4,6 +4,8 @@ from tkcalendar import Calendar
 from datetime import datetime
 import json
 import os
+import numpy as np
+import matplotlib.colors as mcolors
 
 EQUIPMENT_NAMES = {}
 
@@ -67,9 +69,13 @@ def pick_datetime_with_default(title="選擇日期時間", default_dt=None):
     top.wait_window()
     return result.get('datetime')
 
+# 開關欄位的前綴，與不屬於感測欄位的時間 / 編號欄位 (csv_schema 依此決定各欄的讀取型別)
+SWITCH_PREFIXES = ('p-', 'b-', 'mx-', 'av-')
+NON_SENSOR_COLS = ('ID', 'Timestamp', 'Date', 'Time', 'Datetime')
+
 def get_switchable_cols(df):
     """只挑出需要背景色的欄位（p-, b-, mx-, av-）"""
-    return [col for col in df.columns if col.startswith(('p-', 'b-', 'mx-', 'av-'))]
+    return [col for col in df.columns if col.startswith(SWITCH_PREFIXES)]
 
 def get_chinese_name_for_tag(tag):
     """根據 equipments.json 取得對應的中文名稱，如果沒有則返回原始 tag"""
@@ -77,12 +83,44 @@ def get_chinese_name_for_tag(tag):
 
 def get_sensor_cols(df):
     """其餘一般數值型感測欄位（排除 ID, Timestamp, Date, Time, Datetime, 以及 p-, b-, mx-, av-）"""
-    skip = ('ID', 'Timestamp', 'Date', 'Time', 'Datetime')
     return [
         col for col in df.columns 
-        if not col.startswith(('p-', 'b-', 'mx-', 'av-')) and col not in skip
+        if not col.startswith(SWITCH_PREFIXES) and col not in NON_SENSOR_COLS
     ]
 
+# state_color 的對照表 (模組載入時建立一次，呼叫時不再配置新的 dict)
+AV_STATE_COLORS = {
+    '11': '#ff0000',  # 紅色
+    '10': '#b3ffd9',  # 淡綠
+    '01': '#ffffff',  # 白色
+    '00': '#ffffff',  # 白色
+}
+TWO_DIGIT_STATE_COLORS = {
+    '00': '#e6e6e6',   # 灰白
+    '01': '#b3ffd9',   # 淡綠
+    '10': '#99cfff',   # 淡藍
+    '11': '#ffb3b3',   # 淡紅
+}
+FOUR_DIGIT_STATE_COLORS = {
+    '0000': '#f2f2f2',
+    '0001': '#d1ffd6',
+    '0010': '#cbe6ff',
+    '0011': '#ffecc2',
+    '0100': '#bff2fa',
+    '0101': '#c4f9cb',
+    '0110': '#d6d8ff',
+    '0111': '#fffacc',
+    '1000': '#f2f2f2',
+    '1001': '#44d18d',
+    '1010': '#ffecc2',
+    '1011': '#ffecc2',
+    '1100': '#ffb3b3',
+    '1101': '#ff0000',
+    '1110': '#ffecc2',
+    '1111': '#ffecc2',
+}
+FALLBACK_STATE_COLOR = '#f6ffed'
+
 def state_color(state, col_name=""):
     """
     根據狀態碼和欄位名稱決定背景色
@@ -92,50 +130,51 @@ def state_color(state, col_name=""):
     state = state.strip().lstrip("'").lstrip('"').rstrip("'").rstrip('"')
 
     # 針對 av- 系列的特殊顏色邏輯
-    if col_name.startswith('av-'):
-        if state == '11':
-            return '#ff0000'  # 紅色
-        elif state == '10':
-            return '#b3ffd9'  # 淡綠
-        elif state in ['01', '00']:
-            return '#ffffff'  # 白色
-            
-    if state in ['00', '01', '10', '11']:
-        mapping = {
-            '00': '#e6e6e6',   # 灰白
-            '01': '#b3ffd9',   # 淡綠
-            '10': '#99cfff',   # 淡藍
-            '11': '#ffb3b3',   # 淡紅
-        }
-        return mapping.get(state, '#f0f0f0') # 使用 .get 提供一個預設值
-
+    if col_name.startswith('av-') and state in AV_STATE_COLORS:
+        return AV_STATE_COLORS[state]
+    if state in TWO_DIGIT_STATE_COLORS:
+        return TWO_DIGIT_STATE_COLORS[state]
     if len(state) == 4 and all(c in '01' for c in state):
-        if state.startswith('0'):
-            mapping = {
-                '0000': '#f2f2f2',
-                '0001': '#d1ffd6',
-                '0010': '#cbe6ff',
-                '0011': '#ffecc2',
-                '0100': '#bff2fa',
-                '0101': '#c4f9cb',
-                '0110': '#d6d8ff',
-                '0111': '#fffacc',
-            }
-            return mapping.get(state, '#d4edfa')
-        elif state.startswith('1'):
-            mapping = {
-                '1000': '#f2f2f2',
-                '1001': '#44d18d',
-                '1010': '#ffecc2',
-                '1011': '#ffecc2',
-                '1100': '#ffb3b3',
-                '1101': '#ff0000',
-                '1110': '#ffecc2',
-                '1111': '#ffecc2',
-            }
-            return mapping.get(state, '#d4edfa')
+        return FOUR_DIGIT_STATE_COLORS[state]
     # fallback
-    return '#f6ffed'
+    return FALLBACK_STATE_COLOR
+
+_STATE_LUT_CACHE = {}
+_STATE_LUT_CACHE_MAX = 64
+
+def state_color_lut(labels, col_name="", alpha=None):
+    """
+    向量化的 state_color：回傳 (len(labels), 4) 的 RGBA 查表，第 i 列為 state_color(labels[i], col_name)。
+    搭配狀態代碼陣列使用 lut[codes]，一次取得所有區段的顏色。
+    查表由 state_color 本身產生，結果必定一致；欄位名稱只影響是否使用 av- 色盤，
+    同一組狀態字串表與色盤只建立一次
+    """
+    palette = 'av-' if col_name.startswith('av-') else ''
+    key = (palette, alpha, tuple(labels))
+    lut = _STATE_LUT_CACHE.get(key)
+    if lut is None:
+        if len(_STATE_LUT_CACHE) >= _STATE_LUT_CACHE_MAX:
+            _STATE_LUT_CACHE.clear()
+        lut = mcolors.to_rgba_array([state_color(v, palette) for v in labels], alpha=alpha)
+        lut.setflags(write=False)
+        _STATE_LUT_CACHE[key] = lut
+    return lut
+
+def state_segments(times, vals):
+    """
+    將狀態序列做 run-length 編碼，回傳 (starts, ends, states)
+    每段從該狀態第一筆的時間開始，到下一個狀態的第一筆為止；最後一段延長 1 秒
+    """
+    times = np.asarray(times)
+    vals = np.asarray(vals)
+    n = len(vals)
+    if n == 0:
+        return times[:0], times[:0], vals[:0]
+    change_idx = np.flatnonzero(vals[1:] != vals[:-1]) + 1
+    start_idx = np.concatenate(([0], change_idx))
+    starts = times[start_idx]
+    ends = np.concatenate((times[change_idx], [times[-1] + np.timedelta64(1, 's')]))
+    return starts, ends, vals[start_idx]
 
 def av_upscale(state):
     """
@@ -148,4 +187,8 @@ def av_upscale(state):
     elif state == '10':
         return 0
     else:
-        return -1
\ No newline at end of file
+        return -1
+
+def av_upscale_lut(labels):
+    """向量化的 av_upscale：回傳 int8 查表，搭配狀態代碼陣列使用 lut[codes]"""
+    return np.array([av_upscale(v) for v in labels], dtype=np.int8)